@@ -1,103 +1,159 @@
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, Response, g, request, jsonify, send_file, stream_with_context
 from flask_cors import CORS
-import requests
+import base64
+import io
 import json
 import os
+import time
+import uuid
 from dotenv import load_dotenv
-from ppt_generator import generate_ppt
 
-# Load environment variables
+# Load environment variables before the modules below read their settings
 load_dotenv()
 
+from artifact_store import create_artifact_store
+from batch import BATCH_ID_PATTERN, BATCH_OUTPUT_DIR, ZIP_NAME, BatchRunner, parse_records, record_id
+from deck_model import build_deck_model, deck_hash
+from deck_store import GENERATED, SAVED, UPDATED, content_hash, create_deck_store, inputs_hash
+from exporters import EXPORT_FORMATS, export_cache, export_deck, iter_export_zip, slide_titles, thumbnail
+from jobs import FAILED, QUEUED, RUNNING, SUCCEEDED, create_job_queue
+from metrics import ERRORS, HTTP_REQUEST_SECONDS, registry
+from deck_service import (
+    GENERATION_MODES,
+    SLIDE_SECTIONS,
+    deck_input_hashes,
+    generate_deck,
+    generation_settings,
+    generate_pitch_deck_section,
+    missing_required_fields,
+    model_registry,
+    response_cache,
+    stream_deck_events,
+    update_deck,
+)
+
 app = Flask(__name__)
+app.json.sort_keys = False  # keep deck sections in SLIDE_SECTIONS order
 CORS(app)
 
-# Gemini API configuration
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-if not GEMINI_API_KEY:
-    raise ValueError("GEMINI_API_KEY environment variable not set. Please set it in your .env file or environment variables.")
-GEMINI_API_URL = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent?key={GEMINI_API_KEY}"
-
-# Define slide sections in order
-SLIDE_SECTIONS = [
-    'cover',
-    'problem',
-    'solution',
-    'market',
-    'product',
-    'business_model',
-    'competition',
-    'team',
-    'traction',
-    'funding_needs'
-]
-
-def generate_content(prompt):
-    """Generate content using Gemini API directly."""
-    headers = {
-        'Content-Type': 'application/json'
-    }
-    
-    data = {
-        "contents": [
-            {
-                "parts": [
-                    {"text": prompt}
-                ]
-            }
-        ]
-    }
-    
+@app.before_request
+def _start_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def _record_request(response):
+    """Record per-endpoint latency and count server errors"""
+    started = g.pop('request_started', None)
+    if started is not None:
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint=endpoint,
+                                     method=request.method, status=str(response.status_code))
+        if response.status_code >= 500:
+            ERRORS.inc(stage='http')
+    return response
+
+# Optional content-addressed store for rendered decks
+artifact_store = create_artifact_store()
+
+PPTX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.presentationml.presentation'
+
+# Versioned decks, so anything already generated is read back instead of regenerated
+deck_store = create_deck_store()
+
+def _save_version(form_data, deck, deck_id=None, source=SAVED, **fields):
+    """Save a deck version; a failing store is logged rather than failing the request"""
+    if not deck_store:
+        return None
     try:
-        response = requests.post(GEMINI_API_URL, headers=headers, json=data)
-        if response.status_code != 200:
-            print(f"Gemini API error: {response.status_code} {response.text}")
-            raise Exception(f"Gemini API error: {response.status_code} {response.text}")
-        result = response.json()
-        if 'candidates' in result and len(result['candidates']) > 0:
-            if 'content' in result['candidates'][0] and 'parts' in result['candidates'][0]['content']:
-                return result['candidates'][0]['content']['parts'][0]['text']
-        print(f"Unexpected Gemini API response: {result}")
-        raise Exception(f"Unexpected Gemini API response: {result}")
+        return deck_store.save_version(form_data, deck, deck_id=deck_id, source=source, **fields)
     except Exception as e:
-        print(f"API request failed: {str(e)}")
-        raise Exception(str(e))
+        print(f"Error saving deck version: {str(e)}")
+        return None
 
-def generate_pitch_deck_section(section, context):
-    """Generate content for a specific pitch deck section."""
-    startup_name = context.get('startup_name', '')
-    
-    if section == 'cover':
-        prompt = f"""Create a compelling cover slide for a startup pitch deck.
-        Startup Name: {startup_name}
-        Industry: {context.get('industry', '')}
-        Create a tagline that captures the essence of the startup.
-        Format: Return only the text in this format: "{startup_name} - [tagline]"
-        Keep it concise and impactful."""
+def _unknown_deck(deck_id):
+    return bool(deck_id) and (not deck_store or deck_store.get_version(deck_id) is None)
+
+def _version_headers(response, version):
+    if version:
+        response.headers['X-Deck-Id'] = version['deck_id']
+        response.headers['X-Deck-Version'] = str(version['version'])
+    return response
+
+def _generate_or_load(form_data, mode, bypass_cache=False, deck_id=None, on_section=None):
+    """Return ``(deck, info, version)`` for a full deck.
+
+    A complete deck generated earlier from the same form and mode, with the
+    same models and prompts and within DECK_STORE_REUSE_TTL, is read from
+    the deck store (``info['source'] == 'store'``); otherwise the deck is
+    generated and saved as a new version of ``deck_id`` (or of a new deck).
+    ``bypass_cache`` always generates.
+    """
+    key = inputs_hash(form_data, mode, generation_settings())
+    stored = deck_store.find_generated(key) if deck_store and not bypass_cache else None
+    if stored:
+        info = dict(stored['metadata'], source='store')
+        if deck_id in (None, stored['deck_id']):
+            return stored['deck'], info, stored
+        deck = stored['deck']
     else:
-        prompt = f"""As an expert pitch deck generator, create content for the {section} section of a startup pitch deck.
-        Startup Name: {startup_name}
-        Context: {context}
-        Requirements:
-        - Be concise and impactful
-        - Focus on key points only
-        - Use bullet points where appropriate
-        - Maintain professional tone
-        - Be specific and data-driven where possible
-        Output only the content, no explanations."""
-    
-    try:
-        content = generate_content(prompt)
-        return content
-    except Exception as e:
-        print(f"Error generating content for {section}: {str(e)}")
-        raise Exception(f"Failed to generate content: {str(e)}")
+        deck, info = generate_deck(form_data, mode=mode, bypass_cache=bypass_cache, on_section=on_section)
+        info = dict(info, source='gemini', model=model_registry.default_model)
+    metadata = {field: value for field, value in info.items() if field != 'source'}
+    version = _save_version(form_data, deck, deck_id, GENERATED, metadata=metadata,
+                            input_hashes=deck_input_hashes(form_data), inputs_hash=key)
+    return deck, info, version
+
+# Background jobs for long-running generation
+job_queue = create_job_queue()
+
+def _run_deck_job(payload, report):
+    """Job handler: generate a full deck, reporting each section as it finishes"""
+    deck, info, version = _generate_or_load(
+        payload['formData'],
+        payload['mode'],
+        bypass_cache=payload['bypass_cache'],
+        deck_id=payload.get('deck_id'),
+        on_section=lambda section, error: report(**{section: 'failed' if error else 'done'}),
+    )
+    if info['source'] == 'store':
+        report(**{section: 'done' for section in deck})
+    if version:
+        report(deck_id=version['deck_id'], deck_version=version['version'])
+    return deck, 'json'
+
+def _run_ppt_job(payload, report):
+    """Job handler: render a PPTX from form data and generated deck content"""
+    from ppt_generator import render_ppt
+    data = render_ppt(payload['formData'], payload['deck']).getvalue()
+    if artifact_store:
+        report(artifact_id=artifact_store.put(data))
+    return data, PPTX_MIMETYPE
+
+def _run_batch_job(payload, report):
+    """Job handler: generate a batch into its output directory and return the zip of its decks"""
+    runner = BatchRunner(os.path.join(BATCH_OUTPUT_DIR, payload['batch_id']), mode=payload['mode'])
+    entries = runner.run(runner.load_records(), progress=lambda entry: report(**{entry['id']: entry['status']}))
+    zip_path = os.path.join(runner.output_dir, ZIP_NAME)
+    runner.write_zip(entries, zip_path)
+    with open(zip_path, 'rb') as f:
+        return f.read(), 'application/zip'
+
+job_queue.register('deck', _run_deck_job)
+job_queue.register('ppt', _run_ppt_job)
+job_queue.register('batch', _run_batch_job)
+
+def _flag(value):
+    """Interpret a boolean flag sent as JSON or as a query string value."""
+    if isinstance(value, str):
+        return value.strip().lower() in ('1', 'true', 'yes', 'on')
+    return bool(value)
 
 @app.route('/api/generate-slide', methods=['POST'])
 def generate_slide():
     data = request.json
     section = data.get('section')
     context = data.get('context', {})
+    bypass_cache = _flag(data.get('bypass_cache', request.args.get('bypass_cache')))
     
     if not section:
         return jsonify({'error': 'Section is required'}), 400
@@ -106,7 +162,7 @@ def generate_slide():
         return jsonify({'error': 'Startup name is required'}), 400
         
     try:
-        content = generate_pitch_deck_section(section, context)
+        content = generate_pitch_deck_section(section, context, bypass_cache=bypass_cache)
         return jsonify({
             'section': section,
             'content': content
@@ -118,28 +174,103 @@ def generate_slide():
 @app.route('/api/generate-full-deck', methods=['POST'])
 def generate_full_deck():
     data = request.json
-    required_fields = ['startup_name', 'problem', 'solution', 'target_audience', 'industry', 'revenue_model', 'stage']
+    # Control flags are not part of the form context sent to Gemini
+    bypass_cache = _flag(data.pop('bypass_cache', request.args.get('bypass_cache')))
+    mode = data.pop('mode', None) or request.args.get('mode', 'sections')
+    deck_id = data.pop('deck_id', None) or request.args.get('deck_id')
+    if mode not in GENERATION_MODES:
+        return jsonify({'error': f'Unknown generation mode: {mode}. Use one of: {", ".join(GENERATION_MODES)}'}), 400
     
     # Validate required fields
-    missing_fields = [field for field in required_fields if field not in data or not data[field].strip()]
+    missing_fields = missing_required_fields(data)
     if missing_fields:
         return jsonify({'error': f'Missing or empty required fields: {", ".join(missing_fields)}'}), 400
+    if _unknown_deck(deck_id):
+        return jsonify({'error': 'Deck not found.'}), 404
     
     try:
-        deck = {}
-        for section in SLIDE_SECTIONS:
-            try:
-                content = generate_pitch_deck_section(section, data)
-                deck[section] = content
-            except Exception as e:
-                print(f"Error generating {section}: {str(e)}")
-                deck[section] = f"Error generating content for {section}. Please try regenerating this slide."
-            
-        return jsonify(deck)
+        deck, info, version = _generate_or_load(data, mode, bypass_cache=bypass_cache, deck_id=deck_id)
+        response = jsonify(deck)
+        response.headers['X-Generation-Mode'] = mode
+        response.headers['X-Fallback-Sections'] = ','.join(info['fallback_sections'])
+        response.headers['X-Deck-Source'] = info['source']
+        return _version_headers(response, version)
     except Exception as e:
         print(f"Error in generate_full_deck: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/update-deck', methods=['POST'])
+def update_existing_deck():
+    """Refresh a deck after a form edit, regenerating only the sections whose inputs changed.
+
+    Expects ``{deck, formData}`` plus either the ``input_hashes`` returned by a
+    previous call or the ``previousFormData`` the deck was generated from.
+    """
+    data = request.json
+    deck = data.get('deck') or {}
+    form_data = data.get('formData', {})
+    deck_id = data.get('deck_id')
+    bypass_cache = _flag(data.get('bypass_cache', request.args.get('bypass_cache')))
+
+    missing_fields = missing_required_fields(form_data)
+    if missing_fields:
+        return jsonify({'error': f'Missing or empty required fields from formData: {", ".join(missing_fields)}'}), 400
+    if _unknown_deck(deck_id):
+        return jsonify({'error': 'Deck not found.'}), 404
+
+    try:
+        updated, input_hashes, regenerated = update_deck(
+            deck,
+            form_data,
+            input_hashes=data.get('input_hashes'),
+            previous_context=data.get('previousFormData'),
+            bypass_cache=bypass_cache,
+        )
+        version = _save_version(form_data, updated, deck_id, UPDATED,
+                                metadata={'regenerated': regenerated}, input_hashes=input_hashes)
+        return jsonify({
+            'deck': updated,
+            'input_hashes': input_hashes,
+            'regenerated': regenerated,
+            'deck_id': version['deck_id'] if version else None,
+            'version': version['version'] if version else None,
+        })
+    except Exception as e:
+        print(f"Error in update_deck: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/generate-full-deck/stream', methods=['POST'])
+def generate_full_deck_stream():
+    """Stream a full deck as server-sent events, one event per finished section."""
+    data = request.json
+    bypass_cache = _flag(data.pop('bypass_cache', request.args.get('bypass_cache')))
+    stream_tokens = _flag(data.pop('stream_tokens', request.args.get('stream_tokens')))
+
+    missing_fields = missing_required_fields(data)
+    if missing_fields:
+        return jsonify({'error': f'Missing or empty required fields: {", ".join(missing_fields)}'}), 400
+
+    return Response(
+        stream_with_context(stream_deck_events(data, stream_tokens=stream_tokens, bypass_cache=bypass_cache)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+def _attach_pptx(deck_id, version, form_data, generated_deck, data):
+    """Keep a rendered PPTX with the version of ``deck_id`` it was rendered from.
+
+    Content that matches no stored version (e.g. edited since) is saved as
+    a new version first.
+    """
+    try:
+        stored = deck_store.get_version(deck_id, version) if version else None
+        if stored is None or stored['content_hash'] != content_hash(form_data, generated_deck):
+            stored = deck_store.save_version(form_data, generated_deck, deck_id=deck_id, source=SAVED)
+        if stored:
+            deck_store.add_artifact(deck_id, stored['version'], 'pptx', data)
+    except Exception as e:
+        print(f"Error saving deck artifact: {str(e)}")
+
 @app.route('/api/generate-ppt', methods=['POST'])
 def generate_powerpoint():
     """Generate a PowerPoint presentation from the pitch deck data"""
@@ -150,8 +281,7 @@ def generate_powerpoint():
         generated_deck = data.get('deck', {})
 
         # Validate required fields from form_data (checking for non-empty values)
-        required_fields = ['startup_name', 'problem', 'solution', 'target_audience', 'industry', 'revenue_model', 'stage']
-        missing_fields = [field for field in required_fields if field not in form_data or not form_data[field].strip()]
+        missing_fields = missing_required_fields(form_data)
         if missing_fields:
             return jsonify({'error': f'Missing or empty required fields from formData: {", ".join(missing_fields)}'}), 400
             
@@ -159,20 +289,468 @@ def generate_powerpoint():
         if not generated_deck:
             return jsonify({'error': 'Generated pitch deck content is missing.'}), 400
 
-        # Pass both form_data and generated_deck to ppt_generator
-        ppt_path = generate_ppt(form_data, generated_deck)
+        # Render in memory and stream the buffer straight back
+        from ppt_generator import render_ppt
+        ppt_buffer = render_ppt(form_data, generated_deck)
+        artifact_id = artifact_store.put(ppt_buffer.getvalue()) if artifact_store else None
+        if data.get('deck_id') and deck_store:
+            _attach_pptx(data['deck_id'], data.get('version'), form_data, generated_deck, ppt_buffer.getvalue())
         
         # Send the file
-        return send_file(
-            ppt_path,
-            mimetype='application/vnd.openxmlformats-officedocument.presentationml.presentation',
+        response = send_file(
+            ppt_buffer,
+            mimetype=PPTX_MIMETYPE,
             as_attachment=True,
-            download_name=os.path.basename(ppt_path)
+            download_name=f"{form_data['startup_name'].replace(' ', '_')}_pitch_deck.pptx"
         )
+        if artifact_id:
+            response.headers['X-Artifact-Id'] = artifact_id
+        return response
         
     except Exception as e:
         print(f"Error generating PowerPoint: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/patch-ppt', methods=['POST'])
+def patch_powerpoint():
+    """Rewrite only the changed sections' slides of a previously rendered deck.
+
+    Takes either a multipart upload (``file`` plus a JSON ``deck`` field and an
+    optional JSON ``formData`` field) or JSON with ``artifact_id`` or
+    ``pptx_base64``, ``deck`` holding just the changed sections, and an
+    optional ``formData`` to refresh the cover slide.
+    """
+    try:
+        if request.files:
+            upload = request.files.get('file')
+            if upload is None:
+                return jsonify({'error': 'Upload the deck as the "file" field.'}), 400
+            ppt_bytes = upload.read()
+            changed_sections = json.loads(request.form.get('deck') or '{}')
+            form_data = json.loads(request.form.get('formData') or 'null')
+        else:
+            data = request.json
+            changed_sections = data.get('deck', {})
+            form_data = data.get('formData')
+            if data.get('artifact_id'):
+                if not artifact_store:
+                    return jsonify({'error': 'Artifact storage is not enabled.'}), 400
+                ppt_bytes = artifact_store.get(data['artifact_id'])
+                if ppt_bytes is None:
+                    return jsonify({'error': 'Artifact not found.'}), 404
+            elif data.get('pptx_base64'):
+                ppt_bytes = base64.b64decode(data['pptx_base64'])
+            else:
+                return jsonify({'error': 'Provide the deck as artifact_id, pptx_base64 or a file upload.'}), 400
+
+        if not changed_sections:
+            return jsonify({'error': 'No changed sections to patch.'}), 400
+        unknown = [section for section in changed_sections if section not in SLIDE_SECTIONS]
+        if unknown:
+            return jsonify({'error': f'Unknown sections: {", ".join(unknown)}'}), 400
+
+        from ppt_generator import patch_ppt
+        ppt_buffer = patch_ppt(ppt_bytes, changed_sections, form_data)
+        artifact_id = artifact_store.put(ppt_buffer.getvalue()) if artifact_store else None
+
+        name = (form_data or {}).get('startup_name') or 'deck'
+        response = send_file(
+            ppt_buffer,
+            mimetype=PPTX_MIMETYPE,
+            as_attachment=True,
+            download_name=f"{name.replace(' ', '_')}_pitch_deck.pptx"
+        )
+        if artifact_id:
+            response.headers['X-Artifact-Id'] = artifact_id
+        return response
+
+    except Exception as e:
+        print(f"Error patching PowerPoint: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+def _export_request(data):
+    """Validate an export payload and return ``(model, error response)``."""
+    form_data = data.get('formData', {})
+    generated_deck = data.get('deck', {})
+    missing_fields = missing_required_fields(form_data)
+    if missing_fields:
+        return None, (jsonify({'error': f'Missing or empty required fields from formData: {", ".join(missing_fields)}'}), 400)
+    if not generated_deck:
+        return None, (jsonify({'error': 'Generated pitch deck content is missing.'}), 400)
+    return build_deck_model(form_data, generated_deck), None
+
+@app.route('/api/export', methods=['POST'])
+def export_powerpoint():
+    """Export the deck as PPTX, Markdown, HTML, PDF or PNG thumbnails.
+
+    Takes the /api/generate-ppt payload plus ``formats`` (a list, or
+    ``?format=``). One format is returned as that file; several are streamed
+    as a zip, each file written as soon as it has rendered. Formats render in
+    parallel and are cached by deck content, see X-Deck-Hash.
+    """
+    try:
+        data = request.json
+        formats = data.get('formats') or [request.args.get('format', 'pptx')]
+        if isinstance(formats, str):
+            formats = formats.split(',')
+        unknown = [name for name in formats if name not in EXPORT_FORMATS]
+        if unknown:
+            return jsonify({'error': f'Unknown export formats: {", ".join(unknown)}. Use: {", ".join(EXPORT_FORMATS)}'}), 400
+
+        model, error = _export_request(data)
+        if error:
+            return error
+        stem = f"{model['startup_name'].replace(' ', '_')}_pitch_deck"
+        headers = {'X-Deck-Hash': deck_hash(model)}
+
+        if len(set(formats)) == 1:
+            export_format = EXPORT_FORMATS[formats[0]]
+            output = export_deck(model, formats)[formats[0]]
+            response = send_file(
+                io.BytesIO(output),
+                mimetype=export_format.mimetype,
+                as_attachment=True,
+                download_name=f"{stem}.{export_format.extension}"
+            )
+            response.headers.update(headers)
+            return response
+
+        headers['Content-Disposition'] = f'attachment; filename="{stem}.zip"'
+        return Response(stream_with_context(iter_export_zip(model, formats, stem)),
+                        mimetype='application/zip', headers=headers)
+
+    except Exception as e:
+        print(f"Error exporting deck: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/preview', methods=['POST'])
+def preview_deck():
+    """Render slide thumbnails and return their URLs.
+
+    Thumbnails are cached by deck content, so previewing an unchanged deck
+    again costs a hash and a cache lookup.
+    """
+    try:
+        model, error = _export_request(request.json)
+        if error:
+            return error
+        export_deck(model, ['png'])
+        digest = deck_hash(model)
+        titles = slide_titles(model)
+        return jsonify({
+            'deck_hash': digest,
+            'slides': [{'title': title, 'url': f'/api/preview/{digest}/{index}.png'}
+                       for index, title in enumerate(titles)],
+        })
+
+    except Exception as e:
+        print(f"Error rendering preview: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/preview/<deck_digest>/<int:index>.png', methods=['GET'])
+def get_preview_image(deck_digest, index):
+    """Serve one cached slide thumbnail; POST /api/preview renders them"""
+    thumbnails = export_cache.get(deck_digest, 'png')
+    image = thumbnail(thumbnails, index) if thumbnails else None
+    if image is None:
+        return jsonify({'error': 'Preview not found. Render it with POST /api/preview.'}), 404
+    response = send_file(io.BytesIO(image), mimetype='image/png')
+    # The URL is content-addressed, so browsers may keep it for good
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+def _job_accepted(job_id, status=202, **fields):
+    return jsonify({
+        'job_id': job_id,
+        'status_url': f'/api/jobs/{job_id}',
+        'result_url': f'/api/jobs/{job_id}/result',
+        **fields,
+    }), status
+
+@app.route('/api/jobs/generate-full-deck', methods=['POST'])
+def submit_deck_job():
+    """Queue full-deck generation and return a job id straight away"""
+    data = request.json
+    bypass_cache = _flag(data.pop('bypass_cache', request.args.get('bypass_cache')))
+    mode = data.pop('mode', None) or request.args.get('mode', 'sections')
+    if mode not in GENERATION_MODES:
+        return jsonify({'error': f'Unknown generation mode: {mode}. Use one of: {", ".join(GENERATION_MODES)}'}), 400
+
+    deck_id = data.pop('deck_id', None)
+
+    missing_fields = missing_required_fields(data)
+    if missing_fields:
+        return jsonify({'error': f'Missing or empty required fields: {", ".join(missing_fields)}'}), 400
+    if _unknown_deck(deck_id):
+        return jsonify({'error': 'Deck not found.'}), 404
+
+    job_id = job_queue.submit(
+        'deck',
+        {'formData': data, 'mode': mode, 'bypass_cache': bypass_cache, 'deck_id': deck_id},
+        progress={section: 'pending' for section in SLIDE_SECTIONS},
+    )
+    return _job_accepted(job_id)
+
+@app.route('/api/jobs/generate-ppt', methods=['POST'])
+def submit_ppt_job():
+    """Queue PowerPoint rendering and return a job id straight away"""
+    data = request.json
+    form_data = data.get('formData', {})
+    generated_deck = data.get('deck', {})
+
+    missing_fields = missing_required_fields(form_data)
+    if missing_fields:
+        return jsonify({'error': f'Missing or empty required fields from formData: {", ".join(missing_fields)}'}), 400
+    if not generated_deck:
+        return jsonify({'error': 'Generated pitch deck content is missing.'}), 400
+
+    job_id = job_queue.submit('ppt', {'formData': form_data, 'deck': generated_deck})
+    return _job_accepted(job_id)
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job_status(job_id):
+    """Report a job's status and per-section progress"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found.'}), 404
+    return jsonify({
+        'job_id': job['id'],
+        'kind': job['kind'],
+        'status': job['status'],
+        'progress': job['progress'],
+        'error': job.get('error'),
+        'created_at': job['created_at'],
+        'updated_at': job['updated_at'],
+    })
+
+@app.route('/api/jobs/<job_id>/result', methods=['GET'])
+def get_job_result(job_id):
+    """Return the deck JSON, PPTX or batch zip of a finished job (202 while it is still running)"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found.'}), 404
+    if job['status'] == FAILED:
+        return jsonify({'error': job.get('error') or 'Job failed.'}), 500
+    if job['status'] != SUCCEEDED:
+        return jsonify({'job_id': job_id, 'status': job['status']}), 202
+
+    if job['result_type'] == 'json':
+        return app.response_class(job['result'], mimetype='application/json')
+    if job['kind'] == 'batch':
+        download_name = f"{job['payload']['batch_id']}_{ZIP_NAME}"
+    else:
+        download_name = f"{job['payload']['formData']['startup_name'].replace(' ', '_')}_pitch_deck.pptx"
+    return send_file(
+        io.BytesIO(job['result']),
+        mimetype=job['result_type'],
+        as_attachment=True,
+        download_name=download_name
+    )
+
+@app.route('/api/batch', methods=['POST'])
+def generate_batch():
+    """Queue decks for many startups; the job's result is a zip of PPTX files plus a results manifest.
+
+    Accepts either a JSON body ``{"records": [...]}`` or a multipart upload with
+    a JSONL/CSV ``file``. Each batch is written to its own directory under
+    BATCH_OUTPUT_DIR, named by ``batch_id`` (generated when not given).
+    Submitting the same ``batch_id`` again resumes from the manifest on disk,
+    without regenerating finished records; the records may be left out to
+    reuse the ones it was first submitted with. A ``manifest.jsonl`` from an
+    earlier run can be uploaded as ``manifest`` to seed a new batch.
+    """
+    try:
+        mode = request.args.get('mode', 'sections')
+        if mode not in GENERATION_MODES:
+            return jsonify({'error': f'Unknown generation mode: {mode}. Use one of: {", ".join(GENERATION_MODES)}'}), 400
+
+        previous_manifest = None
+        if request.files:
+            batch_id = request.form.get('batch_id') or request.args.get('batch_id')
+            upload = request.files.get('file')
+            fmt = 'csv' if upload and (upload.filename or '').lower().endswith('.csv') else 'jsonl'
+            records = parse_records(upload.read().decode('utf-8'), fmt) if upload else None
+            if 'manifest' in request.files:
+                previous_manifest = request.files['manifest'].read()
+        else:
+            data = request.json or {}
+            batch_id = data.get('batch_id') or request.args.get('batch_id')
+            records = data.get('records')
+        batch_id = batch_id or uuid.uuid4().hex
+        if not BATCH_ID_PATTERN.match(batch_id):
+            return jsonify({'error': 'batch_id may only contain letters, digits, "-" and "_" (up to 64).'}), 400
+
+        runner = BatchRunner(os.path.join(BATCH_OUTPUT_DIR, batch_id), mode=mode)
+        job_path = os.path.join(runner.output_dir, 'job_id')
+        if os.path.exists(job_path):
+            with open(job_path, encoding='utf-8') as f:
+                running = job_queue.get(f.read().strip())
+            if running and running['status'] in (QUEUED, RUNNING):
+                return _job_accepted(running['id'], status=409, batch_id=batch_id,
+                                     error='This batch is still running.')
+
+        if records:
+            runner.save_records(records)
+        else:
+            records = runner.load_records()
+        if not records:
+            return jsonify({'error': 'No records to process.'}), 400
+        if previous_manifest and not os.path.exists(runner.manifest_path):
+            with open(runner.manifest_path, 'wb') as f:
+                f.write(previous_manifest)
+
+        job_id = job_queue.submit('batch', {'batch_id': batch_id, 'mode': mode},
+                                  progress={record_id(record): 'pending' for record in records})
+        with open(job_path, 'w', encoding='utf-8') as f:
+            f.write(job_id)
+        return _job_accepted(job_id, batch_id=batch_id)
+    except Exception as e:
+        print(f"Error in generate_batch: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+def _deck_store_required():
+    if not deck_store:
+        return jsonify({'error': 'The deck store is not enabled.'}), 404
+    return None
+
+@app.route('/api/decks', methods=['POST'])
+def save_deck():
+    """Save a deck as a new version, e.g. after editing or regenerating slides.
+
+    Expects ``{formData, deck}`` and optionally the ``deck_id`` to add the
+    version to and ``metadata``. Content identical to the latest version
+    returns that version (200) instead of adding one (201).
+    """
+    error = _deck_store_required()
+    if error:
+        return error
+    data = request.json
+    form_data = data.get('formData', {})
+    deck = data.get('deck') or {}
+
+    missing_fields = missing_required_fields(form_data)
+    if missing_fields:
+        return jsonify({'error': f'Missing or empty required fields from formData: {", ".join(missing_fields)}'}), 400
+    if not deck:
+        return jsonify({'error': 'Generated pitch deck content is missing.'}), 400
+
+    try:
+        version = deck_store.save_version(form_data, deck, deck_id=data.get('deck_id'),
+                                          source=SAVED, metadata=data.get('metadata'))
+        if version is None:
+            return jsonify({'error': 'Deck not found.'}), 404
+        return jsonify(version), 201 if version['created'] else 200
+    except Exception as e:
+        print(f"Error saving deck: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/decks', methods=['GET'])
+def list_decks():
+    """List stored decks, most recently updated first (``?startup_name=``, ``limit``, ``offset``)"""
+    error = _deck_store_required()
+    if error:
+        return error
+    limit = min(request.args.get('limit', 50, type=int), 500)
+    offset = request.args.get('offset', 0, type=int)
+    return jsonify({'decks': deck_store.list_decks(request.args.get('startup_name'), limit, offset)})
+
+@app.route('/api/decks/by-hash/<content_hash>', methods=['GET'])
+def get_deck_by_hash(content_hash):
+    """Fetch the newest version with the given content hash"""
+    error = _deck_store_required()
+    if error:
+        return error
+    stored = deck_store.find_by_content(content_hash)
+    if stored is None:
+        return jsonify({'error': 'Deck not found.'}), 404
+    return jsonify(stored)
+
+@app.route('/api/decks/<deck_id>', methods=['GET'])
+@app.route('/api/decks/<deck_id>/versions/<int:version>', methods=['GET'])
+def get_deck(deck_id, version=None):
+    """Fetch a stored deck version (the latest by default) with its form data and metadata"""
+    error = _deck_store_required()
+    if error:
+        return error
+    stored = deck_store.get_version(deck_id, version)
+    if stored is None:
+        return jsonify({'error': 'Deck not found.'}), 404
+    return jsonify(stored)
+
+@app.route('/api/decks/<deck_id>/versions', methods=['GET'])
+def list_deck_versions(deck_id):
+    """List a deck's versions, oldest first"""
+    error = _deck_store_required()
+    if error:
+        return error
+    versions = deck_store.list_versions(deck_id)
+    if not versions:
+        return jsonify({'error': 'Deck not found.'}), 404
+    return jsonify({'deck_id': deck_id, 'versions': versions})
+
+@app.route('/api/decks/<deck_id>/diff', methods=['GET'])
+def diff_deck_versions(deck_id):
+    """Changed form fields and sections between ``?from=`` and ``?to=`` (default: the last two versions)"""
+    error = _deck_store_required()
+    if error:
+        return error
+    latest = deck_store.get_version(deck_id)
+    if latest is None:
+        return jsonify({'error': 'Deck not found.'}), 404
+    to_version = request.args.get('to', latest['version'], type=int)
+    from_version = request.args.get('from', max(to_version - 1, 1), type=int)
+    diff = deck_store.diff(deck_id, from_version, to_version)
+    if diff is None:
+        return jsonify({'error': 'Version not found.'}), 404
+    return jsonify(diff)
+
+@app.route('/api/decks/<deck_id>/versions/<int:version>/pptx', methods=['GET'])
+def get_deck_pptx(deck_id, version):
+    """Download a stored version as PPTX, rendering (and keeping) it on first request"""
+    error = _deck_store_required()
+    if error:
+        return error
+    try:
+        stored = deck_store.get_version(deck_id, version)
+        if stored is None:
+            return jsonify({'error': 'Deck not found.'}), 404
+        data = deck_store.get_artifact(deck_id, version, 'pptx')
+        if data is None:
+            from ppt_generator import render_ppt
+            data = render_ppt(stored['formData'], stored['deck']).getvalue()
+            deck_store.add_artifact(deck_id, version, 'pptx', data)
+        return send_file(
+            io.BytesIO(data),
+            mimetype=PPTX_MIMETYPE,
+            as_attachment=True,
+            download_name=f"{stored['formData']['startup_name'].replace(' ', '_')}_pitch_deck_v{version}.pptx"
+        )
+    except Exception as e:
+        print(f"Error rendering stored deck: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/artifacts/<artifact_id>', methods=['GET'])
+def get_artifact(artifact_id):
+    """Download a previously rendered deck from the artifact store"""
+    data = artifact_store.get(artifact_id) if artifact_store else None
+    if data is None:
+        return jsonify({'error': 'Artifact not found.'}), 404
+    return send_file(
+        io.BytesIO(data),
+        mimetype=PPTX_MIMETYPE,
+        as_attachment=True,
+        download_name=f"{artifact_id[:12]}.pptx"
+    )
+
+@app.route('/api/cache/stats', methods=['GET'])
+def cache_stats():
+    """Report response cache hit/miss counters for sizing the cache."""
+    return jsonify(response_cache.stats())
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Expose timings, error counts, cache and token counters in Prometheus text format"""
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
 if __name__ == '__main__':
     app.run(debug=True) 
\ No newline at end of file
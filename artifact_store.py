@@ -0,0 +1,106 @@
+import hashlib
+import os
+import re
+import tempfile
+import threading
+import time
+
+# Content-addressed storage for rendered decks. Disabled unless a directory is configured.
+ARTIFACT_STORE_DIR = os.getenv("ARTIFACT_STORE_DIR")
+ARTIFACT_STORE_MAX_BYTES = int(os.getenv("ARTIFACT_STORE_MAX_BYTES", str(500 * 1024 * 1024)))
+ARTIFACT_STORE_MAX_AGE = float(os.getenv("ARTIFACT_STORE_MAX_AGE", str(7 * 24 * 3600)))
+
+_DIGEST_RE = re.compile(r'^[0-9a-f]{64}$')
+
+
+class ArtifactStore:
+    """Stores blobs on disk under their sha256 digest.
+
+    Writes are atomic (temp file + rename), so several workers can share the
+    directory. After each write the store evicts files older than
+    ``max_age`` seconds, then the least recently used files until the total
+    size is under ``max_bytes``.
+    """
+
+    def __init__(self, root, max_bytes=ARTIFACT_STORE_MAX_BYTES, max_age=ARTIFACT_STORE_MAX_AGE):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, digest, suffix):
+        return os.path.join(self.root, f"{digest}{suffix}")
+
+    def put(self, data, suffix='.pptx', digest=None):
+        """Store ``data`` and return its digest.
+
+        ``digest`` stores the data under another sha256 key instead, such as
+        the hash of the inputs it was rendered from.
+        """
+        digest = digest or hashlib.sha256(data).hexdigest()
+        path = self._path(digest, suffix)
+        if os.path.exists(path):
+            os.utime(path)
+            return digest
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self.evict()
+        return digest
+
+    def get(self, digest, suffix='.pptx'):
+        """Return the stored bytes for ``digest``, or None if absent."""
+        if not _DIGEST_RE.match(digest or ''):
+            return None
+        path = self._path(digest, suffix)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        os.utime(path)  # mark as recently used
+        return data
+
+    def evict(self):
+        """Apply the age and size limits."""
+        with self._lock:
+            now = time.time()
+            entries = []
+            for entry in os.scandir(self.root):
+                if not entry.is_file() or entry.name.endswith('.tmp'):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                if now - stat.st_mtime > self.max_age:
+                    self._remove(entry.path)
+                else:
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                self._remove(path)
+                total -= size
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def create_artifact_store():
+    """Build the store from ARTIFACT_STORE_* settings, or None when disabled."""
+    return ArtifactStore(ARTIFACT_STORE_DIR) if ARTIFACT_STORE_DIR else None
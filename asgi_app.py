@@ -0,0 +1,204 @@
+"""Async (ASGI) serving mode for the generation API.
+
+Serves /api/generate-slide, /api/generate-full-deck and /api/generate-ppt
+with the same requests and responses as app.py, but Gemini calls are awaited
+on a shared aiohttp session instead of holding a thread each, so one worker
+keeps hundreds of generations in flight. PPTX rendering is CPU-bound and
+runs on a bounded thread pool (PPTX_RENDER_WORKERS) so it never blocks the
+event loop. Prompts, caching and rendering are shared with the Flask app,
+which remains the default.
+
+    uvicorn asgi_app:app --host 0.0.0.0 --port 5000 --workers 2
+    gunicorn -k uvicorn.workers.UvicornWorker asgi_app:app
+"""
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+from dotenv import load_dotenv
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse, PlainTextResponse, Response
+from starlette.routing import Route
+
+# Load environment variables before the modules that read them
+load_dotenv()
+
+from artifact_store import create_artifact_store
+from deck_service import (
+    GENERATION_MODES,
+    generate_deck_async,
+    generate_pitch_deck_section_async,
+    missing_required_fields,
+    response_cache,
+)
+from gemini_client import get_async_client
+from metrics import ERRORS, HTTP_REQUEST_SECONDS, registry
+
+# Threads rendering PPTX files at once; further renders queue for a free thread
+PPTX_RENDER_WORKERS = int(os.getenv("PPTX_RENDER_WORKERS", "2"))
+
+PPTX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.presentationml.presentation'
+
+artifact_store = create_artifact_store()
+render_executor = ThreadPoolExecutor(max_workers=PPTX_RENDER_WORKERS, thread_name_prefix='pptx')
+
+
+def _flag(value):
+    """Interpret a boolean flag sent as JSON or as a query string value."""
+    if isinstance(value, str):
+        return value.strip().lower() in ('1', 'true', 'yes', 'on')
+    return bool(value)
+
+
+def _error(message, status_code):
+    return JSONResponse({'error': message}, status_code=status_code)
+
+
+async def generate_slide(request):
+    data = await request.json()
+    section = data.get('section')
+    context = data.get('context', {})
+    bypass_cache = _flag(data.get('bypass_cache', request.query_params.get('bypass_cache')))
+
+    if not section:
+        return _error('Section is required', 400)
+
+    if not context.get('startup_name'):
+        return _error('Startup name is required', 400)
+
+    try:
+        content = await generate_pitch_deck_section_async(section, context, bypass_cache=bypass_cache)
+        return JSONResponse({
+            'section': section,
+            'content': content
+        })
+    except Exception as e:
+        print(f"Error in generate_slide: {str(e)}")
+        return _error(str(e), 500)
+
+
+async def generate_full_deck(request):
+    data = await request.json()
+    # Control flags are not part of the form context sent to Gemini
+    bypass_cache = _flag(data.pop('bypass_cache', request.query_params.get('bypass_cache')))
+    mode = data.pop('mode', None) or request.query_params.get('mode', 'sections')
+    if mode not in GENERATION_MODES:
+        return _error(f'Unknown generation mode: {mode}. Use one of: {", ".join(GENERATION_MODES)}', 400)
+
+    missing_fields = missing_required_fields(data)
+    if missing_fields:
+        return _error(f'Missing or empty required fields: {", ".join(missing_fields)}', 400)
+
+    try:
+        deck, info = await generate_deck_async(data, mode=mode, bypass_cache=bypass_cache)
+        return JSONResponse(deck, headers={
+            'X-Generation-Mode': mode,
+            'X-Fallback-Sections': ','.join(info['fallback_sections']),
+        })
+    except Exception as e:
+        print(f"Error in generate_full_deck: {str(e)}")
+        return _error(str(e), 500)
+
+
+def _render_and_store(form_data, generated_deck):
+    """Runs on the render pool: build the PPTX and keep a copy in the artifact store."""
+    from ppt_generator import render_ppt
+    data = render_ppt(form_data, generated_deck).getvalue()
+    return data, artifact_store.put(data) if artifact_store else None
+
+
+async def generate_powerpoint(request):
+    """Generate a PowerPoint presentation from the pitch deck data"""
+    try:
+        data = await request.json()
+        form_data = data.get('formData', {})
+        generated_deck = data.get('deck', {})
+
+        missing_fields = missing_required_fields(form_data)
+        if missing_fields:
+            return _error(f'Missing or empty required fields from formData: {", ".join(missing_fields)}', 400)
+
+        if not generated_deck:
+            return _error('Generated pitch deck content is missing.', 400)
+
+        loop = asyncio.get_running_loop()
+        ppt_bytes, artifact_id = await loop.run_in_executor(
+            render_executor, _render_and_store, form_data, generated_deck)
+
+        filename = f"{form_data['startup_name'].replace(' ', '_')}_pitch_deck.pptx"
+        headers = {'Content-Disposition': f'attachment; filename="{filename}"'}
+        if artifact_id:
+            headers['X-Artifact-Id'] = artifact_id
+        return Response(ppt_bytes, media_type=PPTX_MIMETYPE, headers=headers)
+
+    except Exception as e:
+        print(f"Error generating PowerPoint: {str(e)}")
+        return _error(str(e), 500)
+
+
+async def cache_stats(request):
+    """Report response cache hit/miss counters for sizing the cache."""
+    return JSONResponse(response_cache.stats())
+
+
+async def metrics(request):
+    """Expose timings, error counts, cache and token counters in Prometheus text format"""
+    return PlainTextResponse(registry.render(), media_type='text/plain; version=0.0.4')
+
+
+class RequestMetricsMiddleware:
+    """Record per-endpoint latency and count server errors, like app.py's request hooks."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+
+        started = time.perf_counter()
+        status = 500
+
+        async def _send(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, _send)
+        finally:
+            route = scope.get('route')
+            HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started,
+                                         endpoint=route.path if route else 'unmatched',
+                                         method=scope['method'], status=str(status))
+            if status >= 500:
+                ERRORS.inc(stage='http')
+
+
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    await get_async_client().aclose()
+    render_executor.shutdown(wait=False, cancel_futures=True)
+
+
+app = Starlette(
+    routes=[
+        Route('/api/generate-slide', generate_slide, methods=['POST']),
+        Route('/api/generate-full-deck', generate_full_deck, methods=['POST']),
+        Route('/api/generate-ppt', generate_powerpoint, methods=['POST']),
+        Route('/api/cache/stats', cache_stats, methods=['GET']),
+        Route('/metrics', metrics, methods=['GET']),
+    ],
+    middleware=[
+        Middleware(RequestMetricsMiddleware),
+        Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'],
+                   expose_headers=['X-Generation-Mode', 'X-Fallback-Sections', 'X-Artifact-Id']),
+    ],
+    lifespan=lifespan,
+)
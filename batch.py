@@ -0,0 +1,221 @@
+"""Generate pitch decks for many startups in one run.
+
+Reads form records from a JSONL or CSV file, generates each deck with
+bounded concurrency, renders the PPTX files and writes a JSONL results
+manifest next to them. Re-running with the same output directory resumes
+from the manifest: finished records are not regenerated, and for failed
+ones only the sections that failed are retried.
+
+    python batch.py startups.jsonl -o out/ --concurrency 4 --rate 60 --zip out.zip
+"""
+import argparse
+import csv
+import hashlib
+import io
+import json
+import os
+import re
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+import deck_service
+from deck_service import SLIDE_SECTIONS, generate_deck, generate_sections, missing_required_fields
+from rate_limiter import TokenBucket
+
+MANIFEST_NAME = 'manifest.jsonl'
+RECORDS_NAME = 'records.jsonl'
+DECKS_DIR = 'decks'
+ZIP_NAME = 'pitch_decks.zip'
+
+# Records processed at once; each record also fans out over its sections
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "4"))
+BATCH_SECTION_CONCURRENCY = int(os.getenv("BATCH_SECTION_CONCURRENCY", "2"))
+# Directory holding one output directory per batch submitted to /api/batch
+BATCH_OUTPUT_DIR = os.getenv("BATCH_OUTPUT_DIR", "batches")
+
+BATCH_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+
+def parse_records(text, fmt):
+    """Parse form records from JSONL or CSV text."""
+    if fmt == 'csv':
+        return [dict(row) for row in csv.DictReader(io.StringIO(text))]
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+def load_records(path):
+    """Load form records from a .jsonl/.json-lines or .csv file."""
+    fmt = 'csv' if path.lower().endswith('.csv') else 'jsonl'
+    with open(path, encoding='utf-8') as f:
+        return parse_records(f.read(), fmt)
+
+
+def record_id(record):
+    """Stable id for a record: its own ``id`` field, else a hash of its contents."""
+    if record.get('id'):
+        return str(record['id'])
+    canonical = json.dumps(record, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()[:16]
+
+
+def read_manifest(path):
+    """Return the latest manifest entry per record id."""
+    entries = {}
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    entries[entry['id']] = entry
+    return entries
+
+
+def _deck_filename(record, rid):
+    slug = re.sub(r'[^A-Za-z0-9_-]+', '_', str(record.get('startup_name', 'deck'))).strip('_') or 'deck'
+    return f"{slug}_{rid[:8]}.pptx"
+
+
+class BatchRunner:
+    """Runs one batch into ``output_dir``, appending to its manifest as records finish."""
+
+    def __init__(self, output_dir, concurrency=BATCH_MAX_CONCURRENCY,
+                 section_concurrency=BATCH_SECTION_CONCURRENCY, mode='sections'):
+        self.output_dir = output_dir
+        self.concurrency = concurrency
+        self.section_concurrency = section_concurrency
+        self.mode = mode
+        self.manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+        self._manifest_lock = threading.Lock()
+        os.makedirs(os.path.join(output_dir, DECKS_DIR), exist_ok=True)
+
+    def save_records(self, records):
+        """Keep the batch's input next to its manifest, so it can be resumed by id alone."""
+        with open(os.path.join(self.output_dir, RECORDS_NAME), 'w', encoding='utf-8') as f:
+            f.write(''.join(json.dumps(record) + '\n' for record in records))
+
+    def load_records(self):
+        """The records saved by ``save_records``, or None."""
+        path = os.path.join(self.output_dir, RECORDS_NAME)
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding='utf-8') as f:
+            return parse_records(f.read(), 'jsonl')
+
+    def _append(self, entry):
+        with self._manifest_lock:
+            with open(self.manifest_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry) + '\n')
+                f.flush()
+
+    def _render(self, record, deck, filename):
+        from ppt_generator import render_ppt
+        path = os.path.join(self.output_dir, DECKS_DIR, filename)
+        with open(path, 'wb') as f:
+            f.write(render_ppt(record, deck).getvalue())
+        return os.path.join(DECKS_DIR, filename)
+
+    def _process(self, index, record, previous):
+        rid = record_id(record)
+        entry = {'id': rid, 'index': index, 'startup_name': record.get('startup_name')}
+        started = time.perf_counter()
+
+        # Finished in an earlier run: keep it, re-rendering only if the file is gone
+        if previous and previous.get('status') == 'ok':
+            if not os.path.exists(os.path.join(self.output_dir, previous['pptx'])):
+                self._render(record, previous['deck'], os.path.basename(previous['pptx']))
+            return dict(previous, index=index)
+
+        missing_fields = missing_required_fields(record)
+        if missing_fields:
+            entry.update(status='invalid', error=f'Missing or empty required fields: {", ".join(missing_fields)}')
+            self._append(entry)
+            return entry
+
+        try:
+            if previous and previous.get('deck') and previous.get('failed_sections'):
+                # Retry only the sections that failed last time
+                failed = []
+                deck = dict(previous['deck'])
+                deck.update(generate_sections(previous['failed_sections'], record,
+                                              max_workers=self.section_concurrency, failed=failed))
+                failed_sections = [section for section in SLIDE_SECTIONS if section in failed]
+            else:
+                deck, info = generate_deck(record, mode=self.mode, max_workers=self.section_concurrency)
+                failed_sections = info['failed_sections']
+
+            entry['deck'] = deck
+            entry['failed_sections'] = failed_sections
+            if failed_sections:
+                entry.update(status='failed', error=f'Failed sections: {", ".join(failed_sections)}')
+            else:
+                entry['pptx'] = self._render(record, deck, _deck_filename(record, rid))
+                entry['status'] = 'ok'
+        except Exception as e:
+            print(f"Error processing batch record {index}: {str(e)}")
+            entry.update(status='failed', error=str(e))
+
+        entry['elapsed_s'] = round(time.perf_counter() - started, 3)
+        self._append(entry)
+        return entry
+
+    def run(self, records, progress=None):
+        """Process ``records`` and return their manifest entries in input order."""
+        previous = read_manifest(self.manifest_path)
+
+        def _run(item):
+            index, record = item
+            entry = self._process(index, record, previous.get(record_id(record)))
+            if progress:
+                progress(entry)
+            return entry
+
+        with ThreadPoolExecutor(max_workers=max(1, self.concurrency)) as executor:
+            return list(executor.map(_run, enumerate(records)))
+
+    def write_zip(self, entries, target):
+        """Write the rendered decks plus a manifest of this run's entries to ``target``."""
+        with zipfile.ZipFile(target, 'w', zipfile.ZIP_DEFLATED) as zf:
+            for entry in entries:
+                if entry.get('status') == 'ok':
+                    zf.write(os.path.join(self.output_dir, entry['pptx']), entry['pptx'])
+            zf.writestr(MANIFEST_NAME, ''.join(json.dumps(entry) + '\n' for entry in entries))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate pitch decks for a JSONL/CSV file of startups')
+    parser.add_argument('input', help='JSONL or CSV file of form records')
+    parser.add_argument('-o', '--output-dir', required=True, help='directory for decks and manifest; reused to resume')
+    parser.add_argument('--zip', help='also write a zip of the decks and manifest to this path')
+    parser.add_argument('--concurrency', type=int, default=BATCH_MAX_CONCURRENCY, help='records processed at once')
+    parser.add_argument('--section-concurrency', type=int, default=BATCH_SECTION_CONCURRENCY,
+                        help='sections generated at once per record')
+    parser.add_argument('--rate', type=float, help='global limit on Gemini requests per minute')
+    parser.add_argument('--mode', choices=deck_service.GENERATION_MODES, default='sections')
+    args = parser.parse_args()
+
+    if args.rate:
+        deck_service.set_rate_limiter(TokenBucket.per_minute(args.rate))
+
+    records = load_records(args.input)
+    runner = BatchRunner(args.output_dir, concurrency=args.concurrency,
+                         section_concurrency=args.section_concurrency, mode=args.mode)
+
+    def _progress(entry):
+        print(f"[{entry['index'] + 1}/{len(records)}] {entry.get('startup_name')}: {entry['status']}"
+              + (f" ({entry['error']})" if entry.get('error') else ''))
+
+    entries = runner.run(records, progress=_progress)
+    if args.zip:
+        runner.write_zip(entries, args.zip)
+
+    counts = {}
+    for entry in entries:
+        counts[entry['status']] = counts.get(entry['status'], 0) + 1
+    print(', '.join(f"{status}: {count}" for status, count in sorted(counts.items())))
+    return 0 if all(entry['status'] == 'ok' for entry in entries) else 1
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,72 @@
+"""Wall-clock benchmark for /api/generate-full-deck against a mock Gemini.
+
+Compares sequential section generation (max_workers=1) with the concurrent
+fan-out used by the endpoint, and the per-section mode with the single-call
+batched mode. Upstream calls and prompt characters are counted by the mock.
+
+    python benchmarks/bench_full_deck.py --latency 0.5 --concurrency 1 5 10
+    python benchmarks/bench_full_deck.py --mode sections batched
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mock_gemini import reset_stats, start_mock_server, server_url
+
+SAMPLE_FORM = {
+    'startup_name': 'ReSource',
+    'problem': 'Small manufacturers throw away usable offcuts and surplus stock.',
+    'solution': 'A marketplace that matches surplus materials with nearby buyers.',
+    'target_audience': 'SME manufacturers and makers',
+    'industry': 'Circular economy',
+    'revenue_model': 'Transaction fees',
+    'stage': 'Seed',
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--latency', type=float, default=0.5, help='mock seconds per Gemini call')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 5, 10])
+    parser.add_argument('--mode', nargs='+', default=['sections'], choices=['sections', 'batched'])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    server = start_mock_server(latency=args.latency)
+    os.environ['GEMINI_API_BASE'] = server_url(server)
+    os.environ.setdefault('GEMINI_API_KEY', 'benchmark')
+    # Keep benchmark decks out of the working directory's deck store
+    scratch = tempfile.TemporaryDirectory()
+    os.environ['DECK_STORE_PATH'] = os.path.join(scratch.name, 'decks.sqlite3')
+
+    import app
+    import deck_service
+
+    print(f"mock latency: {args.latency:.2f}s per call, {len(deck_service.SLIDE_SECTIONS)} sections")
+    client = app.app.test_client()
+    for mode in args.mode:
+        for workers in args.concurrency:
+            deck_service.MAX_CONCURRENCY = workers
+            timings = []
+            reset_stats(server)
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                response = client.post(f'/api/generate-full-deck?mode={mode}&bypass_cache=1', json=SAMPLE_FORM)
+                timings.append(time.perf_counter() - start)
+                assert response.status_code == 200, response.get_data(as_text=True)
+            best = min(timings)
+            print(f"mode={mode:<8} max_concurrency={workers:>3}  best {best:6.2f}s  "
+                  f"mean {sum(timings) / len(timings):6.2f}s  "
+                  f"calls/deck {server.calls / args.repeat:4.1f}  "
+                  f"prompt chars/deck {server.prompt_chars // args.repeat}")
+
+    server.shutdown()
+    scratch.cleanup()
+
+
+if __name__ == '__main__':
+    main()
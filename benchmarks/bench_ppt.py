@@ -0,0 +1,110 @@
+"""Microbenchmarks for PPTX rendering with PitchDeckGenerator.
+
+Times each rendering step on its own (template load, title and content
+slides, laying out a long section, full deck build, save, patching one
+section) plus end-to-end render_ppt throughput in decks/second. No Gemini
+calls are involved.
+
+    python benchmarks/bench_ppt.py --iterations 50 --output ppt.json
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ppt_generator import BODY_FONT_SIZE, PitchDeckGenerator, patch_ppt, render_ppt
+from slide_layout import layout_text
+from results import summarize, write_results
+
+SECTIONS = ['cover', 'problem', 'solution', 'market', 'product', 'business_model',
+            'competition', 'team', 'traction', 'funding_needs']
+
+SAMPLE_FORM = {
+    'startup_name': 'ReSource',
+    'problem': 'Small manufacturers throw away usable offcuts and surplus stock.',
+    'solution': 'A marketplace that matches surplus materials with nearby buyers.',
+    'target_audience': 'SME manufacturers and makers',
+    'industry': 'Circular economy',
+    'revenue_model': 'Transaction fees',
+    'stage': 'Seed',
+}
+
+SAMPLE_DECK = {
+    section: "\n".join(f"- Key point {i} about {section.replace('_', ' ')}" for i in range(1, 6))
+    for section in SECTIONS
+}
+
+# Markdown long enough to be split across continuation slides
+LONG_SECTION = "## Market size\n" + "\n".join(
+    f"- **Segment {i}:** growing demand across regions, driven by regulation and rising material costs"
+    f"\n  - {i * 3 + 2}% of SME spend is on raw materials" for i in range(12))
+
+
+def _built_generator():
+    generator = PitchDeckGenerator()
+    generator.generate_pitch_deck(SAMPLE_FORM, SAMPLE_DECK)
+    return generator
+
+
+def benchmarks():
+    """Name -> (setup, run); ``run(setup())`` is the timed part."""
+    rendered = render_ppt(SAMPLE_FORM, SAMPLE_DECK).getvalue()
+    text_box = PitchDeckGenerator().text_box
+    return {
+        'template_load': (lambda: None, lambda _: PitchDeckGenerator()),
+        'title_slide': (PitchDeckGenerator, lambda g: g._create_title_slide('ReSource', 'Tagline')),
+        'content_slide_bullets': (PitchDeckGenerator,
+                                  lambda g: g._create_content_slide('The Problem', SAMPLE_DECK['problem'], 'problem')),
+        'content_slide_text': (PitchDeckGenerator,
+                               lambda g: g._create_content_slide('Our Team', SAMPLE_DECK['team'], 'team')),
+        'content_slide_long': (PitchDeckGenerator,
+                               lambda g: g._create_content_slide('Market Opportunity', LONG_SECTION, 'market')),
+        # Fit estimate for a long section without the layout cache
+        'layout_long_section': (layout_text.cache_clear,
+                                lambda _: layout_text(LONG_SECTION, True, text_box, BODY_FONT_SIZE)),
+        'build_deck': (PitchDeckGenerator, lambda g: g.generate_pitch_deck(SAMPLE_FORM, SAMPLE_DECK)),
+        'save': (_built_generator, lambda g: g.to_bytes()),
+        'patch_one_section': (lambda: rendered, lambda data: patch_ppt(data, {'team': '- New team member'})),
+        'render_ppt': (lambda: None, lambda _: render_ppt(SAMPLE_FORM, SAMPLE_DECK)),
+    }
+
+
+def run(name, setup, fn, iterations):
+    timings = []
+    for _ in range(iterations):
+        state = setup()
+        start = time.perf_counter()
+        fn(state)
+        timings.append(time.perf_counter() - start)
+    return {'name': name, 'iterations': iterations,
+            'ops_per_s': round(iterations / sum(timings), 2), **summarize(timings)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--iterations', '--decks', type=int, default=50)
+    parser.add_argument('--only', nargs='+', help='run only these benchmarks')
+    parser.add_argument('--output', help='result JSON path (default: benchmarks/results/)')
+    parser.add_argument('--no-save', action='store_true', help='print results without writing JSON')
+    args = parser.parse_args()
+
+    render_ppt(SAMPLE_FORM, SAMPLE_DECK)  # warm-up: imports and template preparation
+
+    results = []
+    for name, (setup, fn) in benchmarks().items():
+        if args.only and name not in args.only:
+            continue
+        result = run(name, setup, fn, args.iterations)
+        results.append(result)
+        print(f"{name:<22} {result['ops_per_s']:8.1f} ops/s  p50 {result['p50_ms']:7.2f}ms  "
+              f"p95 {result['p95_ms']:7.2f}ms  p99 {result['p99_ms']:7.2f}ms")
+
+    if not args.no_save:
+        params = {'iterations': args.iterations, 'only': args.only}
+        print(f"results written to {write_results('bench_ppt', params, results, args.output)}")
+
+
+if __name__ == '__main__':
+    main()
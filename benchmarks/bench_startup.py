@@ -0,0 +1,126 @@
+"""Cold-start benchmark: import time and time to first response.
+
+Each run starts a fresh interpreter, so nothing is cached in-process. The
+import is done without GEMINI_API_KEY to check that startup does not need
+it; the first request (and first PPTX render) then run against a mock
+Gemini. The slowest imports come from ``python -X importtime``.
+
+    python benchmarks/bench_startup.py --runs 5
+    python benchmarks/bench_startup.py --modules app asgi_app
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_ppt import SAMPLE_DECK, SAMPLE_FORM
+from mock_gemini import server_url, start_mock_server
+from results import write_results
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Heavy dependencies that should only load when a request needs them
+DEFERRED_MODULES = ('pptx', 'requests', 'aiohttp')
+
+# Runs in the child interpreter; prints one JSON line of timings
+CHILD_SCRIPT = '''
+import json, os, sys, time
+started = time.perf_counter()
+module = __import__(sys.argv[1])
+imported = time.perf_counter() - started
+loaded = [name for name in sys.argv[2].split(',') if name in sys.modules]
+
+os.environ['GEMINI_API_KEY'] = 'benchmark'
+requests_ = json.loads(sys.argv[3])
+if sys.argv[1] == 'asgi_app':
+    from starlette.testclient import TestClient
+    client = TestClient(module.app).__enter__()
+else:
+    client = module.app.test_client()
+timings = {}
+for name, path, body in requests_:
+    start = time.perf_counter()
+    response = client.post(path, json=body)
+    assert response.status_code == 200, response.text if hasattr(response, 'text') else response.data
+    timings[name] = time.perf_counter() - start
+print(json.dumps({'import_s': imported, 'loaded_at_import': loaded, 'first_requests_s': timings,
+                  'to_first_response_s': imported + timings['first_slide']}))
+'''
+
+
+def _run_child(module, env, requests_):
+    out = subprocess.run(
+        [sys.executable, '-c', CHILD_SCRIPT, module, ','.join(DEFERRED_MODULES), json.dumps(requests_)],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def slowest_imports(module, env, top):
+    """Top ``top`` modules by cumulative import time (microseconds), from -X importtime."""
+    out = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                         cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        rows.append({'module': name.strip(), 'self_us': int(self_us), 'cumulative_us': int(cumulative_us)})
+    rows.sort(key=lambda row: row['cumulative_us'], reverse=True)
+    return rows[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--modules', nargs='+', default=['app'], help='app modules to start')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15, help='slowest imports to report')
+    parser.add_argument('--output', help='result JSON path (default: benchmarks/results/)')
+    args = parser.parse_args()
+
+    server = start_mock_server(latency=0)
+    # The children run in the repo root; keep their deck store out of it
+    scratch = tempfile.TemporaryDirectory()
+    env = dict(os.environ, GEMINI_API_BASE=server_url(server), PYTHONDONTWRITEBYTECODE='1',
+               DECK_STORE_PATH=os.path.join(scratch.name, 'decks.sqlite3'))
+    env.pop('GEMINI_API_KEY', None)
+    requests_ = [
+        ('first_slide', '/api/generate-slide',
+         {'section': 'problem', 'context': SAMPLE_FORM, 'bypass_cache': True}),
+        ('first_ppt', '/api/generate-ppt', {'formData': SAMPLE_FORM, 'deck': SAMPLE_DECK}),
+    ]
+
+    results = []
+    for module in args.modules:
+        runs = [_run_child(module, env, requests_) for _ in range(args.runs)]
+        result = {
+            'module': module,
+            'runs': args.runs,
+            'import_ms': round(statistics.median(run['import_s'] for run in runs) * 1000, 1),
+            'to_first_response_ms': round(statistics.median(run['to_first_response_s'] for run in runs) * 1000, 1),
+            'first_requests_ms': {
+                name: round(statistics.median(run['first_requests_s'][name] for run in runs) * 1000, 1)
+                for name, _, _ in requests_
+            },
+            'loaded_at_import': runs[0]['loaded_at_import'],
+            'slowest_imports': slowest_imports(module, env, args.top),
+        }
+        results.append(result)
+        print(f"{module}: import {result['import_ms']:.0f}ms, first response {result['to_first_response_ms']:.0f}ms, "
+              + ', '.join(f"{name} {ms:.0f}ms" for name, ms in result['first_requests_ms'].items())
+              + f"; heavy modules loaded at import: {', '.join(result['loaded_at_import']) or 'none'}")
+        for row in result['slowest_imports'][:5]:
+            print(f"    {row['cumulative_us'] / 1000:7.1f}ms  {row['module']}")
+
+    params = {key: value for key, value in vars(args).items() if key != 'output'}
+    print(f"results written to {write_results('bench_startup', params, results, args.output)}")
+    server.shutdown()
+    scratch.cleanup()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""Compare two benchmark result files and flag regressions.
+
+Rows are matched by benchmark name (bench_ppt), module (bench_startup) or
+endpoint and concurrency (load_test). A row regresses when its latency (p95,
+or import time for startup runs) grows, or its throughput drops, by more
+than ``--threshold`` percent.
+
+    python benchmarks/compare.py results/old.json results/new.json --threshold 10
+"""
+import argparse
+import json
+
+
+def _rows(data):
+    rows = {}
+    for row in data['results']:
+        key = row.get('name') or row.get('module') or f"{row['endpoint']} c={row['concurrency']}"
+        rows[key] = row
+    return rows
+
+
+def _change(old, new):
+    if not old or new is None:
+        return None
+    return (new - old) / old * 100
+
+
+def compare(old, new, threshold):
+    """Return ``(lines, regressed)`` for a printable comparison."""
+    old_rows, new_rows = _rows(old), _rows(new)
+    lines = [f"{'benchmark':<32} {'latency ms':>19} {'change':>8} {'throughput':>21} {'change':>8}"]
+    regressed = False
+    for key in old_rows.keys() & new_rows.keys():
+        before, after = old_rows[key], new_rows[key]
+        rate = 'ops_per_s' if 'ops_per_s' in after else 'throughput_rps'
+        latency = 'import_ms' if 'import_ms' in after else 'p95_ms'
+        latency_change = _change(before.get(latency), after.get(latency))
+        rate_change = _change(before.get(rate), after.get(rate))
+        flag = ((latency_change is not None and latency_change > threshold)
+                or (rate_change is not None and rate_change < -threshold))
+        regressed = regressed or flag
+        lines.append(
+            f"{key:<32} {before.get(latency) or 0:>9.2f} -> {after.get(latency) or 0:<6.2f} "
+            f"{latency_change or 0:>+7.1f}% {before.get(rate) or 0:>9.2f} -> {after.get(rate) or 0:<8.2f} "
+            f"{rate_change or 0:>+7.1f}%" + ('  REGRESSION' if flag else ''))
+    lines[1:] = sorted(lines[1:])
+    return lines, regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('old')
+    parser.add_argument('new')
+    parser.add_argument('--threshold', type=float, default=10.0, help='allowed change in percent')
+    args = parser.parse_args()
+
+    with open(args.old, encoding='utf-8') as f:
+        old = json.load(f)
+    with open(args.new, encoding='utf-8') as f:
+        new = json.load(f)
+    if old['benchmark'] != new['benchmark']:
+        parser.error(f"cannot compare {old['benchmark']} results with {new['benchmark']} results")
+
+    print(f"{old['environment']['git_commit']} -> {new['environment']['git_commit']}")
+    lines, regressed = compare(old, new, args.threshold)
+    print('\n'.join(lines))
+    return 1 if regressed else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
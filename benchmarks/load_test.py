@@ -0,0 +1,195 @@
+"""Load driver for the generation and rendering endpoints against a mock Gemini.
+
+Sends ``--requests`` requests to each endpoint at each ``--concurrency``
+level and reports p50/p95/p99 latency, throughput and error counts, plus the
+upstream calls, 500s and 429s the mock saw. Results are written as JSON
+(see results.py) so runs from different versions can be compared.
+
+By default the Flask app runs in-process; ``--app asgi`` serves asgi_app.py
+with uvicorn in-process instead. With ``--url`` the requests go to a running
+server, which must be started with GEMINI_API_BASE pointing at this
+driver's mock (fix its port with ``--mock-port``).
+
+    python benchmarks/load_test.py --concurrency 1 4 16 --requests 40
+    python benchmarks/load_test.py --app asgi --concurrency 16 64 256 --endpoints generate-full-deck
+    python benchmarks/load_test.py --distribution lognormal --error-rate 0.05 --throttle-rate 0.05
+    python benchmarks/load_test.py --url http://127.0.0.1:5000 --mock-port 8765
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_ppt import SAMPLE_DECK, SAMPLE_FORM
+from mock_gemini import LATENCY_DISTRIBUTIONS, reset_stats, server_stats, server_url, start_mock_server
+from results import summarize, write_results
+
+ENDPOINTS = ('generate-slide', 'generate-full-deck', 'generate-ppt')
+
+
+def build_request(endpoint, index, mode):
+    """Path and JSON body for request ``index``.
+
+    Startup names are made unique per request so that neither the response
+    cache nor in-flight coalescing hides upstream calls.
+    """
+    form = dict(SAMPLE_FORM, startup_name=f"{SAMPLE_FORM['startup_name']} {index}")
+    if endpoint == 'generate-slide':
+        return '/api/generate-slide', {'section': 'problem', 'context': form, 'bypass_cache': True}
+    if endpoint == 'generate-full-deck':
+        return f'/api/generate-full-deck?mode={mode}', dict(form, bypass_cache=True)
+    return '/api/generate-ppt', {'formData': form, 'deck': SAMPLE_DECK}
+
+
+class InProcessTarget:
+    """Calls the Flask app through its test client, one client per thread."""
+
+    def __init__(self):
+        import app
+        self.app = app.app
+        self._local = threading.local()
+
+    def post(self, path, body):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        response = client.post(path, json=body)
+        response.get_data()
+        return response.status_code
+
+
+class HTTPTarget:
+    """Calls a running server over HTTP, one pooled session per thread."""
+
+    def __init__(self, base_url):
+        import requests
+        self._requests = requests
+        self.base_url = base_url.rstrip('/')
+        self._local = threading.local()
+
+    def post(self, path, body):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = self._requests.Session()
+        try:
+            response = session.post(self.base_url + path, json=body, timeout=300)
+        except self._requests.RequestException:
+            return 0
+        return response.status_code
+
+
+def start_asgi_server():
+    """Serve asgi_app with uvicorn on a free local port; return its base URL."""
+    import socket
+    import uvicorn
+    import asgi_app
+
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(asgi_app.app, host='127.0.0.1', port=port,
+                                           log_level='warning', backlog=1024))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}"
+
+
+def run_level(target, endpoint, concurrency, requests, mode, server):
+    """Send ``requests`` requests with ``concurrency`` in flight; return the level's stats."""
+    reset_stats(server)
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+
+    def _one(index):
+        path, body = build_request(endpoint, index, mode)
+        start = time.perf_counter()
+        status = target.post(path, body)
+        elapsed = time.perf_counter() - start
+        with lock:
+            statuses[status] = statuses.get(status, 0) + 1
+            if 200 <= status < 300:
+                latencies.append(elapsed)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(_one, range(requests)))
+    wall = time.perf_counter() - start
+
+    return {
+        'endpoint': endpoint,
+        'concurrency': concurrency,
+        'requests': requests,
+        'ok': len(latencies),
+        'errors': requests - len(latencies),
+        'status_counts': {str(status): count for status, count in sorted(statuses.items())},
+        'wall_s': round(wall, 3),
+        'throughput_rps': round(len(latencies) / wall, 3) if wall else None,
+        **summarize(latencies),
+        'upstream': server_stats(server),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--endpoints', nargs='+', choices=ENDPOINTS, default=list(ENDPOINTS))
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--requests', type=int, default=40, help='requests per endpoint and concurrency level')
+    parser.add_argument('--mode', choices=['sections', 'batched'], default='sections',
+                        help='generation mode for generate-full-deck')
+    parser.add_argument('--app', choices=['flask', 'asgi'], default='flask', help='app to run in-process')
+    parser.add_argument('--url', help='base URL of a running server instead of an in-process app')
+    parser.add_argument('--latency', type=float, default=0.2, help='mock seconds per Gemini call')
+    parser.add_argument('--distribution', choices=LATENCY_DISTRIBUTIONS, default='lognormal')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of Gemini calls failing with 500')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='fraction of Gemini calls answered with 429')
+    parser.add_argument('--retry-after', type=int, default=1)
+    parser.add_argument('--mock-port', type=int, default=0)
+    parser.add_argument('--output', help='result JSON path (default: benchmarks/results/)')
+    args = parser.parse_args()
+
+    server = start_mock_server(latency=args.latency, port=args.mock_port, distribution=args.distribution,
+                               error_rate=args.error_rate, throttle_rate=args.throttle_rate,
+                               retry_after=args.retry_after)
+    os.environ['GEMINI_API_BASE'] = server_url(server)
+    os.environ.setdefault('GEMINI_API_KEY', 'benchmark')
+    # Keep benchmark decks out of the working directory's deck store
+    scratch = tempfile.TemporaryDirectory()
+    os.environ['DECK_STORE_PATH'] = os.path.join(scratch.name, 'decks.sqlite3')
+    print(f"mock Gemini at {server_url(server)}: {args.distribution} latency {args.latency:.2f}s, "
+          f"error rate {args.error_rate:.0%}, 429 rate {args.throttle_rate:.0%}")
+
+    if args.url:
+        target = HTTPTarget(args.url)
+    elif args.app == 'asgi':
+        target = HTTPTarget(start_asgi_server())
+    else:
+        target = InProcessTarget()
+    for endpoint in args.endpoints:  # warm-up: imports, template preparation, connection pools
+        target.post(*build_request(endpoint, -1, args.mode))
+
+    results = []
+    for endpoint in args.endpoints:
+        for concurrency in args.concurrency:
+            level = run_level(target, endpoint, concurrency, args.requests, args.mode, server)
+            results.append(level)
+            print(f"{endpoint:<19} c={concurrency:<3} {level['throughput_rps'] or 0:7.2f} req/s  "
+                  f"p50 {level['p50_ms'] or 0:8.1f}ms  p95 {level['p95_ms'] or 0:8.1f}ms  "
+                  f"p99 {level['p99_ms'] or 0:8.1f}ms  errors {level['errors']}  "
+                  f"upstream calls {level['upstream']['calls']} (500s {level['upstream']['errors']}, "
+                  f"429s {level['upstream']['throttled']})")
+
+    params = {key: value for key, value in vars(args).items() if key != 'output'}
+    print(f"results written to {write_results('load_test', params, results, args.output)}")
+    server.shutdown()
+    scratch.cleanup()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,241 @@
+"""Local stand-in for the Gemini generateContent endpoint.
+
+Used by the benchmarks so they can run offline and without a GEMINI_API_KEY.
+Point the backend at it with GEMINI_API_BASE=http://127.0.0.1:<port>.
+
+Response latency follows a configurable distribution around ``latency``, and
+a fraction of calls can be failed with a 500 (``error_rate``) or throttled
+with a 429 and Retry-After (``throttle_rate``) to exercise the retry path.
+
+Token counts cover the prompt and the system instruction. POST /cachedContents
+stores a system instruction and returns its name; requests that reference it
+report those tokens as cachedContentTokenCount, as Gemini does.
+"""
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def usage_metadata(prompt, text, cached_tokens=0):
+    """Approximate Gemini token accounting (~4 characters per token).
+
+    ``cached_tokens`` come from a cached content and are included in the
+    prompt count, as Gemini reports them.
+    """
+    prompt_tokens = max(1, len(prompt) // 4) + cached_tokens
+    candidate_tokens = max(1, len(text) // 4)
+    usage = {
+        'promptTokenCount': prompt_tokens,
+        'candidatesTokenCount': candidate_tokens,
+        'totalTokenCount': prompt_tokens + candidate_tokens,
+    }
+    if cached_tokens:
+        usage['cachedContentTokenCount'] = cached_tokens
+    return usage
+
+
+def _parts_text(content):
+    return ''.join(part.get('text', '') for part in (content or {}).get('parts', []))
+
+
+def request_prompt(body):
+    """The text a generateContent request is billed for, outside any cached content."""
+    contents = ''.join(_parts_text(content) for content in body.get('contents', []))
+    return _parts_text(body.get('systemInstruction')) + contents
+
+
+LATENCY_DISTRIBUTIONS = ('fixed', 'uniform', 'exponential', 'lognormal')
+
+
+def sample_latency(latency, distribution='fixed'):
+    """Draw one response latency with mean (or, for lognormal, median) ``latency``."""
+    if latency <= 0:
+        return 0.0
+    if distribution == 'uniform':
+        return random.uniform(0, 2 * latency)
+    if distribution == 'exponential':
+        return random.expovariate(1 / latency)
+    if distribution == 'lognormal':
+        # Median ``latency`` with a long right tail, like real model calls
+        return random.lognormvariate(0, 0.5) * latency
+    return latency
+
+
+class MockGeminiHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out in separate writes; with Nagle on, keep-alive
+    # clients see an extra ~40ms delayed-ACK stall on every response
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = json.loads(self.rfile.read(length) or b'{}')
+        if self._inject_failure():
+            return
+        if self.path.split('?')[0].endswith('/cachedContents'):
+            return self._create_cached_content(body)
+        if ':streamGenerateContent' in self.path:
+            return self._stream(body)
+        time.sleep(sample_latency(self.server.latency, self.server.distribution))
+
+        prompt = request_prompt(body)
+        with self.server.lock:
+            self.server.calls += 1
+            self.server.prompt_chars += len(prompt)
+
+        text = f"- Mock content ({len(prompt)} prompt chars)"
+        schema = body.get('generationConfig', {}).get('responseSchema')
+        if schema:
+            # Structured output: one string per schema property
+            text = json.dumps({key: text for key in schema.get('properties', {})})
+        payload = json.dumps({
+            'candidates': [{
+                'content': {'parts': [{'text': text}]}
+            }],
+            'usageMetadata': usage_metadata(prompt, text, self._cached_tokens(body)),
+        }).encode('utf-8')
+        self._send_json(payload)
+
+    def _send_json(self, payload):
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _create_cached_content(self, body):
+        """Store the system instruction of a cachedContents request under a new name."""
+        tokens = max(1, len(_parts_text(body.get('systemInstruction'))) // 4)
+        with self.server.lock:
+            name = f"cachedContents/mock-{len(self.server.cached_contents) + 1}"
+            self.server.cached_contents[name] = tokens
+        self._send_json(json.dumps({'name': name, 'model': body.get('model'),
+                                    'usageMetadata': {'totalTokenCount': tokens}}).encode('utf-8'))
+
+    def _cached_tokens(self, body):
+        with self.server.lock:
+            return self.server.cached_contents.get(body.get('cachedContent'), 0)
+
+    def _inject_failure(self):
+        """Answer with an injected 429 or 500 instead of content; True if one was sent."""
+        roll = random.random()
+        if roll < self.server.throttle_rate:
+            status, headers = 429, {'Retry-After': str(self.server.retry_after)}
+        elif roll < self.server.throttle_rate + self.server.error_rate:
+            status, headers = 500, {}
+            # Failures still take time, otherwise retries are unrealistically cheap
+            time.sleep(sample_latency(self.server.latency, self.server.distribution) / 2)
+        else:
+            return False
+
+        with self.server.lock:
+            if status == 429:
+                self.server.throttled += 1
+            else:
+                self.server.errors += 1
+        payload = json.dumps({'error': {'code': status, 'message': 'Injected by mock_gemini'}}).encode('utf-8')
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+        return True
+
+    def _stream(self, body):
+        """Answer streamGenerateContent?alt=sse with a few chunks spread over the latency."""
+        prompt = request_prompt(body)
+        with self.server.lock:
+            self.server.calls += 1
+            self.server.prompt_chars += len(prompt)
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        chunks = ['- Mock ', 'streamed ', f"content ({len(prompt)} prompt chars)"]
+        latency = sample_latency(self.server.latency, self.server.distribution)
+        for chunk in chunks:
+            time.sleep(latency / len(chunks))
+            event = {
+                'candidates': [{'content': {'parts': [{'text': chunk}]}}],
+                'usageMetadata': usage_metadata(prompt, ''.join(chunks[:chunks.index(chunk) + 1]),
+                                                self._cached_tokens(body)),
+            }
+            data = f"data: {json.dumps(event)}\r\n\r\n".encode('utf-8')
+            self.wfile.write(f"{len(data):x}\r\n".encode('ascii') + data + b"\r\n")
+            self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MockGeminiServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Load tests open hundreds of connections at once; the default backlog of 5 drops them
+    request_queue_size = 1024
+
+
+def start_mock_server(latency=0.5, host='127.0.0.1', port=0, distribution='fixed',
+                      error_rate=0.0, throttle_rate=0.0, retry_after=1):
+    """Start the mock server in a background thread and return it."""
+    if distribution not in LATENCY_DISTRIBUTIONS:
+        raise ValueError(f"Unknown latency distribution: {distribution}")
+    server = MockGeminiServer((host, port), MockGeminiHandler)
+    server.latency = latency
+    server.distribution = distribution
+    server.error_rate = error_rate
+    server.throttle_rate = throttle_rate
+    server.retry_after = retry_after
+    server.lock = threading.Lock()
+    server.cached_contents = {}
+    reset_stats(server)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def reset_stats(server):
+    with server.lock:
+        server.calls = 0
+        server.prompt_chars = 0
+        server.errors = 0
+        server.throttled = 0
+
+
+def server_stats(server):
+    with server.lock:
+        return {'calls': server.calls, 'prompt_chars': server.prompt_chars,
+                'errors': server.errors, 'throttled': server.throttled}
+
+
+def server_url(server):
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}"
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Run a mock Gemini API server')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.5, help='seconds per response')
+    parser.add_argument('--distribution', choices=LATENCY_DISTRIBUTIONS, default='fixed')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of calls answered with a 500')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='fraction of calls answered with a 429')
+    parser.add_argument('--retry-after', type=int, default=1, help='Retry-After seconds sent with a 429')
+    args = parser.parse_args()
+
+    server = start_mock_server(latency=args.latency, port=args.port, distribution=args.distribution,
+                               error_rate=args.error_rate, throttle_rate=args.throttle_rate,
+                               retry_after=args.retry_after)
+    print(f"Mock Gemini listening on {server_url(server)}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,123 @@
+"""Input tokens per section before and after prompt compaction.
+
+Sends each section's previous prompt (every selected field as a Python
+dict repr, with the instructions repeated inline) and its current prompt
+(compact fields plus the shared preamble) to Gemini with
+maxOutputTokens=1, and reports promptTokenCount and
+cachedContentTokenCount from usageMetadata. Saved tokens are the previous
+count minus the uncached part of the current one. "deck" is the batched
+single-call prompt.
+
+    python benchmarks/prompt_report.py --mock
+    python benchmarks/prompt_report.py --form form.json --context-cache   # real Gemini, needs GEMINI_API_KEY
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_full_deck import SAMPLE_FORM
+from mock_gemini import start_mock_server, server_url
+from results import write_results
+
+
+def legacy_section_prompt(section, context, section_inputs):
+    """The section prompt as it was built before prompts.py."""
+    startup_name = context.get('startup_name', '')
+    if section == 'cover':
+        return f"""Create a compelling cover slide for a startup pitch deck.
+        Startup Name: {startup_name}
+        Industry: {context.get('industry', '')}
+        Create a tagline that captures the essence of the startup.
+        Format: Return only the text in this format: "{startup_name} - [tagline]"
+        Keep it concise and impactful."""
+    return f"""As an expert pitch deck generator, create content for the {section} section of a startup pitch deck.
+        Startup Name: {startup_name}
+        Context: {section_inputs(section, context)}
+        Requirements:
+        - Be concise and impactful
+        - Focus on key points only
+        - Use bullet points where appropriate
+        - Maintain professional tone
+        - Be specific and data-driven where possible
+        Output only the content, no explanations."""
+
+
+def legacy_batched_prompt(context, sections):
+    """The batched prompt as it was built before prompts.py."""
+    startup_name = context.get('startup_name', '')
+    return f"""As an expert pitch deck generator, create the content for every section of a startup pitch deck.
+        Startup Name: {startup_name}
+        Context: {context}
+        Sections: {", ".join(sections)}
+        Requirements:
+        - Return a JSON object with exactly one string value per section key
+        - For "cover", return only "{startup_name} - [tagline]" with a tagline that captures the essence of the startup
+        - For every other section, be concise and impactful, focus on key points only and use Markdown bullet points where appropriate
+        - Maintain professional tone
+        - Be specific and data-driven where possible
+        Output only the JSON object, no explanations."""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--form', help='JSON file with the form data (default: the benchmark sample form)')
+    parser.add_argument('--mock', action='store_true', help='count tokens with the local mock instead of Gemini')
+    parser.add_argument('--context-cache', action='store_true', help='send the preamble as a Gemini cached content')
+    parser.add_argument('--output', help='result file (default: benchmarks/results/prompt_report_<commit>_<time>.json)')
+    args = parser.parse_args()
+
+    form = SAMPLE_FORM
+    if args.form:
+        with open(args.form, encoding='utf-8') as f:
+            form = json.load(f)
+    server = None
+    if args.mock:
+        server = start_mock_server(latency=0)
+        os.environ['GEMINI_API_BASE'] = server_url(server)
+        os.environ.setdefault('GEMINI_API_KEY', 'benchmark')
+    if args.context_cache:
+        os.environ['GEMINI_CONTEXT_CACHE'] = '1'
+
+    import deck_service
+    from gemini_client import get_client
+    from prompts import context_cache
+
+    def prompt_tokens(section, prompt, system=False):
+        backend = deck_service.model_registry.backend(deck_service.model_registry.model_for(section))
+        fields = context_cache.system_fields(backend) if system else None
+        body = deck_service.build_request(prompt, {'maxOutputTokens': 1}, fields)
+        usage = get_client().post_json(backend.generate_url(), body).get('usageMetadata', {})
+        return usage.get('promptTokenCount', 0), usage.get('cachedContentTokenCount', 0)
+
+    prompts = {section: (legacy_section_prompt(section, form, deck_service.section_inputs),
+                         deck_service.build_section_prompt(section, form))
+               for section in deck_service.SLIDE_SECTIONS}
+    prompts['deck'] = (legacy_batched_prompt(form, deck_service.SLIDE_SECTIONS),
+                       deck_service.build_batched_prompt(form, deck_service.SLIDE_SECTIONS))
+
+    rows = []
+    print(f"{'section':<16} {'before':>7} {'after':>7} {'cached':>7} {'saved':>7} {'saved %':>8}")
+    for section, (legacy, compact) in prompts.items():
+        before, _ = prompt_tokens(section, legacy)
+        after, cached = prompt_tokens(section, compact, system=True)
+        saved = before - (after - cached)
+        rows.append({'name': section, 'before_tokens': before, 'after_tokens': after, 'cached_tokens': cached,
+                     'saved_tokens': saved, 'saved_pct': round(saved / before * 100, 1) if before else None})
+        print(f"{section:<16} {before:>7} {after:>7} {cached:>7} {saved:>7} {rows[-1]['saved_pct'] or 0:>7.1f}%")
+
+    sections = [row for row in rows if row['name'] != 'deck']
+    before = sum(row['before_tokens'] for row in sections)
+    saved = sum(row['saved_tokens'] for row in sections)
+    print(f"{'all sections':<16} {before:>7} {'':>7} {'':>7} {saved:>7} {saved / before * 100 if before else 0:>7.1f}%")
+
+    params = {'mock': args.mock, 'context_cache': args.context_cache, 'form_fields': sorted(form)}
+    print(f"wrote {write_results('prompt_report', params, rows, args.output)}")
+    if server is not None:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""Format-neutral description of a rendered deck.
+
+Every export format (PPTX, Markdown, HTML, PDF, slide images) is rendered
+from the same model, built from the form data and the generated sections,
+so they all show the same slides in the same order. Sections are laid out
+with ``slide_layout`` into the same pages, and continuation slides, as the
+PPTX. Nothing here imports python-pptx or Pillow.
+"""
+import hashlib
+import json
+
+from slide_layout import layout_text
+
+# Slide titles for each section, in deck order
+SECTION_TITLES = {
+    'cover': 'Cover Slide',
+    'problem': 'The Problem',
+    'solution': 'Our Solution',
+    'market': 'Market Opportunity',
+    'product': 'Product Overview',
+    'business_model': 'Business Model',
+    'competition': 'Competitive Advantage',
+    'team': 'Our Team',
+    'traction': 'Traction & Milestones',
+    'funding_needs': 'Investment Opportunity'
+}
+
+# Sections rendered as one bullet per line; the rest are a single text block
+BULLET_SECTIONS = ('problem', 'solution', 'market')
+
+DEFAULT_TAGLINE = 'Transforming Ideas into Reality'
+
+
+def build_deck_model(form_data, generated_deck):
+    """Return ``{startup_name, tagline, slides}``; sections without content get no slide."""
+    slides = []
+    for section, title in SECTION_TITLES.items():
+        content = generated_deck.get(section)
+        if content:
+            slides.append({'section': section, 'title': title, 'content': content})
+    return {
+        'startup_name': form_data['startup_name'],
+        'tagline': form_data.get('tagline', DEFAULT_TAGLINE),
+        'slides': slides,
+    }
+
+
+def continuation_title(title):
+    return f"{title} (cont.)"
+
+
+def slide_pages(slide, box, size):
+    """``[(title, Page), ...]``: a content slide laid out in ``box`` at body ``size``,
+    split into continuation slides the way the PPTX renderer splits it."""
+    pages = layout_text(slide['content'], slide['section'] in BULLET_SECTIONS, box, size)
+    return [(slide['title'] if number == 1 else continuation_title(slide['title']), page)
+            for number, page in enumerate(pages, 1)]
+
+
+def deck_hash(model):
+    """Content hash of a deck model; equal decks render to equal exports."""
+    canonical = json.dumps(model, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
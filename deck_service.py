@@ -0,0 +1,545 @@
+import asyncio
+import hashlib
+import itertools
+import json
+import os
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+from gemini_client import get_async_client, get_client
+from metrics import CACHE_REQUESTS, record_usage, span
+from models import create_model_registry
+from prompts import (
+    build_batched_prompt,
+    build_section_prompt,
+    context_cache,
+    prompt_version,
+    section_inputs,
+    system_instruction,
+)
+from rate_limiter import GEMINI_RATE_LIMIT_MAX_WAIT, AsyncSingleFlight, SingleFlight, create_rate_limiter
+from response_cache import cache_key, create_cache
+
+# Load environment variables
+load_dotenv()
+
+# Models per section, with fallback; the API key is only read when a call is made
+model_registry = create_model_registry()
+
+# Maximum number of sections generated in parallel for a full deck
+MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "5"))
+
+# Cache of generated section content, keyed on prompt + model
+response_cache = create_cache()
+
+# Optional limiter shared by every Gemini call (see set_rate_limiter)
+rate_limiter = create_rate_limiter()
+
+# Identical prompts in flight at the same time share one upstream call
+inflight = SingleFlight()
+async_inflight = AsyncSingleFlight()
+
+def set_rate_limiter(limiter):
+    """Install a limiter whose ``acquire()`` is called before each Gemini request."""
+    global rate_limiter
+    rate_limiter = limiter
+
+# Define slide sections in order
+SLIDE_SECTIONS = [
+    'cover',
+    'problem',
+    'solution',
+    'market',
+    'product',
+    'business_model',
+    'competition',
+    'team',
+    'traction',
+    'funding_needs'
+]
+
+def section_input_hash(section, context):
+    """Hash of the inputs a section is generated from; changes only when those fields do."""
+    canonical = json.dumps({'section': section, 'inputs': section_inputs(section, context)},
+                           sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+def deck_input_hashes(context, sections=SLIDE_SECTIONS):
+    return {section: section_input_hash(section, context) for section in sections}
+
+# Form fields that must be present and non-empty to generate a deck
+REQUIRED_FIELDS = ['startup_name', 'problem', 'solution', 'target_audience', 'industry', 'revenue_model', 'stage']
+
+def missing_required_fields(form_data):
+    """Return the required fields that are missing or blank in ``form_data``."""
+    return [field for field in REQUIRED_FIELDS if field not in form_data or not str(form_data[field]).strip()]
+
+# Full-deck generation modes: one call per section, or one call for the whole deck
+GENERATION_MODES = ('sections', 'batched')
+
+def build_request(prompt, generation_config=None, system=None):
+    """Build the generateContent request body for ``prompt``.
+
+    ``system`` holds the fields carrying the shared preamble, from
+    ``context_cache.system_fields``.
+    """
+    data = {
+        "contents": [
+            {
+                "parts": [
+                    {"text": prompt}
+                ]
+            }
+        ]
+    }
+    if system:
+        data.update(system)
+    if generation_config:
+        data["generationConfig"] = generation_config
+    return data
+
+def parse_response(result, section=''):
+    """Record token usage and return the text of the first candidate."""
+    record_usage(result.get('usageMetadata', {}), section)
+    if 'candidates' in result and len(result['candidates']) > 0:
+        if 'content' in result['candidates'][0] and 'parts' in result['candidates'][0]['content']:
+            return result['candidates'][0]['content']['parts'][0]['text']
+    print(f"Unexpected Gemini API response: {result}")
+    raise Exception(f"Unexpected Gemini API response: {result}")
+
+def _acquire_rate_limit():
+    if rate_limiter is not None:
+        rate_limiter.acquire(timeout=GEMINI_RATE_LIMIT_MAX_WAIT)
+
+def generate_content(prompt, generation_config=None, section=''):
+    """Generate content using Gemini API directly; returns ``(text, model)``.
+
+    The model comes from the section's chain in ``model_registry``, falling
+    back to the next model on quota, overload or timeout errors; ``model`` is
+    the one that answered. ``section`` also labels the timing and token metrics.
+    """
+    def _call(backend):
+        data = build_request(prompt, generation_config, context_cache.system_fields(backend))
+        _acquire_rate_limit()
+        with span('gemini_call', section):
+            return backend.model, get_client().post_json(backend.generate_url(), data)
+    
+    try:
+        model, result = model_registry.call(section, _call)
+        with span('response_parse', section):
+            return parse_response(result, section), model
+    except Exception as e:
+        print(f"API request failed: {str(e)}")
+        raise Exception(str(e))
+
+def _open_stream(backend, prompt):
+    """Start a stream and wait for its first event, so that a failure to
+    connect still falls back to the next model."""
+    data = build_request(prompt, system=context_cache.system_fields(backend))
+    _acquire_rate_limit()
+    events = get_client().stream_json(backend.stream_url(), data)
+    first = next(events, None)
+    return itertools.chain([] if first is None else [first], events)
+
+def generate_content_stream(prompt, section='', models=None):
+    """Yield text chunks from Gemini's streamGenerateContent endpoint.
+
+    The model that answered is appended to ``models`` when a list is given.
+    """
+    usage = {}
+    with span('gemini_stream', section):
+        model, events = model_registry.call(section, lambda backend: (backend.model, _open_stream(backend, prompt)))
+        if models is not None:
+            models.append(model)
+        for event in events:
+            # Each event carries the running totals; keep the last one
+            usage = event.get('usageMetadata', usage)
+            for candidate in event.get('candidates', [])[:1]:
+                for part in candidate.get('content', {}).get('parts', []):
+                    if part.get('text'):
+                        yield part['text']
+    record_usage(usage, section)
+
+def generation_settings():
+    """What a generated deck depends on besides the form: each section's model and the prompts."""
+    models = {section: model_registry.model_for(section) for section in (*SLIDE_SECTIONS, 'deck')}
+    return {'models': models, 'prompts': prompt_version()}
+
+def prompt_cache_key(model, prompt):
+    """Response cache key for ``prompt``; the preamble is part of what was asked."""
+    return cache_key(model, {'system': system_instruction(), 'prompt': prompt})
+
+def _section_prompt(section, context):
+    """Return ``(prompt, cache_key)`` for a section."""
+    with span('prompt_build', section):
+        prompt = build_section_prompt(section, context)
+        return prompt, prompt_cache_key(model_registry.model_for(section), prompt)
+
+def _cacheable(model, section):
+    """Whether an answer from ``model`` may be cached for ``section``.
+
+    Cache keys name the section's own model, so a fallback model's answer
+    is not cached: it would be served as the primary's until it expired.
+    """
+    return model == model_registry.model_for(section)
+
+def _cache_lookup(key, bypass_cache):
+    """Return the cached response for ``key``, or None on a miss or when bypassing."""
+    if bypass_cache:
+        CACHE_REQUESTS.inc(result='bypass')
+        return None
+    cached = response_cache.get(key)
+    CACHE_REQUESTS.inc(result='miss' if cached is None else 'hit')
+    return cached
+
+def generate_pitch_deck_section(section, context, bypass_cache=False):
+    """Generate content for a specific pitch deck section.
+
+    Responses are cached on the prompt and model; ``bypass_cache`` skips the
+    lookup and refreshes the cached entry with new content.
+    """
+    prompt, key = _section_prompt(section, context)
+    cached = _cache_lookup(key, bypass_cache)
+    if cached is not None:
+        return cached
+
+    try:
+        content, model = inflight.do(key, lambda: generate_content(prompt, section=section))
+        if _cacheable(model, section):
+            response_cache.set(key, content)
+        return content
+    except Exception as e:
+        print(f"Error generating content for {section}: {str(e)}")
+        raise Exception(f"Failed to generate content: {str(e)}")
+
+def stream_pitch_deck_section(section, context, on_token, bypass_cache=False):
+    """Like ``generate_pitch_deck_section`` but reports text chunks as they arrive.
+
+    ``on_token`` is called with each chunk; a cached section is reported as a
+    single chunk.
+    """
+    prompt, key = _section_prompt(section, context)
+    cached = _cache_lookup(key, bypass_cache)
+    if cached is not None:
+        on_token(cached)
+        return cached
+
+    try:
+        chunks, models = [], []
+        for chunk in generate_content_stream(prompt, section=section, models=models):
+            chunks.append(chunk)
+            on_token(chunk)
+        content = ''.join(chunks)
+        if not content:
+            raise Exception("Empty response from Gemini stream")
+        if _cacheable(models[0], section):
+            response_cache.set(key, content)
+        return content
+    except Exception as e:
+        print(f"Error streaming content for {section}: {str(e)}")
+        raise Exception(f"Failed to generate content: {str(e)}")
+
+def generate_sections(sections, context, max_workers=None, bypass_cache=False, failed=None, on_section=None):
+    """Generate several sections concurrently, returning them in the given order.
+
+    A section that fails is replaced by a placeholder so that one bad
+    response does not discard the rest of the deck; its name is appended to
+    ``failed`` when a list is given. ``on_section(section, error)`` is called
+    as each section finishes, with ``error`` None on success.
+    """
+    def _generate(section):
+        try:
+            content = generate_pitch_deck_section(section, context, bypass_cache=bypass_cache)
+        except Exception as e:
+            print(f"Error generating {section}: {str(e)}")
+            if failed is not None:
+                failed.append(section)
+            if on_section:
+                on_section(section, str(e))
+            return error_placeholder(section)
+        if on_section:
+            on_section(section, None)
+        return content
+
+    workers = max(1, min(max_workers or MAX_CONCURRENCY, len(sections)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        contents = list(executor.map(_generate, sections))
+    return dict(zip(sections, contents))
+
+BATCHED_GENERATION_CONFIG = {
+    "responseMimeType": "application/json",
+    "responseSchema": {
+        "type": "OBJECT",
+        "properties": {section: {"type": "STRING"} for section in SLIDE_SECTIONS},
+        "required": SLIDE_SECTIONS,
+    },
+}
+
+def parse_batched_deck(text):
+    """Parse a batched response into ``{section: content}``.
+
+    Only sections with a non-empty string value are returned; anything else
+    is left for the caller to regenerate.
+    """
+    text = text.strip()
+    if text.startswith('```'):
+        text = text.split('\n', 1)[-1].rsplit('```', 1)[0]
+    try:
+        payload = json.loads(text)
+    except ValueError as e:
+        print(f"Could not parse batched deck response: {str(e)}")
+        return {}
+    if not isinstance(payload, dict):
+        return {}
+    return {
+        section: payload[section].strip()
+        for section in SLIDE_SECTIONS
+        if isinstance(payload.get(section), str) and payload[section].strip()
+    }
+
+def _parse_batched(key, text, model):
+    """Parse a batched response from ``model``, caching it only when every section came back."""
+    with span('response_parse', 'deck'):
+        parsed = parse_batched_deck(text)
+    if len(parsed) == len(SLIDE_SECTIONS) and _cacheable(model, 'deck'):
+        response_cache.set(key, text)
+    return parsed
+
+def generate_deck_batched(context, bypass_cache=False, failed=None, on_section=None):
+    """Generate the whole deck with one Gemini call.
+
+    Sections missing from, or invalid in, the response fall back to
+    per-section generation. Returns ``(deck, fallback_sections)``.
+    """
+    with span('prompt_build', 'deck'):
+        prompt = build_batched_prompt(context, SLIDE_SECTIONS)
+        model = model_registry.model_for('deck')
+        key = prompt_cache_key(model, prompt)
+    text = _cache_lookup(key, bypass_cache)
+    if text is None:
+        try:
+            text, model = inflight.do(
+                key, lambda: generate_content(prompt, BATCHED_GENERATION_CONFIG, section='deck'))
+        except Exception as e:
+            print(f"Batched deck generation failed: {str(e)}")
+            text = ''
+
+    parsed = _parse_batched(key, text, model)
+    if on_section:
+        for section in parsed:
+            on_section(section, None)
+
+    fallback = [section for section in SLIDE_SECTIONS if section not in parsed]
+    if fallback:
+        parsed.update(generate_sections(fallback, context, bypass_cache=bypass_cache,
+                                        failed=failed, on_section=on_section))
+    return {section: parsed[section] for section in SLIDE_SECTIONS}, fallback
+
+def generate_deck(context, mode='sections', bypass_cache=False, max_workers=None, on_section=None):
+    """Generate a full deck in the given mode.
+
+    Returns ``(deck, info)`` where ``info`` lists the sections that fell back
+    to per-section calls and the sections that could not be generated.
+    """
+    failed = []
+    if mode == 'batched':
+        deck, fallback = generate_deck_batched(context, bypass_cache=bypass_cache,
+                                               failed=failed, on_section=on_section)
+    else:
+        deck = generate_sections(SLIDE_SECTIONS, context, max_workers=max_workers,
+                                 bypass_cache=bypass_cache, failed=failed, on_section=on_section)
+        fallback = []
+    return deck, _deck_info(mode, fallback, failed)
+
+def _deck_info(mode, fallback, failed):
+    return {
+        'mode': mode,
+        'fallback_sections': fallback,
+        'failed_sections': [section for section in SLIDE_SECTIONS if section in failed],
+    }
+
+def error_placeholder(section):
+    """Content shown for a section that could not be generated."""
+    return f"Error generating content for {section}. Please try regenerating this slide."
+
+def is_error_placeholder(content):
+    return isinstance(content, str) and content.startswith('Error generating content for ')
+
+def update_deck(deck, context, input_hashes=None, previous_context=None, bypass_cache=False):
+    """Regenerate only the sections whose inputs changed.
+
+    The old inputs are taken from ``input_hashes`` (as returned by this
+    function) or, failing that, recomputed from ``previous_context``. A
+    section is regenerated when its hash differs, when no old hash is
+    known, or when it is missing or an error placeholder.
+
+    Returns ``(deck, input_hashes, regenerated_sections)``.
+    """
+    new_hashes = deck_input_hashes(context)
+    old_hashes = dict(input_hashes or {})
+    if previous_context is not None:
+        for section, value in deck_input_hashes(previous_context).items():
+            old_hashes.setdefault(section, value)
+
+    stale = [
+        section for section in SLIDE_SECTIONS
+        if old_hashes.get(section) != new_hashes[section]
+        or not deck.get(section)
+        or is_error_placeholder(deck.get(section))
+    ]
+    updated = {section: deck.get(section) for section in SLIDE_SECTIONS}
+    if stale:
+        updated.update(generate_sections(stale, context, bypass_cache=bypass_cache))
+    return updated, new_hashes, stale
+
+def _sse(event, payload):
+    """Format one server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+def stream_deck_events(context, stream_tokens=False, bypass_cache=False, max_workers=None):
+    """Generate every section concurrently, yielding SSE frames as they complete.
+
+    Emits a ``section`` event per finished section, ``token`` events for text
+    chunks when ``stream_tokens`` is set, and a final ``done`` event with
+    per-section timings in milliseconds.
+    """
+    events = queue.Queue()
+    started = time.perf_counter()
+
+    def _generate(section):
+        section_start = time.perf_counter()
+        error = None
+        try:
+            if stream_tokens:
+                content = stream_pitch_deck_section(
+                    section, context,
+                    lambda text: events.put(('token', {'section': section, 'text': text})),
+                    bypass_cache=bypass_cache,
+                )
+            else:
+                content = generate_pitch_deck_section(section, context, bypass_cache=bypass_cache)
+        except Exception as e:
+            print(f"Error generating {section}: {str(e)}")
+            error = str(e)
+            content = error_placeholder(section)
+        elapsed_ms = round((time.perf_counter() - section_start) * 1000, 1)
+        events.put(('section', {'section': section, 'content': content, 'elapsed_ms': elapsed_ms, 'error': error}))
+
+    workers = max(1, min(max_workers or MAX_CONCURRENCY, len(SLIDE_SECTIONS)))
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        for section in SLIDE_SECTIONS:
+            executor.submit(_generate, section)
+
+        timings = {}
+        errors = []
+        while len(timings) < len(SLIDE_SECTIONS):
+            event, payload = events.get()
+            if event == 'section':
+                timings[payload['section']] = payload['elapsed_ms']
+                if payload['error']:
+                    errors.append(payload['section'])
+            yield _sse(event, payload)
+
+        yield _sse('done', {
+            'sections': SLIDE_SECTIONS,
+            'timings_ms': {section: timings[section] for section in SLIDE_SECTIONS},
+            'total_ms': round((time.perf_counter() - started) * 1000, 1),
+            'errors': errors,
+        })
+    finally:
+        # A disconnected client stops the stream; don't start sections nobody will read
+        executor.shutdown(wait=False, cancel_futures=True)
+
+# Async variants for asgi_app.py. They share prompts, caching and response
+# parsing with the functions above, but wait on Gemini without holding a thread.
+
+async def generate_content_async(prompt, generation_config=None, section=''):
+    """Async ``generate_content`` using the shared aiohttp client."""
+    async def _call(backend):
+        data = build_request(prompt, generation_config, await context_cache.system_fields_async(backend))
+        if rate_limiter is not None:
+            await rate_limiter.acquire_async(timeout=GEMINI_RATE_LIMIT_MAX_WAIT)
+        with span('gemini_call', section):
+            return backend.model, await get_async_client().post_json(backend.generate_url(), data)
+
+    try:
+        model, result = await model_registry.call_async(section, _call)
+        with span('response_parse', section):
+            return parse_response(result, section), model
+    except Exception as e:
+        print(f"API request failed: {str(e)}")
+        raise Exception(str(e))
+
+async def _cache_lookup_async(key, bypass_cache):
+    """``_cache_lookup`` that reads the disk tier off the event loop."""
+    if bypass_cache:
+        CACHE_REQUESTS.inc(result='bypass')
+        return None
+    cached = await response_cache.get_async(key)
+    CACHE_REQUESTS.inc(result='miss' if cached is None else 'hit')
+    return cached
+
+async def generate_pitch_deck_section_async(section, context, bypass_cache=False):
+    """Async ``generate_pitch_deck_section``."""
+    prompt, key = _section_prompt(section, context)
+    cached = await _cache_lookup_async(key, bypass_cache)
+    if cached is not None:
+        return cached
+
+    try:
+        content, model = await async_inflight.do(key, lambda: generate_content_async(prompt, section=section))
+        if _cacheable(model, section):
+            await response_cache.set_async(key, content)
+        return content
+    except Exception as e:
+        print(f"Error generating content for {section}: {str(e)}")
+        raise Exception(f"Failed to generate content: {str(e)}")
+
+async def generate_sections_async(sections, context, max_concurrency=None, bypass_cache=False, failed=None):
+    """Async ``generate_sections``: at most ``max_concurrency`` sections of this deck in flight."""
+    semaphore = asyncio.Semaphore(max(1, max_concurrency or MAX_CONCURRENCY))
+
+    async def _generate(section):
+        async with semaphore:
+            try:
+                return await generate_pitch_deck_section_async(section, context, bypass_cache=bypass_cache)
+            except Exception as e:
+                print(f"Error generating {section}: {str(e)}")
+                if failed is not None:
+                    failed.append(section)
+                return error_placeholder(section)
+
+    contents = await asyncio.gather(*(_generate(section) for section in sections))
+    return dict(zip(sections, contents))
+
+async def generate_deck_async(context, mode='sections', bypass_cache=False, max_concurrency=None):
+    """Async ``generate_deck``; returns ``(deck, info)``."""
+    failed = []
+    fallback = []
+    if mode == 'batched':
+        with span('prompt_build', 'deck'):
+            prompt = build_batched_prompt(context, SLIDE_SECTIONS)
+            model = model_registry.model_for('deck')
+            key = prompt_cache_key(model, prompt)
+        text = await _cache_lookup_async(key, bypass_cache)
+        if text is None:
+            try:
+                text, model = await async_inflight.do(
+                    key, lambda: generate_content_async(prompt, BATCHED_GENERATION_CONFIG, section='deck'))
+            except Exception as e:
+                print(f"Batched deck generation failed: {str(e)}")
+                text = ''
+        with span('response_parse', 'deck'):
+            deck = parse_batched_deck(text)
+        if len(deck) == len(SLIDE_SECTIONS) and _cacheable(model, 'deck'):
+            await response_cache.set_async(key, text)
+        fallback = [section for section in SLIDE_SECTIONS if section not in deck]
+        if fallback:
+            deck.update(await generate_sections_async(fallback, context, bypass_cache=bypass_cache, failed=failed))
+        deck = {section: deck[section] for section in SLIDE_SECTIONS}
+    else:
+        deck = await generate_sections_async(SLIDE_SECTIONS, context, max_concurrency=max_concurrency,
+                                             bypass_cache=bypass_cache, failed=failed)
+    return deck, _deck_info(mode, fallback, failed)
@@ -0,0 +1,353 @@
+import difflib
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+# Versioned decks kept server-side; set to an empty value to disable
+DECK_STORE_PATH = os.getenv("DECK_STORE_PATH", "decks.sqlite3")
+# Decks not updated for this many seconds are deleted, as are older versions of the others
+DECK_STORE_MAX_AGE = float(os.getenv("DECK_STORE_MAX_AGE", str(30 * 24 * 3600)))
+# Least recently updated decks are deleted while stored content is over this size
+DECK_STORE_MAX_BYTES = int(os.getenv("DECK_STORE_MAX_BYTES", str(500 * 1024 * 1024)))
+# Seconds between retention passes, which run after writes
+DECK_STORE_PRUNE_INTERVAL = float(os.getenv("DECK_STORE_PRUNE_INTERVAL", "300"))
+# Seconds a generated deck is served again for the same inputs; defaults to the response cache TTL
+DECK_STORE_REUSE_TTL = float(os.getenv("DECK_STORE_REUSE_TTL", os.getenv("RESPONSE_CACHE_TTL", "86400")))
+
+# How a version came to be
+GENERATED = 'generated'  # a full deck generated from the form
+UPDATED = 'updated'      # regenerated sections after a form edit
+SAVED = 'saved'          # sent by a client, e.g. after editing or regenerating slides
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS decks (
+    id TEXT PRIMARY KEY, startup_name TEXT NOT NULL, name_key TEXT NOT NULL,
+    latest_version INTEGER NOT NULL, created_at REAL NOT NULL, updated_at REAL NOT NULL);
+CREATE INDEX IF NOT EXISTS decks_by_name ON decks (name_key, updated_at);
+CREATE TABLE IF NOT EXISTS deck_versions (
+    deck_id TEXT NOT NULL, version INTEGER NOT NULL, content_hash TEXT NOT NULL, inputs_hash TEXT,
+    source TEXT NOT NULL, form_data TEXT NOT NULL, input_hashes TEXT, metadata TEXT, created_at REAL NOT NULL,
+    PRIMARY KEY (deck_id, version));
+CREATE INDEX IF NOT EXISTS deck_versions_by_content ON deck_versions (content_hash);
+CREATE INDEX IF NOT EXISTS deck_versions_by_inputs ON deck_versions (inputs_hash, source, created_at);
+CREATE TABLE IF NOT EXISTS section_contents (hash TEXT PRIMARY KEY, content TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS version_sections (
+    deck_id TEXT NOT NULL, version INTEGER NOT NULL, section TEXT NOT NULL, content_hash TEXT NOT NULL,
+    position INTEGER NOT NULL, PRIMARY KEY (deck_id, version, section));
+CREATE TABLE IF NOT EXISTS artifacts (digest TEXT PRIMARY KEY, data BLOB NOT NULL, created_at REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS version_artifacts (
+    deck_id TEXT NOT NULL, version INTEGER NOT NULL, format TEXT NOT NULL, digest TEXT NOT NULL,
+    PRIMARY KEY (deck_id, version, format));
+'''
+
+
+def _sha256(value):
+    if not isinstance(value, bytes):
+        value = json.dumps(value, sort_keys=True, separators=(',', ':')).encode('utf-8')
+    return hashlib.sha256(value).hexdigest()
+
+
+def content_hash(form_data, deck):
+    """Hash of everything a version holds; equal hashes mean identical decks."""
+    return _sha256({'formData': form_data, 'deck': deck})
+
+
+def inputs_hash(form_data, mode, settings=None):
+    """Hash of what a generated deck was generated from.
+
+    ``settings`` holds everything else the output depends on, such as the
+    models and prompt version (see ``deck_service.generation_settings``).
+    """
+    return _sha256({'formData': form_data, 'mode': mode, 'settings': settings})
+
+
+def _name_key(startup_name):
+    return ' '.join(startup_name.split()).lower()
+
+
+class SqliteDeckStore:
+    """Keeps every version of every deck: form data, section content, metadata and artifacts.
+
+    Section content and artifacts are stored once per distinct value, so
+    versions that differ in one section only add that section. Saving
+    content identical to the deck's latest version returns that version
+    instead of adding another.
+
+    At most every ``prune_interval`` seconds a write also applies retention:
+    versions older than ``max_age`` are deleted, except the latest version of
+    a deck updated since, then the least recently updated decks until the
+    stored content is under ``max_bytes``.
+    """
+
+    def __init__(self, path=DECK_STORE_PATH, max_age=DECK_STORE_MAX_AGE, max_bytes=DECK_STORE_MAX_BYTES,
+                 prune_interval=DECK_STORE_PRUNE_INTERVAL, reuse_ttl=DECK_STORE_REUSE_TTL):
+        self.path = path
+        self.reuse_ttl = reuse_ttl
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.prune_interval = prune_interval
+        self._local = threading.local()
+        self._next_prune = 0.0
+        self._prune_lock = threading.Lock()
+        self._connect().executescript(SCHEMA)
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # Autocommit; writes take the write lock up front in _transaction
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def save_version(self, form_data, deck, deck_id=None, source=SAVED, metadata=None,
+                     input_hashes=None, inputs_hash=None):
+        """Store a new version and return its summary, or None if ``deck_id`` does not exist.
+
+        Without ``deck_id`` a new deck is created.
+        """
+        digest = content_hash(form_data, deck)
+        now = time.time()
+        with self._transaction() as conn:
+            if deck_id is None:
+                deck_id = uuid.uuid4().hex
+                conn.execute(
+                    "INSERT INTO decks (id, startup_name, name_key, latest_version, created_at, updated_at) "
+                    "VALUES (?, ?, ?, 0, ?, ?)",
+                    (deck_id, form_data['startup_name'], _name_key(form_data['startup_name']), now, now))
+                latest = None
+            else:
+                row = conn.execute("SELECT latest_version FROM decks WHERE id = ?", (deck_id,)).fetchone()
+                if row is None:
+                    return None
+                latest = conn.execute(
+                    "SELECT version, content_hash, created_at FROM deck_versions WHERE deck_id = ? AND version = ?",
+                    (deck_id, row['latest_version'])).fetchone()
+                if latest is not None and latest['content_hash'] == digest:
+                    return {'deck_id': deck_id, 'version': latest['version'], 'content_hash': digest,
+                            'created_at': latest['created_at'], 'created': False}
+
+            version = (latest['version'] if latest else 0) + 1
+            conn.execute(
+                "INSERT INTO deck_versions (deck_id, version, content_hash, inputs_hash, source, form_data, "
+                "input_hashes, metadata, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (deck_id, version, digest, inputs_hash, source, json.dumps(form_data),
+                 json.dumps(input_hashes) if input_hashes else None,
+                 json.dumps(metadata) if metadata else None, now))
+            for position, (section, content) in enumerate(deck.items()):
+                section_hash = _sha256(content)
+                conn.execute("INSERT OR IGNORE INTO section_contents (hash, content) VALUES (?, ?)",
+                             (section_hash, json.dumps(content)))
+                conn.execute(
+                    "INSERT INTO version_sections (deck_id, version, section, content_hash, position) "
+                    "VALUES (?, ?, ?, ?, ?)", (deck_id, version, section, section_hash, position))
+            conn.execute(
+                "UPDATE decks SET latest_version = ?, startup_name = ?, name_key = ?, updated_at = ? WHERE id = ?",
+                (version, form_data['startup_name'], _name_key(form_data['startup_name']), now, deck_id))
+        self._maybe_prune()
+        return {'deck_id': deck_id, 'version': version, 'content_hash': digest, 'created_at': now, 'created': True}
+
+    def _version_row(self, deck_id, version=None):
+        conn = self._connect()
+        if version is None:
+            return conn.execute(
+                "SELECT v.* FROM deck_versions v JOIN decks d ON d.id = v.deck_id AND d.latest_version = v.version "
+                "WHERE d.id = ?", (deck_id,)).fetchone()
+        return conn.execute("SELECT * FROM deck_versions WHERE deck_id = ? AND version = ?",
+                            (deck_id, version)).fetchone()
+
+    def _load(self, row):
+        conn = self._connect()
+        sections = conn.execute(
+            "SELECT s.section, c.content FROM version_sections s JOIN section_contents c ON c.hash = s.content_hash "
+            "WHERE s.deck_id = ? AND s.version = ? ORDER BY s.position", (row['deck_id'], row['version'])).fetchall()
+        artifacts = conn.execute("SELECT format, digest FROM version_artifacts WHERE deck_id = ? AND version = ?",
+                                 (row['deck_id'], row['version'])).fetchall()
+        return {
+            'deck_id': row['deck_id'],
+            'version': row['version'],
+            'content_hash': row['content_hash'],
+            'source': row['source'],
+            'created_at': row['created_at'],
+            'formData': json.loads(row['form_data']),
+            'deck': {section['section']: json.loads(section['content']) for section in sections},
+            'input_hashes': json.loads(row['input_hashes']) if row['input_hashes'] else None,
+            'metadata': json.loads(row['metadata']) if row['metadata'] else {},
+            'artifacts': {artifact['format']: artifact['digest'] for artifact in artifacts},
+        }
+
+    def get_version(self, deck_id, version=None):
+        """A full version (the latest when ``version`` is None), or None."""
+        row = self._version_row(deck_id, version)
+        return self._load(row) if row else None
+
+    def find_by_content(self, digest):
+        """The newest version with content hash ``digest``, or None."""
+        row = self._connect().execute(
+            "SELECT * FROM deck_versions WHERE content_hash = ? ORDER BY created_at DESC LIMIT 1", (digest,)).fetchone()
+        return self._load(row) if row else None
+
+    def find_generated(self, digest):
+        """The newest complete generated version with inputs hash ``digest``, or None.
+
+        Versions generated more than ``reuse_ttl`` seconds ago are not returned.
+        """
+        rows = self._connect().execute(
+            "SELECT * FROM deck_versions WHERE inputs_hash = ? AND source = ? AND created_at >= ? "
+            "ORDER BY created_at DESC LIMIT 5", (digest, GENERATED, time.time() - self.reuse_ttl)).fetchall()
+        for row in rows:
+            stored = self._load(row)
+            if not stored['metadata'].get('failed_sections'):
+                return stored
+        return None
+
+    def list_decks(self, startup_name=None, limit=50, offset=0):
+        """Decks, most recently updated first, optionally for one startup name."""
+        query = "SELECT id AS deck_id, startup_name, latest_version, created_at, updated_at FROM decks"
+        params = []
+        if startup_name:
+            query += " WHERE name_key = ?"
+            params.append(_name_key(startup_name))
+        query += " ORDER BY updated_at DESC LIMIT ? OFFSET ?"
+        rows = self._connect().execute(query, (*params, limit, offset)).fetchall()
+        return [dict(row) for row in rows]
+
+    def list_versions(self, deck_id):
+        rows = self._connect().execute(
+            "SELECT version, content_hash, source, metadata, created_at FROM deck_versions "
+            "WHERE deck_id = ? ORDER BY version", (deck_id,)).fetchall()
+        return [dict(row, metadata=json.loads(row['metadata']) if row['metadata'] else {}) for row in rows]
+
+    def diff(self, deck_id, from_version, to_version):
+        """Changed form fields and sections between two versions, or None if either is missing."""
+        old, new = self.get_version(deck_id, from_version), self.get_version(deck_id, to_version)
+        if old is None or new is None:
+            return None
+        fields = {
+            field: {'from': old['formData'].get(field), 'to': new['formData'].get(field)}
+            for field in dict.fromkeys([*old['formData'], *new['formData']])
+            if old['formData'].get(field) != new['formData'].get(field)
+        }
+        sections = {}
+        for section in dict.fromkeys([*old['deck'], *new['deck']]):
+            before, after = old['deck'].get(section), new['deck'].get(section)
+            if before == after:
+                continue
+            status = 'added' if before is None else 'removed' if after is None else 'changed'
+            lines = difflib.unified_diff(str(before or '').splitlines(), str(after or '').splitlines(),
+                                         f'v{from_version}/{section}', f'v{to_version}/{section}', lineterm='')
+            sections[section] = {'status': status, 'diff': '\n'.join(lines)}
+        return {'deck_id': deck_id, 'from': from_version, 'to': to_version,
+                'formData': fields, 'sections': sections}
+
+    def add_artifact(self, deck_id, version, format, data):
+        """Attach rendered output (e.g. the PPTX) to a version and return its digest."""
+        digest = hashlib.sha256(data).hexdigest()
+        with self._transaction() as conn:
+            conn.execute("INSERT OR IGNORE INTO artifacts (digest, data, created_at) VALUES (?, ?, ?)",
+                         (digest, data, time.time()))
+            conn.execute("INSERT OR REPLACE INTO version_artifacts (deck_id, version, format, digest) "
+                         "VALUES (?, ?, ?, ?)", (deck_id, version, format, digest))
+        self._maybe_prune()
+        return digest
+
+    def get_artifact(self, deck_id, version, format):
+        row = self._connect().execute(
+            "SELECT a.data FROM version_artifacts v JOIN artifacts a ON a.digest = v.digest "
+            "WHERE v.deck_id = ? AND v.version = ? AND v.format = ?", (deck_id, version, format)).fetchone()
+        return row['data'] if row else None
+
+
+    def _delete_versions(self, conn, versions):
+        for table in ('deck_versions', 'version_sections', 'version_artifacts'):
+            conn.executemany(f"DELETE FROM {table} WHERE deck_id = ? AND version = ?", versions)
+
+    def _collect_garbage(self, conn):
+        """Delete decks without versions and content no version refers to."""
+        conn.execute("DELETE FROM decks WHERE id NOT IN (SELECT deck_id FROM deck_versions)")
+        conn.execute("DELETE FROM section_contents WHERE hash NOT IN (SELECT content_hash FROM version_sections)")
+        conn.execute("DELETE FROM artifacts WHERE digest NOT IN (SELECT digest FROM version_artifacts)")
+
+    def stored_bytes(self, conn=None):
+        """Approximate size of the stored content: artifacts, sections and form data."""
+        conn = conn or self._connect()
+        return conn.execute(
+            "SELECT (SELECT COALESCE(SUM(LENGTH(data)), 0) FROM artifacts)"
+            " + (SELECT COALESCE(SUM(LENGTH(content)), 0) FROM section_contents)"
+            " + (SELECT COALESCE(SUM(LENGTH(form_data) + COALESCE(LENGTH(metadata), 0)"
+            " + COALESCE(LENGTH(input_hashes), 0)), 0) FROM deck_versions)").fetchone()[0]
+
+    def _deck_bytes(self, conn, deck_id):
+        """What ``stored_bytes`` would count for ``deck_id`` alone."""
+        return conn.execute(
+            "SELECT (SELECT COALESCE(SUM(LENGTH(form_data) + COALESCE(LENGTH(metadata), 0)"
+            " + COALESCE(LENGTH(input_hashes), 0)), 0) FROM deck_versions WHERE deck_id = ?)"
+            " + (SELECT COALESCE(SUM(LENGTH(c.content)), 0) FROM section_contents c WHERE c.hash IN"
+            " (SELECT content_hash FROM version_sections WHERE deck_id = ?))"
+            " + (SELECT COALESCE(SUM(LENGTH(a.data)), 0) FROM artifacts a WHERE a.digest IN"
+            " (SELECT digest FROM version_artifacts WHERE deck_id = ?))", (deck_id, deck_id, deck_id)).fetchone()[0]
+
+    def prune(self):
+        """Apply the age and size limits; return the number of versions deleted."""
+        cutoff = time.time() - self.max_age
+        with self._transaction() as conn:
+            expired = conn.execute(
+                "SELECT v.deck_id, v.version FROM deck_versions v JOIN decks d ON d.id = v.deck_id "
+                "WHERE v.created_at < ? AND (d.updated_at < ? OR v.version != d.latest_version)",
+                (cutoff, cutoff)).fetchall()
+            self._delete_versions(conn, [tuple(row) for row in expired])
+            deleted = len(expired)
+            self._collect_garbage(conn)
+            excess = self.stored_bytes(conn) - self.max_bytes
+            while excess > 0:
+                # Least recently updated decks until their content covers the excess.
+                # Content shared with other decks is counted but not freed, hence the loop
+                deck_ids, freed = [], 0
+                for row in conn.execute("SELECT id FROM decks ORDER BY updated_at").fetchall():
+                    deck_ids.append(row['id'])
+                    freed += self._deck_bytes(conn, row['id'])
+                    if freed >= excess:
+                        break
+                if not deck_ids:
+                    break
+                versions = conn.execute(f"SELECT deck_id, version FROM deck_versions WHERE deck_id IN "
+                                        f"({', '.join('?' for _ in deck_ids)})", deck_ids).fetchall()
+                self._delete_versions(conn, [tuple(row) for row in versions])
+                deleted += len(versions)
+                self._collect_garbage(conn)
+                excess = self.stored_bytes(conn) - self.max_bytes
+        return deleted
+
+    def _maybe_prune(self):
+        now = time.monotonic()
+        with self._prune_lock:
+            if now < self._next_prune:
+                return
+            self._next_prune = now + self.prune_interval
+        try:
+            self.prune()
+        except sqlite3.Error as e:
+            # Retention is best effort; the write it follows has been committed
+            print(f"Deck store pruning failed: {str(e)}")
+
+
+def create_deck_store():
+    """Build the store from DECK_STORE_PATH, or None when disabled."""
+    return SqliteDeckStore(DECK_STORE_PATH) if DECK_STORE_PATH else None
@@ -0,0 +1,463 @@
+"""Export stage: render one deck model into PPTX, Markdown, HTML, PDF and PNG.
+
+Formats are registered with ``register_format`` and render a deck model
+(see deck_model.py) to bytes. ``export_deck`` renders several formats at
+once on a process pool (EXPORT_WORKERS), so a PDF and the thumbnails do not
+wait for each other or hold the GIL of the request thread. Results are
+cached by deck hash and format, in memory and, when ARTIFACT_STORE_DIR is
+set, in the artifact store, so repeated previews and downloads of an
+unchanged deck are not rendered again.
+
+Every format shows the pages of ``content_pages``: sections parsed from
+Markdown and split into continuation slides exactly as in the PPTX. PDF
+pages and PNG thumbnails are drawn with Pillow from them rather than
+converted from the PPTX, which needs no office suite.
+"""
+import html
+import io
+import multiprocessing
+import os
+import re
+import threading
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+
+from artifact_store import create_artifact_store
+from deck_model import deck_hash, slide_pages
+from metrics import registry
+from response_cache import MemoryCache
+from slide_layout import LINE_SPACING, SPACE_BEFORE, level_size
+
+# Processes rendering formats in parallel; 0 renders in the calling thread
+EXPORT_WORKERS = int(os.getenv("EXPORT_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Rendered exports kept in memory, keyed by deck hash and format
+EXPORT_CACHE_SIZE = int(os.getenv("EXPORT_CACHE_SIZE", "128"))
+EXPORT_CACHE_TTL = float(os.getenv("EXPORT_CACHE_TTL", "86400"))
+# Pixel widths of PDF pages and PNG thumbnails; slides are 4:3 like the PPTX
+EXPORT_PAGE_WIDTH = int(os.getenv("EXPORT_PAGE_WIDTH", "1280"))
+EXPORT_THUMBNAIL_WIDTH = int(os.getenv("EXPORT_THUMBNAIL_WIDTH", "480"))
+# TrueType fonts for PDF pages and thumbnails; Pillow's built-in font when not found
+EXPORT_FONT = os.getenv("EXPORT_FONT", "DejaVuSans.ttf")
+EXPORT_BOLD_FONT = os.getenv("EXPORT_BOLD_FONT", "DejaVuSans-Bold.ttf")
+
+PPTX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.presentationml.presentation'
+
+# Same palette as ppt_generator
+PRIMARY_COLOR = (0, 112, 192)
+SECONDARY_COLOR = (68, 68, 68)
+ACCENT_COLOR = (255, 102, 0)
+
+EXPORT_CACHE_REQUESTS = registry.counter(
+    'export_cache_requests_total', 'Export lookups by format and result (hit or miss).', ('format', 'result'))
+
+# Formats whose output is already compressed; stored as-is in export zips
+COMPRESSED_FORMATS = ('pptx', 'pdf', 'png')
+
+_BOLD_RE = re.compile(r'\*\*(.+?)\*\*')
+
+
+class ExportFormat:
+    def __init__(self, name, extension, mimetype, render):
+        self.name = name
+        self.extension = extension
+        self.mimetype = mimetype
+        self.render = render
+
+
+EXPORT_FORMATS = {}
+
+
+def register_format(name, extension, mimetype):
+    """Register ``render(model) -> bytes`` as export format ``name``.
+
+    Register at import time so that pool processes know the format too.
+    """
+    def decorator(render):
+        EXPORT_FORMATS[name] = ExportFormat(name, extension, mimetype, render)
+        return render
+    return decorator
+
+
+def content_pages(model):
+    """``[(title, Page), ...]`` for every content slide, split into pages as in the PPTX."""
+    from ppt_generator import BODY_FONT_SIZE, content_text_box
+    box = content_text_box()
+    return [page for slide in model['slides'] for page in slide_pages(slide, box, BODY_FONT_SIZE)]
+
+
+def slide_titles(model):
+    """Title of every slide in every export format, cover first."""
+    return [model['startup_name']] + [title for title, _ in content_pages(model)]
+
+
+@register_format('pptx', 'pptx', PPTX_MIMETYPE)
+def render_pptx(model):
+    from ppt_generator import render_ppt
+    form_data = {'startup_name': model['startup_name'], 'tagline': model['tagline']}
+    generated_deck = {slide['section']: slide['content'] for slide in model['slides']}
+    return render_ppt(form_data, generated_deck).getvalue()
+
+
+def _markdown_run(text, bold):
+    if not bold or not text.strip():
+        return text
+    # Emphasis markers must touch the text they wrap
+    stripped = text.strip()
+    start = text.index(stripped)
+    return f"{text[:start]}**{stripped}**{text[start + len(stripped):]}"
+
+
+def _markdown_page(page):
+    lines, previous = [], None
+    for paragraph in page.paragraphs:
+        # Consecutive list items stay together; anything else is its own block
+        if lines and not (paragraph.bullet and previous.bullet):
+            lines.append('')
+        text = ''.join(_markdown_run(text, bold) for text, bold in paragraph.runs)
+        lines.append(f"{'  ' * paragraph.level}- {text}" if paragraph.bullet else text)
+        previous = paragraph
+    return lines
+
+
+@register_format('md', 'md', 'text/markdown')
+def render_markdown(model):
+    lines = [f"# {model['startup_name']}", '', f"*{model['tagline']}*"]
+    for title, page in content_pages(model):
+        lines += ['', f"## {title}", ''] + _markdown_page(page)
+    return ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+HTML_TEMPLATE = '''<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<style>
+body {{ margin: 0; background: #f2f2f2; font-family: Calibri, "DejaVu Sans", Arial, sans-serif; color: #444; }}
+.slide {{ box-sizing: border-box; width: 960px; min-height: 720px; margin: 24px auto; padding: 48px 64px;
+         background: #fff; box-shadow: 0 1px 4px rgba(0, 0, 0, .2); page-break-after: always; }}
+.slide h1, .slide h2 {{ color: #0070c0; margin: 0 0 24px; }}
+.slide h2 {{ font-size: 36px; border-bottom: 4px solid #ff6600; padding-bottom: 8px; }}
+.cover {{ display: flex; flex-direction: column; justify-content: center; text-align: center; }}
+.cover h1 {{ font-size: 56px; }}
+.cover p {{ font-size: 28px; }}
+.slide li, .slide p {{ font-size: 22px; line-height: 1.4; }}
+.slide li.continued {{ list-style: none; }}
+@media print {{ body {{ background: none; }} .slide {{ margin: 0; box-shadow: none; }} }}
+</style>
+</head>
+<body>
+{slides}
+</body>
+</html>
+'''
+
+
+def _html_text(text):
+    return _BOLD_RE.sub(r'<strong>\1</strong>', html.escape(text))
+
+
+def _html_runs(runs):
+    return ''.join(f'<strong>{html.escape(text)}</strong>' if bold else html.escape(text) for text, bold in runs)
+
+
+def _html_page(page):
+    """Page paragraphs as HTML, bullets as nested lists by outline level."""
+    parts, depth = [], 0  # depth: lists currently open
+    for paragraph in page.paragraphs:
+        target = paragraph.level + 1 if paragraph.bullet else 0
+        while depth > target:
+            parts.append('</li></ul>')
+            depth -= 1
+        if not paragraph.bullet:
+            parts.append(f'<p>{_html_runs(paragraph.runs)}</p>')
+            continue
+        if depth == target:
+            parts.append('</li>')
+        while depth < target:
+            # A page may start with a nested item; its parent is on the previous page
+            parts.append('<ul>' if depth == target - 1 else '<ul><li class="continued">')
+            depth += 1
+        parts.append(f'<li>{_html_runs(paragraph.runs)}')
+    parts.append('</li></ul>' * depth)
+    return ''.join(parts)
+
+
+@register_format('html', 'html', 'text/html')
+def render_html(model):
+    slides = [f'<section class="slide cover"><h1>{_html_text(model["startup_name"])}</h1>'
+              f'<p>{_html_text(model["tagline"])}</p></section>']
+    for title, page in content_pages(model):
+        slides.append(f'<section class="slide"><h2>{html.escape(title)}</h2>{_html_page(page)}</section>')
+    return HTML_TEMPLATE.format(title=html.escape(model['startup_name']), slides='\n'.join(slides)).encode('utf-8')
+
+
+@lru_cache(maxsize=None)
+def _font(bold, size):
+    from PIL import ImageFont
+    try:
+        return ImageFont.truetype(EXPORT_BOLD_FONT if bold else EXPORT_FONT, size)
+    except OSError:
+        return ImageFont.load_default(size)
+
+
+def _wrap(text, font, width):
+    """Greedy word wrap of ``text`` into lines no wider than ``width`` pixels."""
+    lines = []
+    for raw in text.split('\n'):
+        line = ''
+        for word in raw.split():
+            candidate = f"{line} {word}" if line else word
+            if line and font.getlength(candidate) > width:
+                lines.append(line)
+                line = word
+            else:
+                line = candidate
+        lines.append(line)
+    return lines
+
+
+def _wrap_page(page, size, scale, width, margins):
+    """Lay out a page's paragraphs at body ``size`` points for drawing.
+
+    Returns ``(lines, height)``: ``(x, y, font_size, bullet, words)`` per
+    line in pixels relative to the body's top left, ``words`` being
+    ``(x, word, bold)``, and the height of the text.
+    """
+    lines, y = [], 0.0
+    for paragraph in page.paragraphs:
+        font_size = level_size(size, paragraph.level) * scale
+        fonts = {bold: _font(bold, round(font_size)) for bold in (False, True)}
+        indent = margins[paragraph.level] * scale if paragraph.bullet else 0
+        y += font_size * SPACE_BEFORE
+        words, used, first = [], 0.0, True
+        space = fonts[False].getlength(' ')
+        for text, bold in paragraph.runs:
+            for word in text.split():
+                word_width = fonts[bold].getlength(word)
+                if words and used + space + word_width > width - indent:
+                    lines.append((indent, y, font_size, paragraph.bullet and first, words))
+                    y += font_size * LINE_SPACING
+                    words, used, first = [], 0.0, False
+                x = used + space if words else 0.0
+                words.append((x, word, bold))
+                used = x + word_width
+        lines.append((indent, y, font_size, paragraph.bullet and first, words))
+        y += font_size * LINE_SPACING
+    return lines, y
+
+
+def draw_slide(model, page, width):
+    """Draw the cover (``page=None``) or one ``(title, Page)`` from ``content_pages`` as an
+    RGB image ``width`` pixels wide."""
+    from PIL import Image, ImageDraw  # deferred: only image formats need Pillow
+    height = width * 3 // 4
+    # Slides are 10in (720pt) wide, so sizes are given in points and scaled
+    scale = width / 720
+    image = Image.new('RGB', (width, height), 'white')
+    draw = ImageDraw.Draw(image)
+
+    if page is None:
+        title_font, tagline_font = _font(True, round(44 * scale)), _font(False, round(24 * scale))
+        y = height * 0.4
+        for font, text, color in ((title_font, model['startup_name'], PRIMARY_COLOR),
+                                  (tagline_font, model['tagline'], SECONDARY_COLOR)):
+            for line in _wrap(_BOLD_RE.sub(r'\1', text), font, width - 72 * scale):
+                draw.text((width / 2, y), line, font=font, fill=color, anchor='ma')
+                y += font.size * 1.2
+            y += 12 * scale
+        return image
+
+    from ppt_generator import BODY_FONT_SIZE, content_text_box
+    title, page = page
+    margin = 36 * scale
+    title_font = _font(True, round(36 * scale))
+    draw.text((margin, margin), title, font=title_font, fill=PRIMARY_COLOR)
+    bar_y = margin + title_font.size * 1.3
+    draw.rectangle((margin, bar_y, width - margin, bar_y + 4 * scale), fill=ACCENT_COLOR)
+
+    top = bar_y + 16 * scale
+    margins = content_text_box().level_margins
+    # Pillow's fonts are not the deck's; shrink a page that would overflow rather than cut it off
+    for size in range(page.font_size or BODY_FONT_SIZE, 7, -1):
+        lines, text_height = _wrap_page(page, size, scale, width - 2 * margin, margins)
+        if top + text_height <= height - margin:
+            break
+    for indent, y, font_size, bullet, words in lines:
+        if bullet:
+            draw.text((margin + indent - font_size * 0.9, top + y), '•', font=_font(False, round(font_size)),
+                      fill=ACCENT_COLOR)
+        for x, word, bold in words:
+            draw.text((margin + indent + x, top + y), word, font=_font(bold, round(font_size)), fill=SECONDARY_COLOR)
+    return image
+
+
+def slide_images(model, width):
+    return [draw_slide(model, page, width) for page in [None] + content_pages(model)]
+
+
+@register_format('pdf', 'pdf', 'application/pdf')
+def render_pdf(model):
+    first, *rest = slide_images(model, EXPORT_PAGE_WIDTH)
+    buffer = io.BytesIO()
+    first.save(buffer, 'PDF', save_all=True, append_images=rest,
+               resolution=EXPORT_PAGE_WIDTH / 10, quality=90)
+    return buffer.getvalue()
+
+
+def thumbnail_name(index):
+    return f"slide-{index + 1:02d}.png"
+
+
+@register_format('png', 'png.zip', 'application/zip')
+def render_thumbnails(model):
+    """A zip of one PNG thumbnail per slide, cover first."""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_STORED) as archive:
+        for index, image in enumerate(slide_images(model, EXPORT_THUMBNAIL_WIDTH)):
+            png = io.BytesIO()
+            image.save(png, 'PNG', optimize=True)
+            archive.writestr(thumbnail_name(index), png.getvalue())
+    return buffer.getvalue()
+
+
+def thumbnail(thumbnails_zip, index):
+    """PNG bytes of slide ``index`` from a rendered ``png`` export, or None."""
+    with zipfile.ZipFile(io.BytesIO(thumbnails_zip)) as archive:
+        try:
+            return archive.read(thumbnail_name(index))
+        except KeyError:
+            return None
+
+
+class ExportCache:
+    """Rendered exports by (deck hash, format): an LRU in memory over the optional artifact store."""
+
+    def __init__(self, memory, store=None):
+        self.memory = memory
+        self.store = store
+
+    def _suffix(self, name):
+        return f".{name}.{EXPORT_FORMATS[name].extension}"
+
+    def get(self, digest, name):
+        data = self.memory.get((digest, name))
+        if data is None and self.store is not None:
+            data = self.store.get(digest, self._suffix(name))
+            if data is not None:
+                self.memory.set((digest, name), data)
+        EXPORT_CACHE_REQUESTS.inc(format=name, result='miss' if data is None else 'hit')
+        return data
+
+    def set(self, digest, name, data):
+        self.memory.set((digest, name), data)
+        if self.store is not None:
+            self.store.put(data, self._suffix(name), digest=digest)
+
+
+export_cache = ExportCache(MemoryCache(EXPORT_CACHE_SIZE, EXPORT_CACHE_TTL), create_artifact_store())
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _executor():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Not fork: the app forks from a process with running threads, and a
+            # child could inherit a lock (metrics, caches) that one of them held
+            context = multiprocessing.get_context('forkserver')
+            context.set_forkserver_preload(['exporters'])
+            _pool = ProcessPoolExecutor(max_workers=EXPORT_WORKERS, mp_context=context)
+        return _pool
+
+
+def _reset_executor():
+    global _pool
+    with _pool_lock:
+        _pool = None
+
+
+def _render(name, model):
+    """Runs in a pool process."""
+    return EXPORT_FORMATS[name].render(model)
+
+
+def iter_exports(model, formats, cache=export_cache):
+    """Yield ``(format, bytes)`` for each of ``formats``, cached ones first, the rest as they finish."""
+    unknown = [name for name in formats if name not in EXPORT_FORMATS]
+    if unknown:
+        raise ValueError(f"Unknown export formats: {', '.join(unknown)}. Use: {', '.join(EXPORT_FORMATS)}")
+
+    digest = deck_hash(model)
+    missing = []
+    for name in dict.fromkeys(formats):
+        data = cache.get(digest, name)
+        if data is None:
+            missing.append(name)
+        else:
+            yield name, data
+
+    # A single format is not worth the round trip through a worker process
+    if EXPORT_WORKERS <= 0 or len(missing) == 1:
+        for name in missing:
+            data = EXPORT_FORMATS[name].render(model)
+            cache.set(digest, name, data)
+            yield name, data
+        return
+
+    pending = {}
+    try:
+        pending = {_executor().submit(_render, name, model): name for name in missing}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = pending.pop(future)
+                data = future.result()
+                cache.set(digest, name, data)
+                yield name, data
+    except BrokenProcessPool:
+        # A worker died (e.g. killed for memory); start a fresh pool next time
+        _reset_executor()
+        raise
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def export_deck(model, formats, cache=export_cache):
+    """Render ``formats`` of ``model`` and return ``{format: bytes}``."""
+    return dict(iter_exports(model, formats, cache))
+
+
+class _StreamBuffer(io.RawIOBase):
+    """Unseekable sink that hands written bytes back out, for streaming a zip."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def iter_export_zip(model, formats, stem, cache=export_cache):
+    """Stream a zip of ``formats`` named ``<stem>.<extension>``, each written as soon as it is rendered."""
+    sink = _StreamBuffer()
+    with zipfile.ZipFile(sink, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, data in iter_exports(model, formats, cache):
+            compression = zipfile.ZIP_STORED if name in COMPRESSED_FORMATS else zipfile.ZIP_DEFLATED
+            archive.writestr(f"{stem}.{EXPORT_FORMATS[name].extension}", data, compress_type=compression)
+            yield sink.drain()
+    yield sink.drain()
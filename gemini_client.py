@@ -0,0 +1,224 @@
+import asyncio
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+from metrics import GEMINI_RETRIES, GEMINI_TTFB_SECONDS
+
+# Connection and retry settings for all Gemini traffic
+CONNECT_TIMEOUT = float(os.getenv("GEMINI_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.getenv("GEMINI_READ_TIMEOUT", "60"))
+POOL_SIZE = int(os.getenv("GEMINI_POOL_SIZE", "10"))
+# Connections the async client (ASGI app) may hold open at once
+ASYNC_POOL_SIZE = int(os.getenv("GEMINI_ASYNC_POOL_SIZE", "200"))
+MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", "3"))
+BACKOFF_BASE = float(os.getenv("GEMINI_BACKOFF_BASE", "0.5"))
+BACKOFF_MAX = float(os.getenv("GEMINI_BACKOFF_MAX", "8"))
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class GeminiAPIError(Exception):
+    """Raised when the Gemini API answers with a non-200 status."""
+
+    def __init__(self, status_code, text):
+        super().__init__(f"Gemini API error: {status_code} {text}")
+        self.status_code = status_code
+        self.text = text
+
+
+def is_timeout(error):
+    """True if ``error`` is a connect or read timeout from either client."""
+    if isinstance(error, asyncio.TimeoutError):
+        return True
+    # Only loaded once the sync client has been used
+    requests = sys.modules.get('requests')
+    return requests is not None and isinstance(error, requests.Timeout)
+
+
+class GeminiClient:
+    """Thread-safe HTTP client with pooled keep-alive connections.
+
+    A single ``requests.Session`` is shared by all threads; its urllib3
+    connection pool keeps TLS connections to the Gemini host open between
+    calls. Requests that fail with 429/5xx or a network error are retried
+    with jittered exponential backoff. requests is imported with the first
+    session, keeping it off the import path of workers that never call Gemini.
+    """
+
+    def __init__(self, connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT,
+                 pool_size=POOL_SIZE, max_retries=MAX_RETRIES,
+                 backoff_base=BACKOFF_BASE, backoff_max=BACKOFF_MAX):
+        self.timeout = (connect_timeout, read_timeout)
+        self.pool_size = pool_size
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._session = None
+        self._lock = threading.Lock()
+
+    @property
+    def session(self):
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    import requests
+                    from requests.adapters import HTTPAdapter
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                    session.mount('https://', adapter)
+                    session.mount('http://', adapter)
+                    session.headers.update({'Content-Type': 'application/json'})
+                    self._session = session
+        return self._session
+
+    def _backoff(self, attempt, response=None):
+        """Full-jitter exponential backoff, honouring Retry-After when sent."""
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        if response is not None:
+            retry_after = response.headers.get('Retry-After')
+            if retry_after and retry_after.isdigit():
+                delay = max(delay, min(self.backoff_max, float(retry_after)))
+        return delay
+
+    def post_json(self, url, payload):
+        """POST ``payload`` as JSON and return the decoded JSON response."""
+        return self._post(url, payload).json()
+
+    def stream_json(self, url, payload):
+        """POST ``payload`` to a server-sent events endpoint and yield each JSON event.
+
+        Retries only happen before the first byte of the stream; once events
+        have been yielded a failure is raised to the caller.
+        """
+        response = self._post(url, payload, stream=True)
+        try:
+            # chunk_size=None hands over each chunk as it arrives instead of
+            # waiting for a fixed-size buffer to fill. Lines are decoded here
+            # rather than by requests: SSE is always UTF-8, but without a
+            # charset in Content-Type requests would decode it as ISO-8859-1
+            for line in response.iter_lines(chunk_size=None):
+                line = line.decode('utf-8')
+                if line.startswith('data:'):
+                    yield json.loads(line[len('data:'):].strip())
+        finally:
+            response.close()
+
+    def _post(self, url, payload, stream=False):
+        import requests
+        attempt = 0
+        while True:
+            try:
+                response = self.session.post(url, json=payload, timeout=self.timeout, stream=stream)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt >= self.max_retries:
+                    raise
+                GEMINI_RETRIES.inc(reason=e.__class__.__name__)
+                delay = self._backoff(attempt)
+                print(f"Gemini request failed ({e.__class__.__name__}), retrying in {delay:.2f}s")
+            else:
+                GEMINI_TTFB_SECONDS.observe(response.elapsed.total_seconds())
+                if response.status_code == 200:
+                    return response
+                if response.status_code not in RETRY_STATUS_CODES or attempt >= self.max_retries:
+                    raise GeminiAPIError(response.status_code, response.text)
+                response.close()
+                GEMINI_RETRIES.inc(reason=str(response.status_code))
+                delay = self._backoff(attempt, response)
+                print(f"Gemini API returned {response.status_code}, retrying in {delay:.2f}s")
+            attempt += 1
+            time.sleep(delay)
+
+    def close(self):
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+
+class AsyncGeminiClient(GeminiClient):
+    """Non-blocking client for the ASGI app, built on an ``aiohttp.ClientSession``.
+
+    Uses the same timeouts, retry and backoff policy as ``GeminiClient``.
+    One instance serves every coroutine on the event loop, with up to
+    ``pool_size`` requests in flight. aiohttp is imported on first use so
+    the Flask app does not depend on it; its connection pool stays cheap
+    with hundreds of concurrent requests, which httpx's does not.
+    """
+
+    def __init__(self, pool_size=ASYNC_POOL_SIZE, **kwargs):
+        super().__init__(pool_size=pool_size, **kwargs)
+        self._client = None
+
+    @property
+    def client(self):
+        """The shared ``aiohttp.ClientSession``; create it from a coroutine, on the serving loop."""
+        if self._client is None:
+            import aiohttp
+            connect_timeout, read_timeout = self.timeout
+            self._client = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_size),
+                timeout=aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout),
+                headers={'Content-Type': 'application/json'},
+            )
+        return self._client
+
+    async def post_json(self, url, payload):
+        """POST ``payload`` as JSON and return the decoded JSON response."""
+        import aiohttp
+        attempt = 0
+        while True:
+            started = time.perf_counter()
+            try:
+                async with self.client.post(url, json=payload) as response:
+                    GEMINI_TTFB_SECONDS.observe(time.perf_counter() - started)
+                    if response.status == 200:
+                        return await response.json(content_type=None)
+                    text = await response.text()
+                    if response.status not in RETRY_STATUS_CODES or attempt >= self.max_retries:
+                        raise GeminiAPIError(response.status, text)
+                    GEMINI_RETRIES.inc(reason=str(response.status))
+                    delay = self._backoff(attempt, response)
+                    print(f"Gemini API returned {response.status}, retrying in {delay:.2f}s")
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                if attempt >= self.max_retries:
+                    raise
+                GEMINI_RETRIES.inc(reason=e.__class__.__name__)
+                delay = self._backoff(attempt)
+                print(f"Gemini request failed ({e.__class__.__name__}), retrying in {delay:.2f}s")
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+
+_default_client = None
+_default_lock = threading.Lock()
+_default_async_client = None
+
+
+def get_client():
+    """Return the process-wide Gemini client, creating it on first use."""
+    global _default_client
+    if _default_client is None:
+        with _default_lock:
+            if _default_client is None:
+                _default_client = GeminiClient()
+    return _default_client
+
+
+def get_async_client():
+    """Return the process-wide async Gemini client, creating it on first use.
+
+    Only call this from the event loop thread; the client is bound to it.
+    """
+    global _default_async_client
+    if _default_async_client is None:
+        _default_async_client = AsyncGeminiClient()
+    return _default_async_client
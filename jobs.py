@@ -0,0 +1,226 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import STAGE_SECONDS, span
+
+# Job backend: "memory" (default, single process) or "sqlite" (shared by all workers on the instance)
+JOB_BACKEND = os.getenv("JOB_BACKEND", "memory")
+JOB_DB_PATH = os.getenv("JOB_DB_PATH", "jobs.sqlite3")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+# Finished jobs are forgotten after this many seconds
+JOB_RESULT_TTL = float(os.getenv("JOB_RESULT_TTL", "3600"))
+# Seconds a worker's claim on its queued and running jobs lasts; it is renewed
+# every third of that, so jobs of a worker that died are failed within a lease
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "60"))
+
+# Error recorded on a job whose worker stopped renewing its lease
+LEASE_EXPIRED_ERROR = 'The worker running this job stopped before it finished; submit it again.'
+
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+
+
+class MemoryJobStore:
+    """Keeps jobs in a dict; only visible to the process that created them."""
+
+    def __init__(self):
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def create(self, job):
+        with self._lock:
+            self._jobs[job['id']] = dict(job)
+
+    def update(self, job_id, **fields):
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id].update(fields, updated_at=time.time())
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def renew(self, job_ids, lease_until):
+        # Jobs live and die with this process, so there is nothing to expire
+        pass
+
+    def prune(self, older_than):
+        with self._lock:
+            for job_id in [job_id for job_id, job in self._jobs.items()
+                           if job['status'] in (SUCCEEDED, FAILED) and job['updated_at'] < older_than]:
+                del self._jobs[job_id]
+
+
+class SqliteJobStore:
+    """Keeps jobs in sqlite so any gunicorn worker can report status and results.
+
+    Only the worker that accepted a job runs it. While it does, it renews the
+    job's ``lease_until``; a queued or running job whose lease has run out
+    belonged to a worker that was recycled or killed, and is reported failed.
+    """
+
+    _JSON_FIELDS = ('payload', 'progress')
+
+    def __init__(self, path=JOB_DB_PATH):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, kind TEXT NOT NULL, status TEXT NOT NULL, "
+                "payload TEXT, progress TEXT, result BLOB, result_type TEXT, error TEXT, "
+                "created_at REAL NOT NULL, updated_at REAL NOT NULL, lease_until REAL)"
+            )
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(jobs)")]
+            if 'lease_until' not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN lease_until REAL")
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def _encode(self, fields):
+        return {key: json.dumps(value) if key in self._JSON_FIELDS else value for key, value in fields.items()}
+
+    def create(self, job):
+        row = self._encode(job)
+        columns = ', '.join(row)
+        with self._connect() as conn:
+            conn.execute(f"INSERT INTO jobs ({columns}) VALUES ({', '.join('?' for _ in row)})", tuple(row.values()))
+
+    def update(self, job_id, **fields):
+        row = self._encode(dict(fields, updated_at=time.time()))
+        assignments = ', '.join(f"{column} = ?" for column in row)
+        with self._connect() as conn:
+            conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*row.values(), job_id))
+
+    def renew(self, job_ids, lease_until):
+        if not job_ids:
+            return
+        with self._connect() as conn:
+            conn.execute(f"UPDATE jobs SET lease_until = ? WHERE id IN ({', '.join('?' for _ in job_ids)}) "
+                         "AND status IN (?, ?)", (lease_until, *job_ids, QUEUED, RUNNING))
+
+    def _expire(self, conn, now, job_id=None):
+        query = ("UPDATE jobs SET status = ?, error = ?, updated_at = ? "
+                 "WHERE status IN (?, ?) AND COALESCE(lease_until, updated_at + ?) < ?")
+        # Rows from before leases have none; give them one from their last update
+        params = [FAILED, LEASE_EXPIRED_ERROR, now, QUEUED, RUNNING, JOB_LEASE_SECONDS, now]
+        if job_id is not None:
+            query += " AND id = ?"
+            params.append(job_id)
+        conn.execute(query, params)
+
+    def get(self, job_id):
+        with self._connect() as conn:
+            self._expire(conn, time.time(), job_id)
+        row = self._connect().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        for key in self._JSON_FIELDS:
+            job[key] = json.loads(job[key]) if job[key] else None
+        return job
+
+    def prune(self, older_than):
+        with self._connect() as conn:
+            self._expire(conn, time.time())
+            conn.execute("DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?", (SUCCEEDED, FAILED, older_than))
+
+
+class JobQueue:
+    """Runs submitted jobs on a local thread pool and records their state in a store.
+
+    A handler is registered per job kind. It is called as
+    ``handler(payload, report)`` where ``report(**progress)`` merges progress
+    fields into the job, and returns ``(result, result_type)``: result is
+    either a JSON-serialisable value (``'json'``) or bytes with a mimetype.
+    """
+
+    def __init__(self, store, workers=JOB_WORKERS, lease=JOB_LEASE_SECONDS):
+        self.store = store
+        self.handlers = {}
+        self.lease = lease
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='job')
+        self._active = set()  # ids of this process's queued and running jobs
+        self._active_lock = threading.Lock()
+        self._heartbeat = None
+
+    def register(self, kind, handler):
+        self.handlers[kind] = handler
+
+    def submit(self, kind, payload, progress=None):
+        """Queue a job and return its id."""
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        now = time.time()
+        self.store.prune(now - JOB_RESULT_TTL)
+        job_id = uuid.uuid4().hex
+        self.store.create({
+            'id': job_id, 'kind': kind, 'status': QUEUED, 'payload': payload,
+            'progress': progress or {}, 'created_at': now, 'updated_at': now, 'lease_until': now + self.lease,
+        })
+        with self._active_lock:
+            self._active.add(job_id)
+            # Started on first use rather than at import, so it runs in each
+            # forked gunicorn worker instead of dying with the master
+            if self._heartbeat is None:
+                self._heartbeat = threading.Thread(target=self._renew_leases, name='job-heartbeat', daemon=True)
+                self._heartbeat.start()
+        self._executor.submit(self._run, job_id, kind, payload, dict(progress or {}), time.perf_counter())
+        return job_id
+
+    def _run(self, job_id, kind, payload, progress, submitted):
+        STAGE_SECONDS.observe(time.perf_counter() - submitted, stage='job_queue_wait', section=kind)
+        lock = threading.Lock()
+
+        def report(**fields):
+            with lock:
+                progress.update(fields)
+                self.store.update(job_id, progress=dict(progress))
+
+        self.store.update(job_id, status=RUNNING)
+        try:
+            with span('job_run', kind):
+                result, result_type = self.handlers[kind](payload, report)
+            if result_type == 'json':
+                result = json.dumps(result)
+            self.store.update(job_id, status=SUCCEEDED, result=result, result_type=result_type)
+        except Exception as e:
+            print(f"Job {job_id} ({kind}) failed: {str(e)}")
+            self.store.update(job_id, status=FAILED, error=str(e))
+        finally:
+            with self._active_lock:
+                self._active.discard(job_id)
+
+    def _renew_leases(self):
+        while True:
+            time.sleep(self.lease / 3)
+            with self._active_lock:
+                job_ids = list(self._active)
+            try:
+                self.store.renew(job_ids, time.time() + self.lease)
+            except Exception as e:
+                print(f"Could not renew job leases: {str(e)}")
+
+    def get(self, job_id):
+        return self.store.get(job_id)
+
+
+def create_job_queue():
+    """Build the job queue from the JOB_* settings."""
+    store = SqliteJobStore(JOB_DB_PATH) if JOB_BACKEND == 'sqlite' else MemoryJobStore()
+    return JobQueue(store)
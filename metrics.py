@@ -0,0 +1,165 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# Latency buckets in seconds, from fast rendering steps up to slow Gemini calls
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _label_key(labelnames, labels):
+    return tuple(str(labels.get(name, '')) for name in labelnames)
+
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = [(name, value) for name, value in zip(labelnames, values) if value != ''] + list(extra)
+    if not pairs:
+        return ''
+    escaped = (value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(_label_key(self.labelnames, labels), 0)
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {value}" for key, value in items]
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = value
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            counts, total, observations = self._values.get(key, ([0] * len(self.buckets), 0.0, 0))
+            counts = [count + (value <= bound) for count, bound in zip(counts, self.buckets)]
+            self._values[key] = (counts, total + value, observations + 1)
+
+    def count(self, **labels):
+        return self._values.get(_label_key(self.labelnames, labels), (None, 0.0, 0))[2]
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        lines = []
+        for key, (counts, total, observations) in items:
+            for bound, count in zip(self.buckets, counts):
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', repr(bound))])} {count}")
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', '+Inf')])} {observations}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {observations}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self):
+        """Render every metric in the Prometheus text exposition format."""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+# Metrics are per process; with several gunicorn workers each one exposes its own
+registry = Registry()
+
+STAGE_SECONDS = registry.histogram(
+    'pitchdeck_stage_seconds', 'Time spent in each generation or rendering stage.', ('stage', 'section'))
+ERRORS = registry.counter(
+    'pitchdeck_errors_total', 'Errors by stage.', ('stage',))
+CACHE_REQUESTS = registry.counter(
+    'pitchdeck_cache_requests_total', 'Response cache lookups by result.', ('result',))
+GEMINI_TTFB_SECONDS = registry.histogram(
+    'gemini_time_to_first_byte_seconds', 'Time until Gemini response headers arrive, per attempt.')
+GEMINI_RETRIES = registry.counter(
+    'gemini_retries_total', 'Gemini requests retried, by reason.', ('reason',))
+GEMINI_TOKENS = registry.counter(
+    'gemini_tokens_total', 'Tokens reported in Gemini usageMetadata.', ('type', 'section'))
+HTTP_REQUEST_SECONDS = registry.histogram(
+    'http_request_duration_seconds', 'API request latency by endpoint.', ('endpoint', 'method', 'status'))
+
+
+@contextmanager
+def span(stage, section=''):
+    """Time a stage into ``pitchdeck_stage_seconds`` and count it as an error if it raises."""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        ERRORS.inc(stage=stage)
+        raise
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage=stage, section=section)
+
+
+def record_usage(usage, section=''):
+    """Add the token counts from a Gemini ``usageMetadata`` block."""
+    for field, token_type in (('promptTokenCount', 'prompt'),
+                              ('candidatesTokenCount', 'candidates'),
+                              ('cachedContentTokenCount', 'cached'),
+                              ('totalTokenCount', 'total')):
+        if usage.get(field):
+            GEMINI_TOKENS.inc(usage[field], type=token_type, section=section)
@@ -0,0 +1,183 @@
+"""Registry of the Gemini models (and endpoints) used for generation.
+
+Each section is generated by a chain of models: the section's own model
+(``GEMINI_SECTION_MODELS``, else ``GEMINI_FAST_MODEL`` for the short cover
+tagline, else ``GEMINI_MODEL``) followed by ``GEMINI_FALLBACK_MODEL``. A
+model that runs into its quota (429 after retries), is overloaded (503),
+times out or exceeds ``GEMINI_LATENCY_BUDGET`` is skipped for
+``GEMINI_FALLBACK_COOLDOWN`` seconds, so calls go straight to the next model
+instead of paying the retries again.
+
+Nothing here touches the network or reads the API key until a call is made.
+"""
+import os
+import threading
+import time
+
+from gemini_client import GeminiAPIError, is_timeout
+from metrics import registry
+
+GEMINI_API_BASE = os.getenv("GEMINI_API_BASE", "https://generativelanguage.googleapis.com/v1beta")
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.0-flash")
+# Cheaper, faster model for short outputs such as the cover tagline
+GEMINI_FAST_MODEL = os.getenv("GEMINI_FAST_MODEL", "gemini-2.0-flash-lite")
+# Used when a section's model is over quota or too slow; empty disables fallback
+GEMINI_FALLBACK_MODEL = os.getenv("GEMINI_FALLBACK_MODEL", "gemini-2.0-flash-lite")
+# Per-section overrides, e.g. "market=gemini-2.5-flash,team=gemini-2.0-flash-lite"
+GEMINI_SECTION_MODELS = os.getenv("GEMINI_SECTION_MODELS", "")
+# Per-model API base overrides, e.g. "gemini-2.5-flash=https://proxy.internal/v1beta"
+GEMINI_MODEL_ENDPOINTS = os.getenv("GEMINI_MODEL_ENDPOINTS", "")
+# Seconds a successful call may take before its model is treated as degraded; 0 disables
+GEMINI_LATENCY_BUDGET = float(os.getenv("GEMINI_LATENCY_BUDGET", "0"))
+GEMINI_FALLBACK_COOLDOWN = float(os.getenv("GEMINI_FALLBACK_COOLDOWN", "60"))
+
+# Sections whose output is a single short line
+FAST_SECTIONS = ('cover',)
+
+MODEL_FALLBACKS = registry.counter(
+    'gemini_model_fallbacks_total', 'Models skipped in favour of the next one in the chain, by reason.',
+    ('model', 'reason'))
+
+
+def api_key():
+    """Return the Gemini API key, read when the first call is made rather than at import."""
+    key = os.getenv("GEMINI_API_KEY")
+    if not key:
+        raise ValueError("GEMINI_API_KEY environment variable not set. Please set it in your .env file or environment variables.")
+    return key
+
+
+def parse_mapping(value):
+    """Parse ``"a=b,c=d"`` into a dict, ignoring blank entries."""
+    mapping = {}
+    for item in value.split(','):
+        if '=' in item:
+            key, _, target = item.partition('=')
+            mapping[key.strip()] = target.strip()
+    return mapping
+
+
+def fallback_reason(error):
+    """Why ``error`` should move a call to the next model, or None if it should not."""
+    if isinstance(error, GeminiAPIError):
+        if error.status_code == 429:
+            return 'quota'
+        if error.status_code == 503:
+            return 'overloaded'
+        return None
+    if is_timeout(error):
+        return 'timeout'
+    return None
+
+
+class ModelBackend:
+    """One model on one API endpoint."""
+
+    def __init__(self, model, api_base=GEMINI_API_BASE):
+        self.model = model
+        self.api_base = api_base
+        self.degraded_until = 0.0
+
+    @property
+    def available(self):
+        return time.monotonic() >= self.degraded_until
+
+    def generate_url(self):
+        return f"{self.api_base}/models/{self.model}:generateContent?key={api_key()}"
+
+    def stream_url(self):
+        return f"{self.api_base}/models/{self.model}:streamGenerateContent?alt=sse&key={api_key()}"
+
+    def cached_contents_url(self):
+        return f"{self.api_base}/cachedContents?key={api_key()}"
+
+
+class ModelRegistry:
+    """Maps sections to model chains and moves calls down a chain when a model is degraded."""
+
+    def __init__(self, default_model=GEMINI_MODEL, fast_model=GEMINI_FAST_MODEL,
+                 fallback_model=GEMINI_FALLBACK_MODEL, section_models=None, endpoints=None,
+                 latency_budget=GEMINI_LATENCY_BUDGET, cooldown=GEMINI_FALLBACK_COOLDOWN):
+        self.default_model = default_model
+        self.fast_model = fast_model or default_model
+        self.fallback_model = fallback_model
+        self.section_models = dict(section_models or {})
+        self.endpoints = dict(endpoints or {})
+        self.latency_budget = latency_budget
+        self.cooldown = cooldown
+        self._backends = {}
+        self._lock = threading.Lock()
+
+    def backend(self, model):
+        with self._lock:
+            if model not in self._backends:
+                self._backends[model] = ModelBackend(model, self.endpoints.get(model, GEMINI_API_BASE))
+            return self._backends[model]
+
+    def model_for(self, section):
+        """The model a section is generated with when nothing is degraded."""
+        if section in self.section_models:
+            return self.section_models[section]
+        if section in FAST_SECTIONS:
+            return self.fast_model
+        return self.default_model
+
+    def chain(self, section):
+        models = [self.model_for(section)]
+        if self.fallback_model and self.fallback_model not in models:
+            models.append(self.fallback_model)
+        return [self.backend(model) for model in models]
+
+    def _candidates(self, section):
+        chain = self.chain(section)
+        # With every model degraded, try them all in order anyway
+        return [backend for backend in chain if backend.available] or chain
+
+    def _degrade(self, backend, reason):
+        backend.degraded_until = time.monotonic() + self.cooldown
+        MODEL_FALLBACKS.inc(model=backend.model, reason=reason)
+        print(f"Model {backend.model} degraded ({reason}); using the next model for {self.cooldown:.0f}s")
+
+    def _over_budget(self, section, backend, started):
+        # A slow answer is still used; later calls move on while there is somewhere to move to
+        if (self.latency_budget and time.monotonic() - started > self.latency_budget
+                and backend is not self.chain(section)[-1]):
+            self._degrade(backend, 'latency')
+
+    def call(self, section, fn):
+        """Return ``fn(backend)`` for the first model in the section's chain that succeeds."""
+        candidates = self._candidates(section)
+        for index, backend in enumerate(candidates):
+            started = time.monotonic()
+            try:
+                result = fn(backend)
+            except Exception as e:
+                reason = fallback_reason(e)
+                if reason is None or index == len(candidates) - 1:
+                    raise
+                self._degrade(backend, reason)
+                continue
+            self._over_budget(section, backend, started)
+            return result
+
+    async def call_async(self, section, fn):
+        """``call`` for a coroutine function ``fn``."""
+        candidates = self._candidates(section)
+        for index, backend in enumerate(candidates):
+            started = time.monotonic()
+            try:
+                result = await fn(backend)
+            except Exception as e:
+                reason = fallback_reason(e)
+                if reason is None or index == len(candidates) - 1:
+                    raise
+                self._degrade(backend, reason)
+                continue
+            self._over_budget(section, backend, started)
+            return result
+
+
+def create_model_registry():
+    """Build the registry from the GEMINI_* model settings."""
+    return ModelRegistry(section_models=parse_mapping(GEMINI_SECTION_MODELS),
+                         endpoints=parse_mapping(GEMINI_MODEL_ENDPOINTS))
@@ -1,42 +1,214 @@
+"""PowerPoint rendering and patching with python-pptx.
+
+python-pptx (with lxml) takes a noticeable share of a cold start to
+import, and most requests never render a PPTX. So nothing imported at
+startup imports this module at module level: app.py, asgi_app.py,
+batch.py and exporters.py import it inside the functions that render,
+and the first of those pays for the import.
+"""
 from pptx import Presentation
 from pptx.util import Inches, Pt
 from pptx.dml.color import RGBColor
 from pptx.enum.text import PP_ALIGN
+from pptx.oxml.ns import qn
+from pptx.oxml.xmlchemy import OxmlElement
+from deck_model import BULLET_SECTIONS, DEFAULT_TAGLINE, SECTION_TITLES, continuation_title
+from metrics import span
+from slide_layout import TextBox, layout_text, level_size
+import functools
+import hashlib
+import io
 import os
 from datetime import datetime
 
+# Branded master to build decks from; python-pptx's default template when unset
+PPT_TEMPLATE_PATH = os.getenv("PPT_TEMPLATE_PATH")
+
+# Layouts used from the template: cover and title+content
+TITLE_LAYOUT_INDEX = 0
+CONTENT_LAYOUT_INDEX = 1
+
+# Define colors
+PRIMARY_COLOR = RGBColor(0, 112, 192)  # Professional blue
+SECONDARY_COLOR = RGBColor(68, 68, 68)  # Dark gray
+ACCENT_COLOR = RGBColor(255, 102, 0)   # Orange accent
+
+# Define fonts
+TITLE_FONT = 'Calibri'
+BODY_FONT = 'Calibri'
+
+# Text styles baked into the layout placeholders, keyed by (layout index, placeholder idx):
+# (font, size in points, bold, color, outline levels)
+PLACEHOLDER_STYLES = {
+    (TITLE_LAYOUT_INDEX, 0): (TITLE_FONT, 44, True, PRIMARY_COLOR, 1),
+    (TITLE_LAYOUT_INDEX, 1): (BODY_FONT, 24, False, SECONDARY_COLOR, 1),
+    (CONTENT_LAYOUT_INDEX, 0): (TITLE_FONT, 36, True, PRIMARY_COLOR, 1),
+    (CONTENT_LAYOUT_INDEX, 1): (BODY_FONT, 18, False, SECONDARY_COLOR, 3),
+}
+
+def _bake_placeholder_style(placeholder, font, size, bold, color, levels):
+    """Write the text style into a layout placeholder's list style.
+
+    Slides inherit it, so text added to the slide placeholders needs no
+    per-paragraph formatting.
+    """
+    txBody = placeholder._element.txBody
+    lstStyle = txBody.find(qn('a:lstStyle'))
+    if lstStyle is None:
+        lstStyle = OxmlElement('a:lstStyle')
+        txBody.find(qn('a:bodyPr')).addnext(lstStyle)
+    for level in range(1, levels + 1):
+        tag = qn(f'a:lvl{level}pPr')
+        lvlPr = lstStyle.find(tag)
+        if lvlPr is None:
+            lvlPr = OxmlElement(f'a:lvl{level}pPr')
+            lstStyle.append(lvlPr)
+        defRPr = lvlPr.find(qn('a:defRPr'))
+        if defRPr is not None:
+            lvlPr.remove(defRPr)
+        # Nested bullet levels step down 2pt each
+        defRPr = OxmlElement('a:defRPr')
+        defRPr.set('sz', str((size - 2 * (level - 1)) * 100))
+        defRPr.set('b', '1' if bold else '0')
+        solidFill = OxmlElement('a:solidFill')
+        srgbClr = OxmlElement('a:srgbClr')
+        srgbClr.set('val', str(color))
+        solidFill.append(srgbClr)
+        defRPr.append(solidFill)
+        latin = OxmlElement('a:latin')
+        latin.set('typeface', font)
+        defRPr.append(latin)
+        lvlPr.append(defRPr)
+
+@functools.lru_cache(maxsize=None)
+def _prepared_template(template_path):
+    """Load a template once per process and return it styled and serialized.
+
+    Layouts the generator does not use are dropped, which keeps both the
+    per-deck parse and the final save small.
+    """
+    prs = Presentation(template_path)
+    layouts = prs.slide_layouts
+    for (layout_index, idx), style in PLACEHOLDER_STYLES.items():
+        placeholder = layouts[layout_index].placeholders.get(idx=idx)
+        if placeholder is not None:
+            _bake_placeholder_style(placeholder, *style)
+
+    used = [layouts[TITLE_LAYOUT_INDEX], layouts[CONTENT_LAYOUT_INDEX]]
+    for layout in list(layouts):
+        if layout not in used and not layout.used_by_slides:
+            layouts.remove(layout)
+
+    buffer = io.BytesIO()
+    prs.save(buffer)
+    # Positions of the cover and content layouts after pruning
+    layout_positions = tuple(list(layouts).index(layout) for layout in used)
+    return buffer.getvalue(), layout_positions
+
+def load_template(template_path=None):
+    """Return a fresh Presentation cloned from the prepared template, plus its
+    (cover layout, content layout)"""
+    data, (title_position, content_position) = _prepared_template(template_path or PPT_TEMPLATE_PATH)
+    prs = Presentation(io.BytesIO(data))
+    return prs, prs.slide_layouts[title_position], prs.slide_layouts[content_position]
+
+# Slides are tagged through their (otherwise unused) cSld name so that a deck
+# can be patched later, even after it has been edited in PowerPoint
+SLIDE_TAG_PREFIX = 'pitchdeck:'
+TITLE_SLIDE_TAG = 'title'
+
+# Continuation slides of a section are tagged "<section>/<n>", n counting from 2
+CONTINUATION_SEPARATOR = '/'
+
+# Body size of the content layout, which layouts are computed at
+BODY_FONT_SIZE = PLACEHOLDER_STYLES[(CONTENT_LAYOUT_INDEX, 1)][1]
+
+def _tag_slide(slide, tag):
+    slide._element.cSld.set('name', SLIDE_TAG_PREFIX + tag)
+
+def _slide_tag(slide):
+    name = slide._element.cSld.get('name') or ''
+    return name[len(SLIDE_TAG_PREFIX):] if name.startswith(SLIDE_TAG_PREFIX) else None
+
+def _text_box(prs, layout):
+    """The body placeholder's text area and outline level margins in points"""
+    placeholder = layout.placeholders.get(idx=1)
+    width = placeholder.width if placeholder is not None and placeholder.width else prs.slide_width * 0.9
+    height = placeholder.height if placeholder is not None and placeholder.height else prs.slide_height * 0.65
+    body_style = prs.slide_master.element.find(qn('p:txStyles'))
+    body_style = body_style.find(qn('p:bodyStyle')) if body_style is not None else None
+    margins = []
+    for level in range(1, 4):
+        lvlPr = body_style.find(qn(f'a:lvl{level}pPr')) if body_style is not None else None
+        margin = lvlPr.get('marL') if lvlPr is not None else None
+        margins.append(int(margin) if margin else 342900 * level)
+    # Default text frame insets are 0.1in left and right, 0.05in top and bottom
+    return TextBox(width / 12700 - 14.4, height / 12700 - 7.2, tuple(margin / 12700 for margin in margins))
+
+@functools.lru_cache(maxsize=None)
+def content_text_box(template_path=None):
+    """Body text box of the template's content layout, which other export formats lay sections out in"""
+    prs, _, content_layout = load_template(template_path)
+    return _text_box(prs, content_layout)
+
+def _fill_page(tf, page):
+    """Write a laid-out page into a body text frame, starting in its first paragraph"""
+    first = tf.paragraphs[0]
+    pPr = first._p.pPr
+    if pPr is not None:
+        first._p.remove(pPr)
+    for index, paragraph in enumerate(page.paragraphs):
+        p = first if index == 0 else tf.add_paragraph()
+        p.level = paragraph.level
+        if not paragraph.bullet:
+            pPr = p._p.get_or_add_pPr()
+            pPr.set('marL', '0')
+            pPr.set('indent', '0')
+            pPr.append(OxmlElement('a:buNone'))
+        for text, bold in paragraph.runs:
+            run = p.add_run()
+            run.text = text
+            if bold:
+                run.font.bold = True
+            if page.font_size:
+                run.font.size = Pt(level_size(page.font_size, paragraph.level))
+
 class PitchDeckGenerator:
-    def __init__(self):
-        self.prs = Presentation()
-        self._setup_slide_layouts()
-        
-    def _setup_slide_layouts(self):
-        """Define custom slide layouts and styles"""
-        # Define colors
-        self.PRIMARY_COLOR = RGBColor(0, 112, 192)  # Professional blue
-        self.SECONDARY_COLOR = RGBColor(68, 68, 68)  # Dark gray
-        self.ACCENT_COLOR = RGBColor(255, 102, 0)   # Orange accent
-        
-        # Define fonts
-        self.TITLE_FONT = 'Calibri'
-        self.BODY_FONT = 'Calibri'
+    PRIMARY_COLOR = PRIMARY_COLOR
+    SECONDARY_COLOR = SECONDARY_COLOR
+    ACCENT_COLOR = ACCENT_COLOR
+    TITLE_FONT = TITLE_FONT
+    BODY_FONT = BODY_FONT
+
+    def __init__(self, template_path=None):
+        self.prs, self.title_layout, self.content_layout = load_template(template_path)
+        self.text_box = _text_box(self.prs, self.content_layout)
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Open a previously rendered deck for patching"""
+        generator = cls.__new__(cls)
+        generator.prs = Presentation(io.BytesIO(data))
+        layouts = generator.prs.slide_layouts
+        generator.title_layout = layouts[min(TITLE_LAYOUT_INDEX, len(layouts) - 1)]
+        generator.content_layout = layouts[min(CONTENT_LAYOUT_INDEX, len(layouts) - 1)]
+        for slide in generator.prs.slides:
+            if _slide_tag(slide) in SECTION_TITLES:
+                generator.content_layout = slide.slide_layout
+                break
+        generator.text_box = _text_box(generator.prs, generator.content_layout)
+        return generator
         
     def _create_title_slide(self, startup_name, tagline):
-        """Create the cover slide with professional styling"""
-        slide = self.prs.slides.add_slide(self.prs.slide_layouts[0])
+        """Create the cover slide; title and tagline styles come from the layout"""
+        slide = self.prs.slides.add_slide(self.title_layout)
+        _tag_slide(slide, TITLE_SLIDE_TAG)
         
         # Add title
-        title = slide.shapes.title
-        title.text = startup_name
-        title.text_frame.paragraphs[0].font.size = Pt(44)
-        title.text_frame.paragraphs[0].font.color.rgb = self.PRIMARY_COLOR
-        title.text_frame.paragraphs[0].font.bold = True
+        slide.shapes.title.text = startup_name
         
         # Add tagline
-        subtitle = slide.placeholders[1]
-        subtitle.text = tagline
-        subtitle.text_frame.paragraphs[0].font.size = Pt(24)
-        subtitle.text_frame.paragraphs[0].font.color.rgb = self.SECONDARY_COLOR
+        slide.placeholders[1].text = tagline
         
         # Add date
         date_box = slide.shapes.add_textbox(Inches(8), Inches(6.5), Inches(2), Inches(0.5))
@@ -44,62 +216,40 @@ class PitchDeckGenerator:
         date_box.text_frame.paragraphs[0].font.size = Pt(12)
         date_box.text_frame.paragraphs[0].font.color.rgb = self.SECONDARY_COLOR
         
-    def _create_content_slide(self, title, content, section_type):
-        """Create a content slide with consistent styling"""
-        slide = self.prs.slides.add_slide(self.prs.slide_layouts[1])
-        
-        # Add title
-        title_shape = slide.shapes.title
-        title_shape.text = title
-        title_shape.text_frame.paragraphs[0].font.size = Pt(36)
-        title_shape.text_frame.paragraphs[0].font.color.rgb = self.PRIMARY_COLOR
-        title_shape.text_frame.paragraphs[0].font.bold = True
-        
-        # Add content
-        content_shape = slide.placeholders[1]
-        tf = content_shape.text_frame
-        
-        # Process content based on section type
-        if section_type in ['problem', 'solution', 'market']:
-            # Use bullet points
-            for point in content.split('\n'):
-                if point.strip():
-                    p = tf.add_paragraph()
-                    p.text = point.strip()
-                    p.font.size = Pt(18)
-                    p.font.color.rgb = self.SECONDARY_COLOR
-                    p.level = 0
+    def _layout(self, content, section_type):
+        return layout_text(content, section_type in BULLET_SECTIONS, self.text_box, BODY_FONT_SIZE)
+
+    def _add_content_slide(self, title, section_type, number, page):
+        """Add one page of a section; pages after the first are continuation slides"""
+        slide = self.prs.slides.add_slide(self.content_layout)
+        if number == 1:
+            _tag_slide(slide, section_type)
         else:
-            # Use regular text
-            p = tf.add_paragraph()
-            p.text = content
-            p.font.size = Pt(18)
-            p.font.color.rgb = self.SECONDARY_COLOR
-            
+            _tag_slide(slide, f"{section_type}{CONTINUATION_SEPARATOR}{number}")
+            title = continuation_title(title)
+        slide.shapes.title.text = title
+        _fill_page(slide.placeholders[1].text_frame, page)
+        return slide
+
+    def _create_content_slide(self, title, content, section_type):
+        """Create a section's slide, plus continuation slides for content that
+        does not fit; title and body styles come from the layout. Returns the
+        slides in order."""
+        pages = self._layout(content, section_type)
+        return [self._add_content_slide(title, section_type, number, page)
+                for number, page in enumerate(pages, 1)]
+
     def generate_pitch_deck(self, form_data, generated_deck):
         """Generate a complete pitch deck from the provided data"""
         # Create cover slide using form_data
         self._create_title_slide(
             form_data['startup_name'],
-            form_data.get('tagline', 'Transforming Ideas into Reality')
+            form_data.get('tagline', DEFAULT_TAGLINE)
         )
         
         # Create content slides using generated_deck and SLIDE_SECTIONS order
-        sections_map = {
-            'cover': 'Cover Slide',
-            'problem': 'The Problem',
-            'solution': 'Our Solution',
-            'market': 'Market Opportunity',
-            'product': 'Product Overview',
-            'business_model': 'Business Model',
-            'competition': 'Competitive Advantage',
-            'team': 'Our Team',
-            'traction': 'Traction & Milestones',
-            'funding_needs': 'Investment Opportunity'
-        }
-        
-        for section_key in sections_map.keys():
-            title = sections_map[section_key]
+        for section_key in SECTION_TITLES.keys():
+            title = SECTION_TITLES[section_key]
             content = generated_deck.get(section_key)
             
             if content:
@@ -109,24 +259,144 @@ class PitchDeckGenerator:
                     section_key
                 )
                 
+    def _find_section_slides(self):
+        """Map section -> slide, by tag or, for untagged decks, by slide title"""
+        titles = {title: section for section, title in SECTION_TITLES.items()}
+        found = {}
+        for slide in self.prs.slides:
+            tag = _slide_tag(slide)
+            if tag is None and slide.shapes.title is not None:
+                tag = titles.get(slide.shapes.title.text_frame.text.strip())
+            if tag and CONTINUATION_SEPARATOR not in tag and tag not in found:
+                found[tag] = slide
+        return found
+
+    def _continuation_slides(self, section):
+        prefix = section + CONTINUATION_SEPARATOR
+        return [slide for slide in self.prs.slides if (_slide_tag(slide) or '').startswith(prefix)]
+
+    def _move_slide(self, slide, position):
+        sldIdLst = self.prs.slides._sldIdLst
+        for sldId in sldIdLst:
+            if self.prs.slides.part.related_part(sldId.rId) is slide.part:
+                sldIdLst.remove(sldId)
+                sldIdLst.insert(position, sldId)
+                return
+
+    def _delete_slide(self, slide):
+        sldIdLst = self.prs.slides._sldIdLst
+        for sldId in sldIdLst:
+            if self.prs.slides.part.related_part(sldId.rId) is slide.part:
+                # Unlist first: drop_rel keeps relationships still referenced from the XML
+                sldIdLst.remove(sldId)
+                self.prs.part.drop_rel(sldId.rId)
+                # Keep partnames contiguous so the next added slide gets a free one
+                self.prs.part.rename_slide_parts([remaining.rId for remaining in sldIdLst])
+                return
+
+    def patch_sections(self, changed_sections, form_data=None):
+        """Rewrite only the slides of ``changed_sections`` in place.
+
+        Other slides, slide order and any manual edits elsewhere in the file
+        are left untouched. A changed section without a slide gets a new one
+        after the preceding section's slide; a section changed to empty
+        content has its slide removed. Continuation slides are rebuilt with
+        their section. With ``form_data`` the cover title and tagline are
+        refreshed too.
+        """
+        slides = self._find_section_slides()
+
+        if form_data and TITLE_SLIDE_TAG in slides:
+            title_slide = slides[TITLE_SLIDE_TAG]
+            title_slide.shapes.title.text = form_data['startup_name']
+            if form_data.get('tagline'):
+                title_slide.placeholders[1].text = form_data['tagline']
+
+        order = [TITLE_SLIDE_TAG] + list(SECTION_TITLES)
+        for section in SECTION_TITLES:
+            if section not in changed_sections:
+                continue
+            content = changed_sections[section]
+            slide = slides.get(section)
+
+            for continuation in self._continuation_slides(section):
+                self._delete_slide(continuation)
+
+            if not content:
+                if slide is not None:
+                    self._delete_slide(slide)
+                    del slides[section]
+                continue
+
+            if slide is None:
+                new_slides = self._create_content_slide(SECTION_TITLES[section], content, section)
+                # Place it after the closest earlier section that has a slide
+                position = 0
+                for previous in reversed(order[:order.index(section)]):
+                    if previous in slides:
+                        position = list(self.prs.slides).index(slides[previous]) + 1
+                        previous_continuations = self._continuation_slides(previous)
+                        if previous_continuations:
+                            position = list(self.prs.slides).index(previous_continuations[-1]) + 1
+                        break
+                for offset, new_slide in enumerate(new_slides):
+                    self._move_slide(new_slide, position + offset)
+                slides[section] = new_slides[0]
+                continue
+
+            _tag_slide(slide, section)
+            slide.shapes.title.text = SECTION_TITLES[section]
+            pages = self._layout(content, section)
+            tf = slide.placeholders[1].text_frame
+            tf.clear()
+            _fill_page(tf, pages[0])
+            position = list(self.prs.slides).index(slide) + 1
+            for number, page in enumerate(pages[1:], 2):
+                self._move_slide(self._add_content_slide(SECTION_TITLES[section], section, number, page),
+                                 position + number - 2)
+
     def save(self, filename):
         """Save the presentation to a file"""
         self.prs.save(filename)
         return os.path.abspath(filename)
 
+    def to_bytes(self):
+        """Save the presentation into an in-memory buffer, rewound for reading"""
+        buffer = io.BytesIO()
+        self.prs.save(buffer)
+        buffer.seek(0)
+        return buffer
+
+def render_ppt(form_data, generated_deck):
+    """Render the pitch deck to an in-memory PPTX buffer without touching disk"""
+    with span('pptx_build'):
+        generator = PitchDeckGenerator()
+        generator.generate_pitch_deck(form_data, generated_deck)
+    with span('pptx_save'):
+        return generator.to_bytes()
+
+def patch_ppt(ppt_bytes, changed_sections, form_data=None):
+    """Patch the slides of ``changed_sections`` in a rendered deck and return a new PPTX buffer"""
+    with span('pptx_patch'):
+        generator = PitchDeckGenerator.from_bytes(ppt_bytes)
+        generator.patch_sections(changed_sections, form_data)
+    with span('pptx_save'):
+        return generator.to_bytes()
+
 def generate_ppt(form_data, generated_deck, output_dir='generated_decks'):
     """Generate a PowerPoint presentation from the pitch deck data"""
     # Create output directory if it doesn't exist
     os.makedirs(output_dir, exist_ok=True)
     
-    # Generate filename using startup_name from form_data
+    data = render_ppt(form_data, generated_deck).getvalue()
+
+    # Generate filename using startup_name from form_data; the content hash
+    # keeps two renders in the same second from overwriting each other
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"{form_data['startup_name'].replace(' ', '_')}_{timestamp}.pptx"
+    digest = hashlib.sha256(data).hexdigest()[:8]
+    filename = f"{form_data['startup_name'].replace(' ', '_')}_{timestamp}_{digest}.pptx"
     filepath = os.path.join(output_dir, filename)
     
-    # Generate the presentation
-    generator = PitchDeckGenerator()
-    generator.generate_pitch_deck(form_data, generated_deck)
-    
-    # Save and return the file path
-    return generator.save(filepath) 
\ No newline at end of file
+    with open(filepath, 'wb') as f:
+        f.write(data)
+    return os.path.abspath(filepath) 
\ No newline at end of file
@@ -0,0 +1,280 @@
+"""Prompts sent to Gemini.
+
+Every call shares one system preamble (``system_instruction``): the role,
+tone and output rules that used to be repeated in each prompt. A section
+prompt then carries only the form fields that section depends on
+(``SECTION_FIELDS``), one ``Label: value`` line each with whitespace
+collapsed, trimmed to PROMPT_TOKEN_BUDGET estimated tokens.
+
+With GEMINI_CONTEXT_CACHE on, the preamble is stored once per model with
+Gemini context caching and referenced by name, so it is billed at the
+cached rate. Gemini only caches content above a model-specific minimum
+size, so this pays off with a long PROMPT_GUIDELINES_FILE; when creating
+the cache fails the preamble is sent inline instead.
+"""
+import functools
+import hashlib
+import os
+import threading
+import time
+
+from deck_model import SECTION_TITLES
+from gemini_client import get_async_client, get_client
+from metrics import registry
+
+# Estimated tokens of form fields per prompt; longer fields are truncated. 0 disables
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "600"))
+# Optional house style or brand guidelines appended to the system preamble
+PROMPT_GUIDELINES_FILE = os.getenv("PROMPT_GUIDELINES_FILE")
+# Store the preamble with Gemini context caching instead of sending it with every call
+GEMINI_CONTEXT_CACHE = os.getenv("GEMINI_CONTEXT_CACHE", "").lower() in ('1', 'true', 'yes')
+GEMINI_CONTEXT_CACHE_TTL = int(os.getenv("GEMINI_CONTEXT_CACHE_TTL", "3600"))
+# Seconds to send the preamble inline after creating a cache failed, before trying again
+GEMINI_CONTEXT_CACHE_RETRY = float(os.getenv("GEMINI_CONTEXT_CACHE_RETRY", "600"))
+
+# Rough size of a token in English text, for budgeting before Gemini counts
+CHARS_PER_TOKEN = 4
+ELLIPSIS = '…'
+
+# Form fields, with the labels used in prompts. Anything else a client sends is not prompted with.
+FORM_FIELDS = {
+    'startup_name': 'Startup name',
+    'industry': 'Industry',
+    'target_audience': 'Target audience',
+    'stage': 'Stage',
+    'problem': 'Problem',
+    'solution': 'Solution',
+    'USP': 'Unique selling proposition',
+    'revenue_model': 'Revenue model',
+    'competition': 'Competition',
+    'team': 'Team',
+    'vision': 'Vision',
+}
+
+# Form fields each section's prompt is built from. Sections not listed here
+# (e.g. custom sections sent to /api/generate-slide) use every form field.
+SECTION_FIELDS = {
+    'cover': ['startup_name', 'industry'],
+    'problem': ['startup_name', 'problem', 'target_audience', 'industry'],
+    'solution': ['startup_name', 'problem', 'solution', 'USP', 'target_audience'],
+    'market': ['startup_name', 'industry', 'target_audience', 'problem', 'solution', 'stage'],
+    'product': ['startup_name', 'solution', 'USP', 'industry', 'target_audience'],
+    'business_model': ['startup_name', 'revenue_model', 'target_audience', 'industry', 'stage'],
+    'competition': ['startup_name', 'competition', 'USP', 'solution', 'industry'],
+    'team': ['startup_name', 'team', 'stage', 'industry', 'vision'],
+    'traction': ['startup_name', 'stage', 'revenue_model', 'target_audience', 'vision'],
+    'funding_needs': ['startup_name', 'stage', 'vision', 'revenue_model', 'industry', 'team'],
+}
+
+SYSTEM_INSTRUCTION = """You write startup pitch deck slides from the founders' details.
+Be concise, specific and data-driven; focus on key points; use Markdown bullets where appropriate; keep a professional tone.
+Output only the requested content."""
+
+PROMPT_TRUNCATIONS = registry.counter(
+    'prompt_fields_truncated_total', 'Form fields shortened to fit PROMPT_TOKEN_BUDGET.', ('field',))
+CONTEXT_CACHE_EVENTS = registry.counter(
+    'gemini_context_cache_total', 'Context caches created for the system preamble, and failures to.',
+    ('model', 'result'))
+
+
+def _load_guidelines(path):
+    if not path:
+        return ''
+    try:
+        with open(path, encoding='utf-8') as f:
+            return f.read().strip()
+    except OSError as e:
+        print(f"Could not read PROMPT_GUIDELINES_FILE {path}: {str(e)}")
+        return ''
+
+
+_guidelines = _load_guidelines(PROMPT_GUIDELINES_FILE)
+
+
+def system_instruction():
+    """The preamble shared by every prompt."""
+    if _guidelines:
+        return f"{SYSTEM_INSTRUCTION}\n\nGuidelines:\n{_guidelines}"
+    return SYSTEM_INSTRUCTION
+
+
+def _compact(value):
+    if isinstance(value, (list, tuple)):
+        value = ', '.join(str(item) for item in value)
+    return ' '.join(str(value).split())
+
+
+def section_inputs(section, context):
+    """Return the part of the form a section depends on."""
+    fields = SECTION_FIELDS.get(section, FORM_FIELDS)
+    return {field: context[field] for field in fields if context.get(field) not in (None, '')}
+
+
+def fit_budget(fields, budget=PROMPT_TOKEN_BUDGET):
+    """Truncate the longest values of ``{field: text}`` until the total fits ``budget`` tokens.
+
+    Fields at or under an equal share of what is left are kept whole; the
+    rest are cut to the same length, at a word boundary where there is one.
+    """
+    limit = budget * CHARS_PER_TOKEN
+    if not budget or sum(len(value) for value in fields.values()) <= limit:
+        return fields
+    remaining, count, cap = limit, len(fields), 0
+    for length in sorted(len(value) for value in fields.values()):
+        if length * count > remaining:
+            cap = remaining // count
+            break
+        remaining -= length
+        count -= 1
+
+    trimmed = {}
+    for field, value in fields.items():
+        if len(value) > cap:
+            PROMPT_TRUNCATIONS.inc(field=field)
+            cut = value[:max(cap - len(ELLIPSIS), 0)]
+            value = (cut.rsplit(' ', 1)[0] if ' ' in cut else cut) + ELLIPSIS
+        trimmed[field] = value
+    return trimmed
+
+
+def format_fields(fields, budget=PROMPT_TOKEN_BUDGET):
+    """``Label: value`` lines for ``{field: value}``, within ``budget`` tokens."""
+    compact = fit_budget({field: _compact(value) for field, value in fields.items()}, budget)
+    return '\n'.join(f"{FORM_FIELDS.get(field, field)}: {value}" for field, value in compact.items())
+
+
+def build_section_prompt(section, context):
+    """Build the Gemini prompt for a pitch deck section; the preamble is sent separately."""
+    details = format_fields(section_inputs(section, context))
+    if section == 'cover':
+        startup_name = _compact(context.get('startup_name', ''))
+        return (f"Write a tagline for the cover slide that captures the essence of the startup.\n"
+                f"Return only: \"{startup_name} - [tagline]\"\n{details}")
+    title = SECTION_TITLES.get(section, section.replace('_', ' ').title())
+    return f"Write the \"{title}\" slide ({section}).\n{details}"
+
+
+def build_batched_prompt(context, sections=tuple(SECTION_TITLES)):
+    """Build a single prompt asking for every deck section as a JSON object."""
+    startup_name = _compact(context.get('startup_name', ''))
+    return (f"Write every slide of the deck as a JSON object with one string per section key: "
+            f"{', '.join(sections)}.\n"
+            f"For \"cover\", return only \"{startup_name} - [tagline]\" with a tagline that captures "
+            f"the essence of the startup.\n"
+            f"{format_fields(section_inputs('deck', context))}")
+
+
+@functools.lru_cache(maxsize=None)
+def prompt_version():
+    """Hash of the preamble, prompt templates and token budget.
+
+    Changes whenever editing this module, PROMPT_GUIDELINES_FILE or
+    PROMPT_TOKEN_BUDGET would change what Gemini is asked for the same form.
+    """
+    # Field names as values: short enough that no budget truncates them
+    sample = {field: field for field in FORM_FIELDS}
+    parts = [system_instruction(), str(PROMPT_TOKEN_BUDGET), build_batched_prompt(sample)]
+    parts += [build_section_prompt(section, sample) for section in SECTION_TITLES]
+    return hashlib.sha256('\n\0'.join(parts).encode('utf-8')).hexdigest()
+
+
+class ContextCache:
+    """Names of the Gemini cached contents holding the preamble, one per model.
+
+    ``system_fields(backend)`` returns the request fields that carry the
+    preamble: ``cachedContent`` when a cache exists or can be created,
+    ``systemInstruction`` otherwise.
+    """
+
+    def __init__(self, enabled=GEMINI_CONTEXT_CACHE, ttl=GEMINI_CONTEXT_CACHE_TTL, retry=GEMINI_CONTEXT_CACHE_RETRY):
+        self.enabled = enabled
+        self.ttl = ttl
+        self.retry = retry
+        self._names = {}     # model -> (cached content name, renew at, expires at)
+        self._failures = {}  # model -> when to try creating a cache again
+        self._creating = set()  # models with a create request in flight
+        self._lock = threading.Lock()
+
+    def _lookup(self, model):
+        """``(name, should_create)`` for ``model`` right now.
+
+        Only one caller per model is told to create a cache; the others keep
+        using the current cache while it is valid, or send the preamble inline.
+        """
+        now = time.monotonic()
+        with self._lock:
+            name, renew, expires = self._names.get(model, (None, 0, 0))
+            if name and now < renew:
+                return name, False
+            if model in self._creating or now < self._failures.get(model, 0):
+                return (name if now < expires else None), False
+            self._creating.add(model)
+            return (name if now < expires else None), True
+
+    def _request(self, backend):
+        return {
+            'model': f"models/{backend.model}",
+            'systemInstruction': {'parts': [{'text': system_instruction()}]},
+            'ttl': f"{self.ttl}s",
+        }
+
+    def _store(self, backend, result=None, error=None):
+        now = time.monotonic()
+        with self._lock:
+            if error is None and result.get('name'):
+                # Renew a minute early so a request never references an expired cache
+                self._names[backend.model] = (result['name'], now + max(self.ttl - 60, 0), now + self.ttl)
+                CONTEXT_CACHE_EVENTS.inc(model=backend.model, result='created')
+                return result['name']
+            self._failures[backend.model] = now + self.retry
+        CONTEXT_CACHE_EVENTS.inc(model=backend.model, result='failed')
+        print(f"Context cache for {backend.model} not created, sending the preamble inline: "
+              f"{str(error) if error else result}")
+        return None
+
+    def _created(self, model):
+        with self._lock:
+            self._creating.discard(model)
+
+    def _fields(self, name):
+        if name:
+            return {'cachedContent': name}
+        return {'systemInstruction': {'parts': [{'text': system_instruction()}]}}
+
+    def system_fields(self, backend):
+        if not self.enabled:
+            return self._fields(None)
+        name, create = self._lookup(backend.model)
+        if create:
+            try:
+                name = self._store(backend, get_client().post_json(backend.cached_contents_url(), self._request(backend)))
+            except Exception as e:
+                name = self._store(backend, error=e)
+            finally:
+                self._created(backend.model)
+        return self._fields(name)
+
+    async def system_fields_async(self, backend):
+        """``system_fields`` using the async client."""
+        if not self.enabled:
+            return self._fields(None)
+        name, create = self._lookup(backend.model)
+        if create:
+            try:
+                result = await get_async_client().post_json(backend.cached_contents_url(), self._request(backend))
+                name = self._store(backend, result)
+            except Exception as e:
+                name = self._store(backend, error=e)
+            finally:
+                # Also reached when the request is cancelled
+                self._created(backend.model)
+        return self._fields(name)
+
+    def clear(self):
+        with self._lock:
+            self._names.clear()
+            self._failures.clear()
+            self._creating.clear()
+
+
+context_cache = ContextCache()
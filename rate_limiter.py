@@ -0,0 +1,236 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+
+from metrics import registry
+
+RATE_LIMIT_QUEUE_DEPTH = registry.gauge(
+    'gemini_rate_limiter_queue_depth', 'Callers currently waiting for a rate limiter token.')
+RATE_LIMIT_WAIT_SECONDS = registry.histogram(
+    'gemini_rate_limiter_wait_seconds', 'Time callers waited for a rate limiter token.',
+    buckets=(0.001, 0.01, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0))
+COALESCED_CALLS = registry.counter(
+    'gemini_coalesced_calls_total', 'Calls that shared an identical in-flight Gemini request.')
+
+
+class RateLimitTimeout(Exception):
+    """Raised when a caller waited longer than allowed for a token."""
+
+
+class TokenBucket:
+    """Thread-safe token bucket.
+
+    ``rate`` tokens are added per second up to ``capacity``; ``acquire()``
+    blocks until a token is available instead of failing.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def per_minute(cls, requests_per_minute, burst=None):
+        return cls(requests_per_minute / 60.0, capacity=burst if burst is not None else 1)
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _try_take(self, tokens):
+        """Take tokens if available; otherwise return the seconds to wait."""
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            return (tokens - self._tokens) / self.rate
+
+    async def _try_take_async(self, tokens):
+        return self._try_take(tokens)
+
+    def acquire(self, tokens=1, timeout=None):
+        """Take ``tokens`` from the bucket, sleeping until they are available.
+
+        Raises ``RateLimitTimeout`` if that would take longer than ``timeout`` seconds.
+        """
+        started = time.monotonic()
+        RATE_LIMIT_QUEUE_DEPTH.inc()
+        try:
+            while True:
+                wait = self._try_take(tokens)
+                if wait <= 0:
+                    return
+                if timeout is not None and time.monotonic() - started + wait > timeout:
+                    raise RateLimitTimeout(f"Waited over {timeout}s for the Gemini rate limit")
+                time.sleep(wait)
+        finally:
+            RATE_LIMIT_QUEUE_DEPTH.dec()
+            RATE_LIMIT_WAIT_SECONDS.observe(time.monotonic() - started)
+
+    async def acquire_async(self, tokens=1, timeout=None):
+        """Like ``acquire()`` but waits on the event loop instead of blocking the thread."""
+        started = time.monotonic()
+        RATE_LIMIT_QUEUE_DEPTH.inc()
+        try:
+            while True:
+                wait = await self._try_take_async(tokens)
+                if wait <= 0:
+                    return
+                if timeout is not None and time.monotonic() - started + wait > timeout:
+                    raise RateLimitTimeout(f"Waited over {timeout}s for the Gemini rate limit")
+                await asyncio.sleep(wait)
+        finally:
+            RATE_LIMIT_QUEUE_DEPTH.dec()
+            RATE_LIMIT_WAIT_SECONDS.observe(time.monotonic() - started)
+
+
+class SqliteTokenBucket(TokenBucket):
+    """Token bucket whose state lives in sqlite, so every worker process on
+    the instance draws from the same quota."""
+
+    def __init__(self, path, rate, capacity=None, name='gemini'):
+        super().__init__(rate, capacity)
+        self.path = path
+        self.name = name
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets ("
+                "name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+            )
+            conn.execute(
+                "INSERT OR IGNORE INTO buckets (name, tokens, updated) VALUES (?, ?, ?)",
+                (name, self.capacity, time.time()),
+            )
+
+    @classmethod
+    def per_minute(cls, path, requests_per_minute, burst=None):
+        return cls(path, requests_per_minute / 60.0, capacity=burst if burst is not None else 1)
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _try_take(self, tokens):
+        conn = self._connect()
+        # BEGIN IMMEDIATE takes the write lock up front so refill-and-take is atomic across processes
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            available, updated = conn.execute(
+                "SELECT tokens, updated FROM buckets WHERE name = ?", (self.name,)
+            ).fetchone()
+            now = time.time()
+            available = min(self.capacity, available + max(0.0, now - updated) * self.rate)
+            wait = 0.0
+            if available >= tokens:
+                available -= tokens
+            else:
+                wait = (tokens - available) / self.rate
+            conn.execute("UPDATE buckets SET tokens = ?, updated = ? WHERE name = ?", (available, now, self.name))
+            conn.execute("COMMIT")
+            return wait
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    async def _try_take_async(self, tokens):
+        # BEGIN IMMEDIATE may wait up to the busy timeout for another process; not on the event loop
+        return await asyncio.to_thread(self._try_take, tokens)
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into one execution.
+
+    The first caller for a key runs the function; callers that arrive while
+    it is running wait and receive the same result (or exception).
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = {'event': threading.Event(), 'result': None, 'error': None}
+        if not leader:
+            COALESCED_CALLS.inc()
+            call['event'].wait()
+            if call['error'] is not None:
+                raise call['error']
+            return call['result']
+
+        try:
+            call['result'] = fn()
+            return call['result']
+        except Exception as e:
+            call['error'] = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call['event'].set()
+
+
+class AsyncSingleFlight:
+    """``SingleFlight`` for coroutines running on one event loop.
+
+    The shared call runs as its own task, so a caller that is cancelled
+    (e.g. its client disconnected) leaves it running for the others; it is
+    only cancelled once every caller waiting on it has been.
+    """
+
+    def __init__(self):
+        self._calls = {}  # key -> {'task': task, 'waiters': count}
+
+    def _forget(self, key, call):
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+    async def do(self, key, fn):
+        """Await ``fn()``, or the identical call already in flight for ``key``."""
+        call = self._calls.get(key)
+        if call is None:
+            call = self._calls[key] = {'task': asyncio.ensure_future(fn()), 'waiters': 0}
+            call['task'].add_done_callback(lambda task: self._forget(key, call))
+        else:
+            COALESCED_CALLS.inc()
+        call['waiters'] += 1
+        try:
+            # shield: cancelling this caller must not cancel the shared task
+            return await asyncio.shield(call['task'])
+        finally:
+            call['waiters'] -= 1
+            if not call['waiters'] and not call['task'].done():
+                self._forget(key, call)
+                call['task'].cancel()
+
+
+# Shared Gemini quota. Unset or 0 requests per minute disables limiting.
+GEMINI_REQUESTS_PER_MINUTE = float(os.getenv("GEMINI_REQUESTS_PER_MINUTE", "0"))
+GEMINI_RATE_LIMIT_BURST = float(os.getenv("GEMINI_RATE_LIMIT_BURST", "1"))
+# sqlite file that makes the limit shared by all workers on the instance
+GEMINI_RATE_LIMIT_PATH = os.getenv("GEMINI_RATE_LIMIT_PATH")
+# Longest a call may queue for a token before failing
+GEMINI_RATE_LIMIT_MAX_WAIT = float(os.getenv("GEMINI_RATE_LIMIT_MAX_WAIT", "120"))
+
+
+def create_rate_limiter():
+    """Build the Gemini limiter from the GEMINI_RATE_LIMIT_* settings, or None when disabled."""
+    if GEMINI_REQUESTS_PER_MINUTE <= 0:
+        return None
+    if GEMINI_RATE_LIMIT_PATH:
+        return SqliteTokenBucket.per_minute(GEMINI_RATE_LIMIT_PATH, GEMINI_REQUESTS_PER_MINUTE,
+                                            burst=GEMINI_RATE_LIMIT_BURST)
+    return TokenBucket.per_minute(GEMINI_REQUESTS_PER_MINUTE, burst=GEMINI_RATE_LIMIT_BURST)
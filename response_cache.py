@@ -0,0 +1,203 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# In-process tier
+CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_SIZE", "512"))
+CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL", "86400"))
+# Optional on-disk tier shared by all gunicorn workers on the instance
+CACHE_DB_PATH = os.getenv("RESPONSE_CACHE_PATH")
+# Entries kept on disk; the oldest are deleted beyond this
+CACHE_DISK_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_DISK_SIZE", "50000"))
+# Writes between passes that delete expired and excess disk entries
+CACHE_DISK_PRUNE_EVERY = 100
+
+
+def cache_key(model, prompt):
+    """Content-addressed key for a generated response."""
+    canonical = json.dumps({'model': model, 'prompt': prompt}, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class MemoryCache:
+    """Thread-safe LRU cache with a per-entry time-to-live."""
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.time() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SqliteCache:
+    """On-disk cache tier that several worker processes can share.
+
+    Every CACHE_DISK_PRUNE_EVERY writes, expired entries are deleted, then
+    the oldest ones while there are more than ``max_entries``.
+    """
+
+    def __init__(self, path=CACHE_DB_PATH, ttl=CACHE_TTL_SECONDS, max_entries=CACHE_DISK_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._writes = 0
+        self._writes_lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            # Entries share one TTL, so expiry order is also write order
+            conn.execute("CREATE INDEX IF NOT EXISTS responses_by_expiry ON responses (expires_at)")
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        row = self._connect().execute(
+            "SELECT value, expires_at FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or row[1] < time.time():
+            return None
+        return row[0]
+
+    def set(self, key, value):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, time.time() + self.ttl),
+            )
+        with self._writes_lock:
+            self._writes += 1
+            due = self._writes % CACHE_DISK_PRUNE_EVERY == 1
+        if due:
+            self.prune()
+
+    def prune(self):
+        """Delete expired entries, then the oldest beyond ``max_entries``."""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM responses WHERE expires_at < ?", (time.time(),))
+            excess = conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0] - self.max_entries
+            if excess > 0:
+                conn.execute("DELETE FROM responses WHERE key IN "
+                             "(SELECT key FROM responses ORDER BY expires_at LIMIT ?)", (excess,))
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM responses")
+
+    def __len__(self):
+        return self._connect().execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+
+class ResponseCache:
+    """Memory cache in front of an optional shared disk tier, with hit/miss counters."""
+
+    def __init__(self, memory=None, disk=None):
+        self.memory = memory if memory is not None else MemoryCache()
+        self.disk = disk
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _record(self, value, from_disk):
+        if value is not None and from_disk:
+            with self._lock:
+                self.disk_hits += 1
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def get(self, key):
+        value = self.memory.get(key)
+        if value is not None or self.disk is None:
+            return self._record(value, False)
+        value = self.disk.get(key)
+        if value is not None:
+            self.memory.set(key, value)
+        return self._record(value, True)
+
+    def set(self, key, value):
+        self.memory.set(key, value)
+        if self.disk is not None:
+            self.disk.set(key, value)
+
+    # The disk tier waits on sqlite locks, so on an event loop it runs in a thread
+
+    async def get_async(self, key):
+        value = self.memory.get(key)
+        if value is not None or self.disk is None:
+            return self._record(value, False)
+        value = await asyncio.to_thread(self.disk.get, key)
+        if value is not None:
+            self.memory.set(key, value)
+        return self._record(value, True)
+
+    async def set_async(self, key, value):
+        self.memory.set(key, value)
+        if self.disk is not None:
+            await asyncio.to_thread(self.disk.set, key, value)
+
+    def clear(self):
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'memory_entries': len(self.memory),
+            'memory_max_entries': self.memory.max_entries,
+            'disk_entries': len(self.disk) if self.disk is not None else None,
+        }
+
+
+def create_cache():
+    """Build the response cache from the RESPONSE_CACHE_* settings."""
+    disk = SqliteCache(CACHE_DB_PATH) if CACHE_DB_PATH else None
+    return ResponseCache(MemoryCache(), disk)
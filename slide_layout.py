@@ -0,0 +1,206 @@
+"""Layout of section text on content slides.
+
+Gemini answers in Markdown. ``parse_markdown`` turns it into paragraphs
+with an outline level (nested bullets), bullet flag and bold runs.
+``layout_text`` then estimates how tall the text will be in the slide's
+body box, from font metrics measured once per font and scaled by size. A
+section that does not fit is shrunk, down to LAYOUT_MIN_FONT_SIZE. If it
+still does not fit, it is split across continuation slides.
+
+Nothing here touches python-pptx, so a layout costs a few dict lookups
+per word and is cached by content.
+"""
+import functools
+import os
+import re
+from collections import namedtuple
+
+# Smallest level-0 body size (points) a section may be shrunk to before it is split
+LAYOUT_MIN_FONT_SIZE = int(os.getenv("LAYOUT_MIN_FONT_SIZE", "14"))
+# Most slides one section may be split across; what is left after that is shrunk onto the last one
+LAYOUT_MAX_SLIDES = int(os.getenv("LAYOUT_MAX_SLIDES", "3"))
+# Fonts to take text metrics from. Carlito has the same metrics as Calibri,
+# the deck font; DejaVu Sans is wider, so it errs towards splitting early.
+LAYOUT_FONT = os.getenv("LAYOUT_FONT")
+LAYOUT_BOLD_FONT = os.getenv("LAYOUT_BOLD_FONT")
+FONT_CANDIDATES = ('calibri.ttf', 'Carlito-Regular.ttf', 'DejaVuSans.ttf')
+BOLD_FONT_CANDIDATES = ('calibrib.ttf', 'Carlito-Bold.ttf', 'DejaVuSans-Bold.ttf')
+
+# Deepest outline level used; the content layout styles three
+MAX_LEVEL = 2
+# Line height and paragraph spacing as multiples of the font size
+LINE_SPACING = 1.2
+SPACE_BEFORE = 0.2
+# Widths are measured at this size (an em of 1000 units) and scaled
+REFERENCE_SIZE = 1000
+
+Paragraph = namedtuple('Paragraph', 'runs level bullet')  # runs: ((text, bold), ...)
+Page = namedtuple('Page', 'paragraphs font_size')  # font_size: None keeps the template size
+# Body placeholder in points: text area, plus the left margin of each outline level
+TextBox = namedtuple('TextBox', 'width height level_margins')
+
+_HEADING_RE = re.compile(r'^#{1,6}\s+(.*?)\s*#*$')
+_BULLET_RE = re.compile(r'^(?:[-*+•]|\d+[.)])\s+(.*)$')
+_RULE_RE = re.compile(r'^([-*_])(\s*\1){2,}$')
+_BOLD_RE = re.compile(r'(\*\*|__)(.+?)\1')
+
+
+def _runs(text, bold=False):
+    """Split ``**bold**`` spans into ``(text, bold)`` runs."""
+    runs = []
+    position = 0
+    for match in _BOLD_RE.finditer(text):
+        if match.start() > position:
+            runs.append((text[position:match.start()], bold))
+        runs.append((match.group(2), True))
+        position = match.end()
+    if position < len(text):
+        runs.append((text[position:], bold))
+    return tuple(runs)
+
+
+def parse_markdown(text, bullets=False):
+    """Parse Markdown into paragraphs.
+
+    Headings become bold paragraphs, list items become bullets with their
+    nesting as the outline level, and other lines become paragraphs of
+    their own. With ``bullets`` plain lines are bullets too, as sections
+    written one point per line expect.
+    """
+    paragraphs = []
+    indents = []  # indentation of each open list level
+    for raw in text.replace('\r\n', '\n').split('\n'):
+        line = raw.expandtabs(4)
+        stripped = line.strip()
+        if not stripped or _RULE_RE.match(stripped):
+            continue
+        heading = _HEADING_RE.match(stripped)
+        if heading:
+            indents = []
+            paragraphs.append(Paragraph(_runs(heading.group(1), bold=True), 0, False))
+            continue
+        item = _BULLET_RE.match(stripped)
+        if item:
+            indent = len(line) - len(line.lstrip())
+            while indents and indent < indents[-1]:
+                indents.pop()
+            if not indents or indent > indents[-1]:
+                indents.append(indent)
+            paragraphs.append(Paragraph(_runs(item.group(1)), min(len(indents) - 1, MAX_LEVEL), True))
+            continue
+        indents = []
+        paragraphs.append(Paragraph(_runs(stripped), 0, bullets))
+    return paragraphs
+
+
+def _load_font(path, candidates):
+    from PIL import ImageFont  # deferred: only needed to measure
+    for name in ([path] if path else []) + list(candidates):
+        try:
+            return ImageFont.truetype(name, REFERENCE_SIZE)
+        except OSError:
+            continue
+    return None
+
+
+@functools.lru_cache(maxsize=None)
+def _font(bold):
+    return _load_font(LAYOUT_BOLD_FONT, BOLD_FONT_CANDIDATES) if bold else _load_font(LAYOUT_FONT, FONT_CANDIDATES)
+
+
+@functools.lru_cache(maxsize=65536)
+def _word_width(word, bold):
+    """Width of ``word`` in thousandths of an em."""
+    font = _font(bold)
+    if font is None:
+        # No font to measure with: assume an average glyph of about half an em
+        return len(word) * (560 if bold else 520)
+    return font.getlength(word)
+
+
+def _line_count(runs, width, size):
+    """Lines ``runs`` wrap to in ``width`` points at ``size`` points (greedy word wrap)."""
+    scale = size / REFERENCE_SIZE
+    space = _word_width(' ', False) * scale
+    lines, used = 1, 0.0
+    for text, bold in runs:
+        for word in text.split():
+            word_width = _word_width(word, bold) * scale
+            if used and used + space + word_width > width:
+                lines += 1
+                used = word_width
+            else:
+                used += (space if used else 0) + word_width
+            # A word wider than the box wraps mid-word
+            while used > width:
+                lines += 1
+                used -= width
+    return lines
+
+
+def level_size(size, level):
+    # Nested levels step down 2pt each, as in the baked placeholder styles
+    return max(size - 2 * level, 6)
+
+
+def paragraph_height(paragraph, size, box):
+    font_size = level_size(size, paragraph.level)
+    margin = box.level_margins[paragraph.level] if paragraph.bullet else 0
+    lines = _line_count(paragraph.runs, box.width - margin, font_size)
+    return font_size * (lines * LINE_SPACING + SPACE_BEFORE)
+
+
+def _height(paragraphs, size, box):
+    return sum(paragraph_height(paragraph, size, box) for paragraph in paragraphs)
+
+
+def _fit(paragraphs, size, min_size, box):
+    """``(font_size, fits)``: None at ``size``, else the largest smaller size
+    down to ``min_size`` that fits (``min_size`` and False when none does)."""
+    for candidate in range(size, min_size - 1, -1):
+        if _height(paragraphs, candidate, box) <= box.height:
+            return (None if candidate == size else candidate), True
+    return min_size, False
+
+
+def _split(paragraphs, size, box):
+    """Greedily fill pages at ``size``; a heading never ends a page."""
+    pages, current, used = [], [], 0.0
+    for paragraph in paragraphs:
+        height = paragraph_height(paragraph, size, box)
+        if current and used + height > box.height:
+            carried = []
+            if len(current) > 1 and not current[-1].bullet and all(bold for _, bold in current[-1].runs):
+                carried = [current.pop()]
+            pages.append(current)
+            current = carried
+            used = _height(current, size, box)
+        current.append(paragraph)
+        used += height
+    if current:
+        pages.append(current)
+    return pages
+
+
+@functools.lru_cache(maxsize=1024)
+def layout_text(content, bullets, box, size, min_size=LAYOUT_MIN_FONT_SIZE, max_slides=LAYOUT_MAX_SLIDES):
+    """Lay ``content`` out on one or more pages of ``box`` at body size ``size``.
+
+    Returns a tuple of ``Page``: one page when the text fits, possibly
+    shrunk to no less than ``min_size``; otherwise continuation pages
+    at ``size``, each shrunk if a single paragraph is too tall for it.
+    """
+    paragraphs = parse_markdown(content, bullets)
+    if not paragraphs:
+        return (Page((), None),)
+    min_size = min(min_size, size)
+
+    font_size, fits = _fit(paragraphs, size, min_size, box)
+    if fits or max_slides <= 1:
+        return (Page(tuple(paragraphs), font_size),)
+
+    pages = _split(paragraphs, size, box)
+    if len(pages) > max_slides:
+        pages = _split(paragraphs, min_size, box)
+        pages[max_slides - 1:] = [sum(pages[max_slides - 1:], [])]
+    return tuple(Page(tuple(page), _fit(page, size, min_size, box)[0]) for page in pages)
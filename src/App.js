@@ -116,7 +116,8 @@ function App() {
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({
           section,
-          context: formData
+          context: formData,
+          bypass_cache: true
         })
       });
 
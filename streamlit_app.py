@@ -71,15 +71,33 @@ with st.form("pitch_deck_form"):
         else:
             with st.spinner("Generating pitch deck..."):
                 try:
-                    # Add timeout to prevent hanging
-                    response = requests.post(
-                        f"{FLASK_API_BASE_URL}/api/generate-full-deck",
-                        json=form_data,
-                        timeout=30
-                    )
-                    response.raise_for_status()
-                    deck_data = response.json()
+                    if st.session_state.get('deck') and st.session_state.get('deck_form'):
+                        # Edit of an existing deck: only sections whose inputs changed are regenerated
+                        response = requests.post(
+                            f"{FLASK_API_BASE_URL}/api/update-deck",
+                            json={
+                                "deck": st.session_state['deck'],
+                                "formData": form_data,
+                                "previousFormData": st.session_state['deck_form'],
+                                "input_hashes": st.session_state.get('deck_input_hashes'),
+                            },
+                            timeout=30
+                        )
+                        response.raise_for_status()
+                        update = response.json()
+                        deck_data = update['deck']
+                        st.session_state['deck_input_hashes'] = update['input_hashes']
+                    else:
+                        # Add timeout to prevent hanging
+                        response = requests.post(
+                            f"{FLASK_API_BASE_URL}/api/generate-full-deck",
+                            json=form_data,
+                            timeout=30
+                        )
+                        response.raise_for_status()
+                        deck_data = response.json()
                     st.session_state['deck'] = deck_data
+                    st.session_state['deck_form'] = dict(form_data)
                     st.success("Pitch deck generated successfully!")
                 except requests.exceptions.ConnectionError:
                     st.error(f"Could not connect to the backend server at {FLASK_API_BASE_URL}. Please ensure the Flask backend is running.")
@@ -119,7 +137,8 @@ if 'deck' in st.session_state and st.session_state['deck']:
                 try:
                     response = requests.post(f"{FLASK_API_BASE_URL}/api/generate-slide", json={
                         "section": section['key'],
-                        "context": form_data
+                        "context": form_data,
+                        "bypass_cache": True
                     })
                     response.raise_for_status()
                     data = response.json()
@@ -195,7 +214,48 @@ if 'deck' in st.session_state and st.session_state['deck']:
                 except Exception as e:
                     st.error(f"An unexpected error occurred during PowerPoint generation: {str(e)}")
 
+    # Other formats (PDF, Markdown, HTML, slide images) come from the export endpoint
+    export_formats = {
+        'PDF': 'pdf',
+        'Markdown': 'md',
+        'HTML': 'html',
+        'Slide images (zip)': 'png',
+    }
+    export_label = st.selectbox("Export as", list(export_formats))
+    if st.button(f"Export {export_label}"):
+        if not form_data['startup_name']:
+            st.warning("Please provide a Startup Name to export the deck.")
+        else:
+            with st.spinner(f"Exporting {export_label}..."):
+                try:
+                    export_response = requests.post(
+                        f"{FLASK_API_BASE_URL}/api/export",
+                        params={"format": export_formats[export_label]},
+                        json={
+                            "formData": form_data,
+                            "deck": deck
+                        },
+                        timeout=60
+                    )
+                    export_response.raise_for_status()
+                    file_name = export_response.headers.get('content-disposition', '').partition('filename=')[2].strip('"')
+                    st.download_button(
+                        label=f"Click here to download {export_label}",
+                        data=export_response.content,
+                        file_name=file_name or f"{form_data['startup_name'].replace(' ', '_')}_pitch_deck",
+                        mime=export_response.headers.get('content-type'),
+                        key="download_export_button",
+                    )
+                except requests.exceptions.ConnectionError:
+                    st.error(f"Could not connect to the backend server at {FLASK_API_BASE_URL}. Please ensure the Flask backend is running.")
+                except requests.exceptions.Timeout:
+                    st.error("Request timed out. The server took too long to export the deck.")
+                except requests.exceptions.RequestException as e:
+                    st.error(f"Error exporting the deck: {str(e)}")
+
     # Back to Input Form
     if st.button("Back to Input Form"):
         st.session_state['deck'] = None # Clear the deck to show the input form
+        st.session_state['deck_form'] = None
+        st.session_state['deck_input_hashes'] = None
         st.experimental_rerun() 
\ No newline at end of file
@@ -0,0 +1,31 @@
+import os
+import sys
+
+import pytest
+
+# The app's modules live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Nothing under test should touch a real deck store or Gemini
+os.environ['DECK_STORE_PATH'] = ''
+os.environ.setdefault('GEMINI_API_KEY', 'test')
+
+
+class Clock:
+    """Stands in for the ``time`` module of the module under test, so expiry can be tested without waiting."""
+
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return Clock()
@@ -0,0 +1,85 @@
+import pytest
+
+import deck_store
+from deck_store import GENERATED, SqliteDeckStore
+
+DAY = 24 * 3600
+FORM = {'startup_name': 'ReSource'}
+
+
+def _deck(label, size=100):
+    return {'problem': f'{label} problem ' + 'x' * size, 'team': 'Two founders'}
+
+
+@pytest.fixture
+def store(tmp_path, clock, monkeypatch):
+    monkeypatch.setattr(deck_store, 'time', clock)
+    # Retention only runs when a test calls prune()
+    return SqliteDeckStore(str(tmp_path / 'decks.sqlite3'), max_age=30 * DAY, max_bytes=10 ** 9,
+                           prune_interval=10 ** 9, reuse_ttl=DAY)
+
+
+def _versions(store, deck_id):
+    return [version['version'] for version in store.list_versions(deck_id)]
+
+
+def test_prune_deletes_old_versions_and_idle_decks(store, clock):
+    active = store.save_version(FORM, _deck('v1'))['deck_id']
+    store.save_version(FORM, _deck('v2'), deck_id=active)
+    idle = store.save_version(dict(FORM, startup_name='Idle'), _deck('idle'))['deck_id']
+    clock.advance(31 * DAY)
+    store.save_version(FORM, _deck('v3'), deck_id=active)
+
+    assert store.prune() == 3
+    assert _versions(store, active) == [3]
+    assert store.get_version(idle) is None
+    assert [deck['deck_id'] for deck in store.list_decks()] == [active]
+
+
+def test_prune_keeps_the_latest_version_of_a_recently_updated_deck(store, clock):
+    deck_id = store.save_version(FORM, _deck('v1'))['deck_id']
+    clock.advance(20 * DAY)
+    store.save_version(FORM, _deck('v2'), deck_id=deck_id)
+    clock.advance(20 * DAY)
+
+    assert store.prune() == 1
+    assert _versions(store, deck_id) == [2]
+
+
+def test_prune_deletes_least_recently_updated_decks_over_the_size_cap(store, clock):
+    deck_ids = []
+    for n in range(4):
+        deck_ids.append(store.save_version(FORM, _deck(f'deck{n}', size=1000))['deck_id'])
+        clock.advance(60)
+    store.add_artifact(deck_ids[0], 1, 'pptx', b'p' * 1000)
+    store.max_bytes = store.stored_bytes() - 2500  # more than deck 0 holds, less than decks 0 and 1
+
+    store.prune()
+    assert store.stored_bytes() <= store.max_bytes
+    assert [store.get_version(deck_id) is not None for deck_id in deck_ids] == [False, False, True, True]
+    # Content only the deleted decks used went with them; shared content stayed
+    conn = store._connect()
+    assert conn.execute("SELECT COUNT(*) FROM artifacts").fetchone()[0] == 0
+    assert conn.execute("SELECT COUNT(*) FROM section_contents").fetchone()[0] == 3
+    assert store.get_version(deck_ids[3])['deck']['team'] == 'Two founders'
+
+
+def test_writes_prune_at_most_once_per_interval(store, clock, monkeypatch):
+    runs = []
+    monkeypatch.setattr(store, 'prune', lambda: runs.append(clock.now))
+    store.prune_interval = 300
+    store._next_prune = 0
+    deck_id = store.save_version(FORM, _deck('v1'))['deck_id']
+    store.save_version(FORM, _deck('v2'), deck_id=deck_id)
+    clock.advance(301)
+    store.add_artifact(deck_id, 2, 'pptx', b'pptx')
+    assert len(runs) == 2
+
+
+def test_generated_decks_are_reused_within_the_reuse_ttl(store, clock):
+    key = deck_store.inputs_hash(FORM, 'sections', {'models': {'problem': 'a'}, 'prompts': '1'})
+    store.save_version(FORM, _deck('v1'), source=GENERATED, inputs_hash=key)
+    assert store.find_generated(key)['deck'] == _deck('v1')
+    assert deck_store.inputs_hash(FORM, 'sections', {'models': {'problem': 'b'}, 'prompts': '1'}) != key
+    clock.advance(DAY + 1)
+    assert store.find_generated(key) is None
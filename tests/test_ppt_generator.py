@@ -0,0 +1,113 @@
+import io
+import zipfile
+
+import pytest
+
+pytest.importorskip('pptx')
+from pptx import Presentation
+
+from deck_model import SECTION_TITLES
+from ppt_generator import _slide_tag, patch_ppt, render_ppt
+
+FORM = {'startup_name': 'ReSource', 'tagline': 'Less waste, more margin'}
+DECK = {section: f"- {title} point one\n- {title} point two" for section, title in SECTION_TITLES.items()}
+LONG_MARKET = '\n'.join(f"- Market point {n} with enough words to take a full line of the slide" for n in range(40))
+
+
+def _slides(data):
+    """``[(tag, title, body text)]`` of a PPTX, in slide order."""
+    prs = Presentation(io.BytesIO(data))
+    return [(_slide_tag(slide), slide.shapes.title.text_frame.text,
+             slide.placeholders[1].text_frame.text if len(slide.placeholders) > 1 else None)
+            for slide in prs.slides]
+
+
+def _tags(data):
+    return [tag for tag, _, _ in _slides(data)]
+
+
+def _edit(data, section, text):
+    """Edit a section's body by hand, as someone would in PowerPoint."""
+    prs = Presentation(io.BytesIO(data))
+    slide = next(slide for slide in prs.slides if _slide_tag(slide) == section)
+    slide.placeholders[1].text_frame.text = text
+    slide.shapes.add_textbox(0, 0, 100, 100).text_frame.text = 'Speaker sticker'
+    buffer = io.BytesIO()
+    prs.save(buffer)
+    return buffer.getvalue()
+
+
+def _assert_valid_package(data):
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        names = zf.namelist()
+        assert len(names) == len(set(names))
+    Presentation(io.BytesIO(data))
+
+
+@pytest.fixture(scope='module')
+def rendered():
+    return render_ppt(FORM, DECK).getvalue()
+
+
+def test_render_tags_every_section(rendered):
+    assert _tags(rendered) == ['title'] + list(SECTION_TITLES)
+
+
+def test_patch_rewrites_only_changed_sections(rendered):
+    edited = _edit(rendered, 'team', 'Hand-written team bio')
+    patched = patch_ppt(edited, {'market': '- A new market estimate'}).getvalue()
+
+    slides = {tag: (title, body) for tag, title, body in _slides(patched)}
+    assert _tags(patched) == _tags(rendered)
+    assert slides['market'] == ('Market Opportunity', 'A new market estimate')
+    assert slides['team'][1] == 'Hand-written team bio'
+    team = next(slide for slide in Presentation(io.BytesIO(patched)).slides if _slide_tag(slide) == 'team')
+    assert 'Speaker sticker' in [shape.text_frame.text for shape in team.shapes if shape.has_text_frame]
+    assert slides['problem'] == dict((tag, (title, body)) for tag, title, body in _slides(rendered))['problem']
+    _assert_valid_package(patched)
+
+
+def test_patch_adds_and_removes_continuation_slides(rendered):
+    long = patch_ppt(rendered, {'market': LONG_MARKET}).getvalue()
+    tags = _tags(long)
+    continuations = [tag for tag in tags if tag.startswith('market/')]
+    assert continuations and continuations == [f'market/{n}' for n in range(2, len(continuations) + 2)]
+    market = tags.index('market')
+    assert tags[market + 1:market + 1 + len(continuations)] == continuations
+    assert tags[market + 1 + len(continuations)] == 'product'
+    assert all(title == 'Market Opportunity (cont.)'
+               for tag, title, _ in _slides(long) if tag.startswith('market/'))
+    _assert_valid_package(long)
+
+    short = patch_ppt(long, {'market': '- Back to one slide'}).getvalue()
+    assert _tags(short) == _tags(rendered)
+    _assert_valid_package(short)
+
+
+def test_patch_removes_and_restores_a_section(rendered):
+    removed = patch_ppt(rendered, {'traction': ''}).getvalue()
+    assert 'traction' not in _tags(removed)
+    _assert_valid_package(removed)
+
+    restored = patch_ppt(removed, {'traction': '- 10 paying pilots'}).getvalue()
+    assert _tags(restored) == _tags(rendered)
+    assert dict((tag, body) for tag, _, body in _slides(restored))['traction'] == '10 paying pilots'
+    _assert_valid_package(restored)
+
+
+def test_patch_refreshes_the_cover(rendered):
+    patched = patch_ppt(rendered, {'cover': '- New cover'}, {'startup_name': 'ReSource Labs'}).getvalue()
+    assert _slides(patched)[0][1] == 'ReSource Labs'
+
+
+def test_patch_finds_untagged_slides_by_title(rendered):
+    prs = Presentation(io.BytesIO(rendered))
+    for slide in prs.slides:
+        del slide._element.cSld.attrib['name']
+    buffer = io.BytesIO()
+    prs.save(buffer)
+
+    patched = patch_ppt(buffer.getvalue(), {'team': '- Two new hires'}).getvalue()
+    slides = _slides(patched)
+    assert len(slides) == len(SECTION_TITLES) + 1
+    assert [body for tag, _, body in slides if tag == 'team'] == ['Two new hires']
@@ -0,0 +1,55 @@
+import pytest
+
+import response_cache
+from response_cache import CACHE_DISK_PRUNE_EVERY, SqliteCache
+
+
+@pytest.fixture
+def cache(tmp_path, clock, monkeypatch):
+    monkeypatch.setattr(response_cache, 'time', clock)
+    return SqliteCache(str(tmp_path / 'responses.sqlite3'), ttl=60, max_entries=5)
+
+
+def test_expired_entries_are_not_served(cache, clock):
+    cache.set('key', 'value')
+    clock.advance(59)
+    assert cache.get('key') == 'value'
+    clock.advance(2)
+    assert cache.get('key') is None
+
+
+def test_prune_deletes_expired_entries(cache, clock):
+    cache.set('old', 'value')
+    clock.advance(30)
+    cache.set('new', 'value')
+    clock.advance(31)
+    cache.prune()
+    assert len(cache) == 1 and cache.get('new') == 'value'
+
+
+def test_prune_keeps_the_newest_entries_up_to_the_cap(cache, clock):
+    for n in range(8):
+        cache.set(f'key{n}', 'value')
+        clock.advance(1)
+    cache.prune()
+    assert len(cache) == 5
+    assert [n for n in range(8) if cache.get(f'key{n}')] == [3, 4, 5, 6, 7]
+
+
+def test_rewriting_an_entry_makes_it_newest(cache, clock):
+    for n in range(5):
+        cache.set(f'key{n}', 'value')
+        clock.advance(1)
+    cache.set('key0', 'again')
+    cache.set('key5', 'value')
+    cache.prune()
+    assert cache.get('key0') == 'again' and cache.get('key1') is None
+
+
+def test_writes_prune_periodically(cache, clock):
+    for n in range(CACHE_DISK_PRUNE_EVERY):
+        cache.set(f'key{n}', 'value')
+        clock.advance(1)
+    assert len(cache) == CACHE_DISK_PRUNE_EVERY
+    cache.set('one more', 'value')
+    assert len(cache) == 5
@@ -0,0 +1,63 @@
+import json
+
+import pytest
+
+import deck_service
+from gemini_client import GeminiAPIError
+from models import ModelRegistry
+from response_cache import ResponseCache
+
+FORM = {'startup_name': 'ReSource', 'problem': 'Food waste', 'industry': 'Retail', 'target_audience': 'Grocers'}
+
+
+class FakeClient:
+    """Answers generateContent for every model except those listed as over quota."""
+
+    def __init__(self):
+        self.over_quota = set()
+        self.calls = []
+
+    def post_json(self, url, payload):
+        model = url.split('/models/')[1].split(':')[0]
+        self.calls.append(model)
+        if model in self.over_quota:
+            raise GeminiAPIError(429, 'quota exceeded')
+        text = f'from {model}'
+        if 'generationConfig' in payload:
+            text = json.dumps({section: text for section in deck_service.SLIDE_SECTIONS})
+        return {'candidates': [{'content': {'parts': [{'text': text}]}}]}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    client = FakeClient()
+    monkeypatch.setattr(deck_service, 'get_client', lambda: client)
+    monkeypatch.setattr(deck_service, 'model_registry', ModelRegistry(
+        default_model='primary', fast_model='primary', fallback_model='fallback', cooldown=0))
+    monkeypatch.setattr(deck_service, 'response_cache', ResponseCache())
+    return client
+
+
+def test_primary_model_answers_are_cached(client):
+    assert deck_service.generate_pitch_deck_section('problem', FORM) == 'from primary'
+    assert deck_service.generate_pitch_deck_section('problem', FORM) == 'from primary'
+    assert client.calls == ['primary']
+
+
+def test_fallback_answers_are_not_served_once_the_primary_recovers(client):
+    client.over_quota.add('primary')
+    assert deck_service.generate_pitch_deck_section('problem', FORM) == 'from fallback'
+    client.over_quota.clear()
+    assert deck_service.generate_pitch_deck_section('problem', FORM) == 'from primary'
+    assert client.calls == ['primary', 'fallback', 'primary']
+
+
+def test_batched_fallback_answers_are_not_cached(client):
+    client.over_quota.add('primary')
+    deck, _ = deck_service.generate_deck_batched(FORM)
+    assert set(deck.values()) == {'from fallback'}
+    assert len(deck_service.response_cache.memory) == 0
+
+    client.over_quota.clear()
+    deck_service.generate_deck_batched(FORM)
+    assert len(deck_service.response_cache.memory) == 1
@@ -0,0 +1,84 @@
+import asyncio
+
+import pytest
+
+from rate_limiter import AsyncSingleFlight
+
+
+def _run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_concurrent_calls_share_one_upstream_call():
+    async def scenario():
+        flight, calls = AsyncSingleFlight(), []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return 'deck'
+
+        results = await asyncio.gather(*(flight.do('key', fetch) for _ in range(5)))
+        return results, calls
+
+    results, calls = _run(scenario())
+    assert results == ['deck'] * 5 and len(calls) == 1
+
+
+def test_followers_get_the_result_when_the_leader_is_cancelled():
+    async def scenario():
+        flight, finished = AsyncSingleFlight(), asyncio.Event()
+
+        async def fetch():
+            await finished.wait()
+            return 'deck'
+
+        leader = asyncio.ensure_future(flight.do('key', fetch))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.do('key', fetch))
+        await asyncio.sleep(0)
+        leader.cancel()
+        await asyncio.sleep(0)
+        finished.set()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert _run(scenario()) == 'deck'
+
+
+def test_the_call_is_cancelled_once_nobody_waits_for_it():
+    async def scenario():
+        flight, cancelled = AsyncSingleFlight(), []
+
+        async def fetch():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(1)
+                raise
+
+        callers = [asyncio.ensure_future(flight.do('key', fetch)) for _ in range(2)]
+        await asyncio.sleep(0)
+        for caller in callers:
+            caller.cancel()
+        await asyncio.gather(*callers, return_exceptions=True)
+        await asyncio.sleep(0)
+        return cancelled, flight._calls
+
+    cancelled, calls = _run(scenario())
+    assert cancelled == [1] and calls == {}
+
+
+def test_errors_reach_every_caller():
+    async def scenario():
+        flight = AsyncSingleFlight()
+
+        async def fetch():
+            await asyncio.sleep(0.01)
+            raise ValueError('quota exceeded')
+
+        return await asyncio.gather(*(flight.do('key', fetch) for _ in range(3)), return_exceptions=True)
+
+    results = _run(scenario())
+    assert all(isinstance(result, ValueError) for result in results)
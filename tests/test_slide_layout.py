@@ -0,0 +1,53 @@
+from slide_layout import Page, Paragraph, TextBox, layout_text, parse_markdown
+
+BOX = TextBox(width=600, height=300, level_margins=(20, 40, 60))
+
+
+def test_headings_are_bold_paragraphs():
+    assert parse_markdown("## Market size\n") == [Paragraph((('Market size', True),), 0, False)]
+
+
+def test_nested_lists_keep_their_outline_level():
+    text = "- Top\n  - Nested\n    - Deeper\n      - Capped\n- Back to top\n1. Numbered"
+    assert [(p.runs[0][0], p.level, p.bullet) for p in parse_markdown(text)] == [
+        ('Top', 0, True),
+        ('Nested', 1, True),
+        ('Deeper', 2, True),
+        ('Capped', 2, True),
+        ('Back to top', 0, True),
+        ('Numbered', 0, True),
+    ]
+
+
+def test_bold_runs_are_split_out():
+    [paragraph] = parse_markdown("- **TAM:** $4B and __growing__ fast")
+    assert paragraph.runs == (('TAM:', True), (' $4B and ', False), ('growing', True), (' fast', False))
+
+
+def test_plain_lines_are_bullets_only_when_asked():
+    text = "First point\n\n---\nSecond point"
+    assert [p.bullet for p in parse_markdown(text)] == [False, False]
+    assert [p.bullet for p in parse_markdown(text, bullets=True)] == [True, True]
+
+
+def test_short_text_fits_one_page_at_full_size():
+    assert layout_text("- One\n- Two", True, BOX, 24) == (
+        Page((Paragraph((('One', False),), 0, True), Paragraph((('Two', False),), 0, True)), None),)
+
+
+def test_long_text_is_shrunk_then_split():
+    shrunk = layout_text('\n'.join(f"- Point {n}" for n in range(9)), True, BOX, 24, min_size=14)
+    assert len(shrunk) == 1 and 14 <= shrunk[0].font_size < 24
+
+    pages = layout_text('\n'.join(f"- Point number {n} about the market" for n in range(40)), True, BOX, 24,
+                        min_size=20, max_slides=3)
+    assert 1 < len(pages) <= 3
+    assert sum(len(page.paragraphs) for page in pages) == 40
+
+
+def test_a_heading_never_ends_a_page():
+    text = '\n'.join(f"## Heading {n}\n- Detail {n} that takes up some room on the slide" for n in range(12))
+    pages = layout_text(text, False, BOX, 24, min_size=24, max_slides=10)
+    assert len(pages) > 1
+    for page in pages[:-1]:
+        assert page.paragraphs[-1].bullet
@@ -0,0 +1,70 @@
+import pytest
+
+import deck_service
+from deck_service import SLIDE_SECTIONS, deck_input_hashes, error_placeholder, update_deck
+
+FORM = {
+    'startup_name': 'ReSource',
+    'industry': 'Retail',
+    'target_audience': 'Grocers',
+    'stage': 'Seed',
+    'problem': 'Food waste',
+    'solution': 'Demand forecasting',
+    'USP': 'Works with any POS',
+    'revenue_model': 'SaaS',
+    'competition': 'Spreadsheets',
+    'team': 'Two founders',
+    'vision': 'Zero waste stores',
+}
+DECK = {section: f'{section} content' for section in SLIDE_SECTIONS}
+
+
+@pytest.fixture(autouse=True)
+def generated(monkeypatch):
+    """Record the sections update_deck asks for instead of calling Gemini."""
+    calls = []
+
+    def generate_sections(sections, context, **kwargs):
+        calls.append(list(sections))
+        return {section: f'new {section}' for section in sections}
+
+    monkeypatch.setattr(deck_service, 'generate_sections', generate_sections)
+    return calls
+
+
+@pytest.mark.parametrize('field, sections', [
+    ('team', ['team', 'funding_needs']),
+    ('vision', ['team', 'traction', 'funding_needs']),
+    ('competition', ['competition']),
+    ('USP', ['solution', 'product', 'competition']),
+    ('startup_name', list(SLIDE_SECTIONS)),
+])
+def test_only_sections_using_a_changed_field_are_regenerated(field, sections):
+    edited = dict(FORM, **{field: FORM[field] + ' (edited)'})
+    deck, hashes, regenerated = update_deck(DECK, edited, previous_context=FORM)
+    assert regenerated == sections
+    assert {section for section in SLIDE_SECTIONS if deck[section] != DECK[section]} == set(sections)
+    assert hashes == deck_input_hashes(edited)
+
+
+def test_returned_hashes_replace_the_previous_form(generated):
+    edited = dict(FORM, competition='Incumbent ERPs')
+    _, hashes, _ = update_deck(DECK, FORM, previous_context=FORM)
+    assert update_deck(DECK, edited, input_hashes=hashes)[2] == ['competition']
+    assert generated == [['competition']]
+
+
+def test_fields_no_section_uses_change_nothing(generated):
+    edited = dict(FORM, notes='not a form field')
+    deck, _, regenerated = update_deck(DECK, edited, previous_context=FORM)
+    assert regenerated == [] and deck == DECK and generated == []
+
+
+def test_missing_and_failed_sections_are_regenerated():
+    deck = dict(DECK, market=error_placeholder('market'))
+    del deck['team']
+    assert update_deck(deck, FORM, previous_context=FORM)[2] == ['market', 'team']
+
+
+def test_everything_is_regenerated_without_old_inputs():
+    assert update_deck(DECK, FORM)[2] == list(SLIDE_SECTIONS)